@@ -0,0 +1,292 @@
+"""API latency percentiles and throughput per endpoint under concurrent clients.
+
+Seeds a database with realistic volumes, starts the app against it in a
+subprocess and drives every endpoint with concurrent keep-alive clients.
+Full volumes are 10k tasks, 1M process logs and 100M output lines; SQLite
+databases are seeded at 1% of that by default. Run from the repository root:
+
+    PYTHONPATH=pscheduler python benchmarks/api_load_benchmark.py --output load.json
+
+Pass ``--db postgresql+asyncpg://...`` to load-test PostgreSQL at full scale.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import func, insert, select
+
+from db import connection
+from db.models import Base, ProcessLog, OutputLog, TaskModel
+from util.loop import new_event_loop
+
+
+full_volumes = {
+    'tasks': 10000,
+    'process_logs': 1000000,
+    'output_lines': 100000000
+}
+default_endpoints = ('/task', '/process_log', '/executor', '/execution/output/{id}')
+insert_chunk_size = 10000
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def scaled_volumes(scale: float) -> Dict[str, int]:
+    return {name: max(1, int(volume * scale)) for name, volume in full_volumes.items()}
+
+
+async def insert_rows(conn, table, rows: List[Dict]):
+    for start in range(0, len(rows), insert_chunk_size):
+        await conn.execute(insert(table), rows[start:start + insert_chunk_size])
+
+
+async def seed(volumes: Dict[str, int]) -> bool:
+    """Fill an empty database with ``volumes``; an already seeded database is reused as it is."""
+    async with connection.get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if await conn.scalar(select(func.count()).select_from(TaskModel.__table__)):
+            return False
+
+        await insert_rows(conn, TaskModel.__table__, [
+            {
+                'title': f'task {i}',
+                'command': f'echo task {i}',
+                'trigger_type': 'cron',
+                'trigger_args': f'{i % 60} {i % 24} 1 1 *'
+            }
+            for i
+            in range(volumes['tasks'])
+        ])
+
+        statuses = ('finished',) * 8 + ('failed', 'timed_out')
+        started = datetime.utcnow() - timedelta(days=30)
+        lines_per_log = max(1, volumes['output_lines'] // volumes['process_logs'])
+        for first in range(0, volumes['process_logs'], insert_chunk_size):
+            ids = range(first + 1, min(first + insert_chunk_size, volumes['process_logs']) + 1)
+            process_logs = []
+            for process_log_id in ids:
+                start_date = started + timedelta(seconds=process_log_id)
+                process_logs.append({
+                    'process_log_id': process_log_id,
+                    'task_id': process_log_id % volumes['tasks'] + 1,
+                    'status': statuses[process_log_id % len(statuses)],
+                    'start_date': start_date,
+                    'finish_date': start_date + timedelta(seconds=2),
+                    'return_code': 0
+                })
+            await insert_rows(conn, ProcessLog.__table__, process_logs)
+
+            await insert_rows(conn, OutputLog.__table__, [
+                {
+                    'process_log_id': process_log['process_log_id'],
+                    'message': f'line {line} of execution {process_log["process_log_id"]}: ' + 'x' * 40 + '\n',
+                    'time': process_log['start_date'],
+                    'is_error': int(line == lines_per_log - 1 and process_log['status'] != 'finished')
+                }
+                for process_log
+                in process_logs
+                for line
+                in range(lines_per_log)
+            ])
+    return True
+
+
+class HttpConnection:
+    """Minimal HTTP/1.1 keep-alive client, so the harness needs no client library."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader = self._writer = None
+
+    async def open(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    async def get(self, path: str) -> Tuple[int, int]:
+        """Status and body size of a GET request."""
+        if self._writer is None:
+            await self.open()
+        self._writer.write(f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n'.encode())
+        status = int((await self._reader.readline()).split()[1])
+
+        length, chunked = 0, False
+        while (line := await self._reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+            elif name.lower() == 'transfer-encoding':
+                chunked = 'chunked' in value.lower()
+
+        if not chunked:
+            await self._reader.readexactly(length)
+            return status, length
+
+        size = 0
+        while chunk_size := int((await self._reader.readline()).split(b';')[0], 16):
+            await self._reader.readexactly(chunk_size + 2)
+            size += chunk_size
+        await self._reader.readline()
+        return status, size
+
+
+async def drive(host: str, port: int, paths: Callable[[], str], concurrency: int, duration: float) -> Dict:
+    """Send requests from ``concurrency`` clients for ``duration`` seconds and summarize their latencies."""
+    latencies: List[float] = []
+    errors = 0
+    response_bytes = 0
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors, response_bytes
+        conn = HttpConnection(host, port)
+        try:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    status, size = await conn.get(paths())
+                except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    errors += 1
+                    conn.close()
+                    continue
+                latencies.append(time.perf_counter() - started)
+                response_bytes += size
+                errors += status != 200
+        finally:
+            conn.close()
+
+    started = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'mean_response_bytes': response_bytes // len(latencies) if latencies else 0
+    }
+    if latencies:
+        summary.update({
+            f'{name}_ms': round(percentile(latencies, q) * 1000, 2)
+            for name, q
+            in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))
+        })
+    return summary
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(db_url: str, port: int) -> subprocess.Popen:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.path.join(root, 'pscheduler'), DB_URL=db_url,
+               APP_HOST='127.0.0.1', APP_PORT=str(port))
+    return subprocess.Popen([sys.executable, os.path.join(root, 'pscheduler', 'main.py')], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(app: subprocess.Popen, port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if app.poll() is not None:
+            raise RuntimeError(f'app exited with {app.returncode} during startup')
+        conn = HttpConnection('127.0.0.1', port)
+        try:
+            if (await conn.get('/executor'))[0] == 200:
+                return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            conn.close()
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f'app not ready after {timeout}s')
+
+
+async def run(args: argparse.Namespace, db_url: str) -> Dict:
+    connection.configure(db_url)
+    dialect = connection.get_engine().dialect.name
+    scale = args.scale if args.scale is not None else (1.0 if dialect == 'postgresql' else 0.01)
+    volumes = scaled_volumes(scale)
+
+    started = time.monotonic()
+    seeded = await seed(volumes)
+    seed_seconds = time.monotonic() - started
+    async with connection.get_engine().connect() as conn:
+        volumes = {
+            'tasks': await conn.scalar(select(func.count()).select_from(TaskModel.__table__)),
+            'process_logs': await conn.scalar(select(func.count()).select_from(ProcessLog.__table__)),
+            'output_lines': await conn.scalar(select(func.count()).select_from(OutputLog.__table__))
+        }
+    await connection.get_engine().dispose()
+
+    port = free_port()
+    app = start_app(db_url, port)
+    try:
+        await wait_ready(app, port, args.startup_timeout)
+        endpoints = {}
+        for endpoint in args.endpoints:
+            def paths(endpoint=endpoint) -> str:
+                return endpoint.replace('{id}', str(random.randint(1, volumes['process_logs'])))
+
+            endpoints[endpoint] = await drive('127.0.0.1', port, paths, args.concurrency, args.duration)
+    finally:
+        app.terminate()
+        app.wait()
+
+    return {
+        'database': dialect,
+        'volumes': volumes,
+        'seed_seconds': round(seed_seconds, 1) if seeded else None,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'endpoints': endpoints
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='database URL, a temporary SQLite file by default')
+    parser.add_argument('--scale', type=float,
+                        help='fraction of the full volumes to seed, 1 for PostgreSQL and 0.01 for SQLite by default')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per endpoint')
+    parser.add_argument('--endpoints', nargs='+', default=default_endpoints)
+    parser.add_argument('--startup-timeout', type=float, default=300.0)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_url = args.db or f"sqlite+aiosqlite:///{os.path.join(directory, 'load.sqlite')}"
+        loop = new_event_loop()
+        try:
+            report = loop.run_until_complete(run(args, db_url))
+        finally:
+            loop.close()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Next run date and bulk enumeration of compiled cron expressions against croniter.
+
+Run from the repository root:
+
+    PYTHONPATH=pscheduler python benchmarks/cron_benchmark.py
+"""
+import argparse
+import itertools
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from croniter import croniter
+
+from scheduler.cron import compile_cron
+
+
+expressions = [
+    '* * * * *',
+    '*/5 * * * *',
+    '0 9-17 * * mon-fri',
+    '30 2 1,15 * *',
+    '0 0 13 * fri',
+    '15 4 1 */3 *'
+]
+
+
+def timed(function: Callable[[], None], repeat: int) -> float:
+    """Microseconds per call of ``function``."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def run(expression: str, calls: int, run_dates: int):
+    start = datetime(2024, 1, 1, 12, 34, 56)
+    starts = [start + timedelta(minutes=17 * i) for i in range(calls)]
+    cron = compile_cron(expression)
+
+    next_compiled = timed(lambda: [cron.next_after(s) for s in starts], 1) / calls
+    next_croniter = timed(lambda: [croniter(expression, s, ret_type=datetime).get_next() for s in starts], 1) / calls
+
+    def enumerate_croniter():
+        reference = croniter(expression, start, ret_type=datetime)
+        for _ in range(run_dates):
+            reference.get_next()
+
+    bulk_compiled = timed(lambda: list(itertools.islice(cron.run_dates_after(start), run_dates)), 3) / 1000
+    bulk_croniter = timed(enumerate_croniter, 3) / 1000
+
+    print(f'{expression:20} next {next_compiled:8.2f} us vs {next_croniter:8.2f} us '
+          f'({next_croniter / next_compiled:5.1f}x)  '
+          f'{run_dates} runs {bulk_compiled:8.2f} ms vs {bulk_croniter:8.2f} ms '
+          f'({bulk_croniter / bulk_compiled:5.1f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=10000)
+    parser.add_argument('--run-dates', type=int, default=10000)
+    parser.add_argument('expressions', nargs='*', default=expressions)
+    args = parser.parse_args()
+
+    for expression in args.expressions:
+        run(expression, args.calls, args.run_dates)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Dispatch lag and output throughput on each available event loop.
+
+Run from the repository root:
+
+    PYTHONPATH=pscheduler python benchmarks/loop_benchmark.py
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import List
+
+from util.loop import loop_names, new_event_loop
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def dispatch_lag(timers: int, spread: float) -> List[float]:
+    """Lateness of ``timers`` sleeps due within ``spread`` seconds, as in ``TaskExecutor._await_run``."""
+    lags = []
+
+    async def wait(delay: float):
+        due = time.monotonic() + delay
+        await asyncio.sleep(delay)
+        lags.append(time.monotonic() - due)
+
+    await asyncio.gather(*(wait(spread * i / timers) for i in range(timers)))
+    return lags
+
+
+async def output_throughput(lines: int) -> float:
+    """Lines per second read from a child's stdout the way ``ExecutionMonitor`` reads them."""
+    script = f"import sys\nfor i in range({lines}): sys.stdout.write('x' * 80 + '\\n')"
+    started = time.monotonic()
+    process = await asyncio.create_subprocess_exec(sys.executable, '-c', script, stdout=asyncio.subprocess.PIPE)
+    read = 0
+    while await process.stdout.readline():
+        read += 1
+    await process.wait()
+    assert read == lines
+    return lines / (time.monotonic() - started)
+
+
+def run(name: str, timers: int, spread: float, lines: int):
+    loop = new_event_loop(name)
+    try:
+        lags = loop.run_until_complete(dispatch_lag(timers, spread))
+        throughput = loop.run_until_complete(output_throughput(lines))
+    finally:
+        loop.close()
+
+    print(f'{name:8} dispatch lag p50 {percentile(lags, 0.5) * 1000:7.3f} ms  '
+          f'p99 {percentile(lags, 0.99) * 1000:7.3f} ms  max {max(lags) * 1000:7.3f} ms  '
+          f'output {throughput:12,.0f} lines/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--timers', type=int, default=10000)
+    parser.add_argument('--spread', type=float, default=2.0)
+    parser.add_argument('--lines', type=int, default=500000)
+    args = parser.parse_args()
+
+    for name in loop_names:
+        try:
+            run(name, args.timers, args.spread, args.lines)
+        except RuntimeError as e:
+            print(f'{name:8} skipped: {e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Per-task memory of the executor registry: mapped ``Task`` instances versus ``TaskSpec`` snapshots.
+
+Run from the repository root:
+
+    PYTHONPATH=pscheduler python benchmarks/task_memory_benchmark.py
+"""
+import argparse
+import asyncio
+import gc
+import json
+import tracemalloc
+from typing import Callable, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from db.models import Base
+from scheduler.spec import TaskSpec
+from scheduler.task import CronTask, IntervalTask, Task
+
+
+def make_tasks(count: int) -> List[Task]:
+    tasks = []
+    for i in range(count):
+        if i % 2:
+            task = CronTask(f'cron {i}', f'echo cron {i}', f'{i % 60} * * * *')
+        else:
+            task = IntervalTask(f'interval {i}', f'echo interval {i}', minutes=i % 59 + 1)
+        task.output_policy = json.dumps({'max_lines': 1000})
+        task.timeout = 60.0
+        tasks.append(task)
+    return tasks
+
+
+async def load_tasks(engine) -> List[Task]:
+    async with AsyncSession(engine) as session:
+        return (await session.scalars(select(Task))).all()
+
+
+def measure(loop: asyncio.AbstractEventLoop, engine, keep: Callable[[List[Task]], list]) -> int:
+    """Bytes still allocated after loading every task and keeping ``keep(tasks)``."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    kept = keep(loop.run_until_complete(load_tasks(engine)))
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+async def create_database(count: int):
+    engine = create_async_engine('sqlite+aiosqlite://')
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        session.add_all(make_tasks(count))
+        await session.commit()
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=100000)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    engine = loop.run_until_complete(create_database(args.tasks))
+    try:
+        measure(loop, engine, list)
+        for name, keep in (('Task', list), ('TaskSpec', lambda tasks: [TaskSpec.from_task(task) for task in tasks])):
+            used = measure(loop, engine, keep)
+            print(f'{name:8} {used / 2 ** 20:8.1f} MiB  {used / args.tasks:8.0f} bytes per task')
+    finally:
+        loop.run_until_complete(engine.dispose())
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
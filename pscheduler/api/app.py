@@ -1,26 +1,47 @@
 import os
+from typing import Tuple
 
+import uvicorn
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from uvicorn import Server, Config
 from dotenv import load_dotenv
 
 from api.routers import router
+from scheduler import control
+from util.loop import loop_name
 
 
-app = FastAPI()
-app.include_router(router)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def create_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
 
-load_dotenv()
-host = os.environ['APP_HOST']
-port = int(os.environ['APP_PORT'])
 
-config = Config(app=app, host=host, port=port, loop='asyncio')
-server = Server(config)
\ No newline at end of file
+def create_worker_app() -> FastAPI:
+    """App for API worker processes, which reach the scheduler process over the control socket."""
+    control.configure(control.ControlClient())
+    return create_app()
+
+
+def _address() -> Tuple[str, int]:
+    load_dotenv()
+    return os.environ['APP_HOST'], int(os.environ['APP_PORT'])
+
+
+def create_server(app: FastAPI) -> Server:
+    host, port = _address()
+    config = Config(app=app, host=host, port=port, loop=loop_name())
+    return Server(config)
+
+
+def run_workers(workers: int):
+    host, port = _address()
+    uvicorn.run('api.app:create_worker_app', factory=True, host=host, port=port, workers=workers, loop=loop_name())
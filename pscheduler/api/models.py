@@ -1,6 +1,42 @@
-from typing import Optional, Dict, Union
+from typing import Optional, Dict, List, Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, validator
+
+
+class OutputPolicyModel(BaseModel):
+    max_lines: Optional[int] = Field(None, ge=0)
+    max_bytes: Optional[int] = Field(None, ge=0)
+    max_lines_per_second: Optional[float] = Field(None, gt=0)
+    tail_lines: Optional[int] = Field(None, ge=0)
+
+
+class ResourceLimitsModel(BaseModel):
+    nice: Optional[int] = Field(None, ge=-20, le=19)
+    ionice_class: Optional[str] = Field(None, regex='^(realtime|best-effort|idle)$')
+    ionice_level: Optional[int] = Field(None, ge=0, le=7)
+    cpu_affinity: Optional[List[int]] = Field(None, min_items=1)
+    max_memory: Optional[int] = Field(None, gt=0)
+    max_cpu_seconds: Optional[int] = Field(None, gt=0)
+    max_open_files: Optional[int] = Field(None, gt=0)
+    cgroup: Optional[str] = Field(None, regex=r'^(?!/)(?!.*(^|/)\.\.(/|$)).+$')
+
+
+max_batch_executions = 200
+
+
+class OutputBatchInputModel(BaseModel):
+    executions: Dict[int, Optional[int]]
+
+    @validator('executions')
+    def limit_executions(cls, executions: Dict[int, Optional[int]]):
+        if len(executions) > max_batch_executions:
+            raise ValueError(f'at most {max_batch_executions} executions per request')
+        return executions
+
+
+class DependencyInputModel(BaseModel):
+    upstream_task_id: int
+    condition: str = Field('success', regex='^(success|failure)$')
 
 
 class TaskInputModel(BaseModel):
@@ -9,4 +45,20 @@ class TaskInputModel(BaseModel):
     descr: Union[str, None]
     command: str
     trigger_type: str
-    trigger_args: Union[str, Dict]
\ No newline at end of file
+    trigger_args: Union[str, Dict]
+    output_policy: Optional[OutputPolicyModel]
+    timeout: Optional[float] = Field(None, gt=0)
+    kill_grace: Optional[float] = Field(None, ge=0)
+    priority: Optional[str] = Field(None, regex='^(critical|high|normal|low)$')
+    jitter: Optional[float] = Field(None, ge=0)
+    resource_limits: Optional[ResourceLimitsModel]
+
+    @property
+    def output_policy_json(self) -> Union[str, None]:
+        if self.output_policy:
+            return self.output_policy.json(exclude_none=True)
+
+    @property
+    def resource_limits_json(self) -> Union[str, None]:
+        if self.resource_limits:
+            return self.resource_limits.json(exclude_none=True)
@@ -1,6 +1,10 @@
 from api.routers import (
     task_executor_router,
     task_router,
-    log_router
+    log_router,
+    search_router,
+    metrics_router,
+    archive_router,
+    debug_router
 )
 from api.routers._shared import router
\ No newline at end of file
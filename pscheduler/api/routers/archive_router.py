@@ -0,0 +1,48 @@
+import asyncio
+from datetime import date
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+from api.routers._shared import router
+from db.archive import HistoryArchive, get_history_archive
+
+
+def _archive() -> HistoryArchive:
+    archive = get_history_archive()
+    if archive is None:
+        raise HTTPException(status_code=404, detail='History archive is not configured')
+    return archive
+
+
+async def _query(archive: HistoryArchive, *args, **kwargs):
+    return await asyncio.get_event_loop().run_in_executor(None, lambda: archive.query(*args, **kwargs))
+
+
+@router.get('/archive/process_log', status_code=200)
+async def get_archived_process_logs(task_id: Optional[int] = None, since: Optional[date] = None,
+                                    until: Optional[date] = None, limit: int = Query(1000, gt=0, le=100000)):
+    archive = _archive()
+    process_logs = await _query(archive, 'process_log', task_id=task_id, since=since, until=until, limit=limit)
+    return {'process_logs': process_logs}
+
+
+@router.get('/archive/execution/output/{process_log_id}', status_code=200)
+async def get_archived_output_logs(process_log_id: int):
+    archive = _archive()
+    process_logs = await _query(archive, 'process_log', process_log_ids=[process_log_id])
+    if not process_logs:
+        raise HTTPException(status_code=404, detail=f'Execution {process_log_id} is not archived')
+
+    process_log = process_logs[0]
+    started = process_log['start_date'].date()
+    output_logs = await _query(archive, 'output_log', task_id=process_log['task_id'], since=started, until=started,
+                               process_log_ids=[process_log_id])
+    return {
+        'process_log': process_log,
+        'output_logs': [
+            {**log, 'error': bool(log['is_error'])}
+            for log
+            in output_logs
+        ]
+    }
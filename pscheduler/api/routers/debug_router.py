@@ -0,0 +1,80 @@
+import hmac
+import os
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from fastapi import Depends, Header, HTTPException, Query
+
+from api.routers._shared import router
+from scheduler.control import ControlPlane, get_control_plane
+
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Debug endpoints answer only with ``Authorization: Bearer <ADMIN_TOKEN>``, and do not exist without it."""
+    load_dotenv()
+    token = os.environ.get('ADMIN_TOKEN')
+    if not token:
+        raise HTTPException(status_code=404, detail='Debug endpoints are disabled')
+    scheme, _, credentials = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail='Invalid admin token')
+
+
+async def _profile(control_plane: ControlPlane, action: str, **args) -> Dict:
+    try:
+        return await control_plane.profile(action, args)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post('/debug/tracemalloc/start', status_code=200, dependencies=[Depends(require_admin)])
+async def start_tracemalloc(frames: int = Query(1, gt=0, le=100),
+                            control_plane: ControlPlane = Depends(get_control_plane)):
+    return await _profile(control_plane, 'tracemalloc_start', frames=frames)
+
+
+@router.post('/debug/tracemalloc/stop', status_code=200, dependencies=[Depends(require_admin)])
+async def stop_tracemalloc(control_plane: ControlPlane = Depends(get_control_plane)):
+    return await _profile(control_plane, 'tracemalloc_stop')
+
+
+@router.get('/debug/tracemalloc/top', status_code=200, dependencies=[Depends(require_admin)])
+async def get_top_allocations(limit: int = Query(20, gt=0, le=1000),
+                              group_by: str = Query('lineno', regex='^(lineno|filename|traceback)$'),
+                              control_plane: ControlPlane = Depends(get_control_plane)):
+    return await _profile(control_plane, 'top_allocations', limit=limit, group_by=group_by)
+
+
+@router.post('/debug/tracemalloc/snapshot', status_code=200, dependencies=[Depends(require_admin)])
+async def take_snapshot(control_plane: ControlPlane = Depends(get_control_plane)):
+    return await _profile(control_plane, 'snapshot')
+
+
+@router.get('/debug/tracemalloc/diff', status_code=200, dependencies=[Depends(require_admin)])
+async def get_snapshot_diff(limit: int = Query(20, gt=0, le=1000),
+                            group_by: str = Query('lineno', regex='^(lineno|filename|traceback)$'),
+                            control_plane: ControlPlane = Depends(get_control_plane)):
+    return await _profile(control_plane, 'diff', limit=limit, group_by=group_by)
+
+
+@router.get('/debug/objects', status_code=200, dependencies=[Depends(require_admin)])
+async def get_object_counts(control_plane: ControlPlane = Depends(get_control_plane)):
+    return await _profile(control_plane, 'objects')
+
+
+@router.post('/debug/cpu_profile/start', status_code=200, dependencies=[Depends(require_admin)])
+async def start_cpu_profile(seconds: float = Query(30, gt=0, le=600), interval: float = Query(0.005, gt=0, le=1),
+                            control_plane: ControlPlane = Depends(get_control_plane)):
+    return await _profile(control_plane, 'cpu_start', seconds=seconds, interval=interval)
+
+
+@router.post('/debug/cpu_profile/stop', status_code=200, dependencies=[Depends(require_admin)])
+async def stop_cpu_profile(limit: int = Query(50, gt=0, le=1000),
+                           control_plane: ControlPlane = Depends(get_control_plane)):
+    return await _profile(control_plane, 'cpu_stop', limit=limit)
+
+
+@router.get('/debug/cpu_profile', status_code=200, dependencies=[Depends(require_admin)])
+async def get_cpu_profile(limit: int = Query(50, gt=0, le=1000),
+                          control_plane: ControlPlane = Depends(get_control_plane)):
+    return await _profile(control_plane, 'cpu_profile', limit=limit)
@@ -1,7 +1,11 @@
-from typing import Optional
+import json
+import zlib
+from typing import AsyncGenerator, Dict, Optional
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
+from api.models import OutputBatchInputModel
 from api.routers._shared import router
 from db.dal import DAL, get_dal
 
@@ -38,3 +42,73 @@ async def get_output_logs(process_log_id: int, last_output_log_id: Optional[int]
         'status': status,
         'return_code': return_code
     }
+
+
+@router.post('/execution/output', status_code=200)
+async def get_output_logs_batch(batch: OutputBatchInputModel, db: DAL = Depends(get_dal)):
+    process_logs = await db.get_process_logs_by_id(batch.executions)
+    output_logs = await db.get_output_logs_batch({
+        process_log.process_log_id: batch.executions[process_log.process_log_id]
+        for process_log
+        in process_logs
+    })
+
+    executions = {
+        process_log.process_log_id: {
+            'output_logs': [],
+            'last_output_log_id': batch.executions[process_log.process_log_id],
+            'status': process_log.status,
+            'return_code': process_log.return_code
+        }
+        for process_log
+        in process_logs
+    }
+    for log in output_logs:
+        execution = executions[log.process_log_id]
+        execution['output_logs'].append(log.to_dict())
+        execution['last_output_log_id'] = log.output_log_id
+
+    return {'executions': executions}
+
+
+def _format_text(row: Dict) -> str:
+    return row['message']
+
+
+def _format_ndjson(row: Dict) -> str:
+    return json.dumps({
+        **row,
+        'time': row['time'].isoformat(),
+        'error': bool(row['is_error'])
+    }) + '\n'
+
+
+_download_formats = {
+    'text': (_format_text, 'text/plain; charset=utf-8', 'txt'),
+    'ndjson': (_format_ndjson, 'application/x-ndjson', 'ndjson')
+}
+
+
+@router.get('/execution/output/{process_log_id}/download', status_code=200)
+async def download_output_logs(process_log_id: int,
+                               output_format: str = Query('text', alias='format', regex='^(text|ndjson)$'),
+                               gzip: bool = False, db: DAL = Depends(get_dal)):
+    if not await db.get_process_log(process_log_id):
+        raise HTTPException(status_code=404, detail=f'Execution {process_log_id} not found')
+
+    format_row, media_type, extension = _download_formats[output_format]
+    bind = (await db.session_for_executions([process_log_id])).bind
+
+    async def content() -> AsyncGenerator[bytes, None]:
+        compressor = zlib.compressobj(wbits=31) if gzip else None
+        async for rows in db.stream_output_logs(process_log_id, bind=bind):
+            chunk = ''.join(format_row(row._mapping) for row in rows).encode()
+            yield compressor.compress(chunk) if compressor else chunk
+        if compressor:
+            yield compressor.flush()
+
+    filename = f'output-{process_log_id}.{extension}'
+    if gzip:
+        media_type, filename = 'application/gzip', filename + '.gz'
+    return StreamingResponse(content(), media_type=media_type,
+                             headers={'Content-Disposition': f'attachment; filename="{filename}"'})
@@ -0,0 +1,11 @@
+from api.routers._shared import router
+from util.loop_monitor import get_loop_monitor
+from util.mirror import get_console_mirror
+
+
+@router.get('/metrics/loop', status_code=200)
+async def get_loop_metrics():
+    return {
+        'loop_lag': get_loop_monitor().to_dict(),
+        'console_mirror': get_console_mirror().to_dict()
+    }
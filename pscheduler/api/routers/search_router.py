@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query
+
+from api.routers._shared import router
+from db.dal import DAL, get_dal
+
+
+@router.get('/search/output', status_code=200)
+async def search_output(q: str, task_id: Optional[int] = None, since: Optional[datetime] = None,
+                        last_output_log_id: Optional[int] = None, limit: int = Query(100, gt=0, le=1000),
+                        db: DAL = Depends(get_dal)):
+    try:
+        results = await db.search_output_logs(q, task_id, since, last_output_log_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if results:
+        last_output_log_id = results[-1][0].output_log_id
+
+    return {
+        'results': [
+            {
+                'output_log': output_log.to_dict(),
+                'process_log': process_log.to_dict()
+            }
+            for output_log, process_log
+            in results
+        ],
+        'last_output_log_id': last_output_log_id
+    }
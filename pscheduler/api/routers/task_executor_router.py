@@ -1,28 +1,56 @@
-from api.routers._shared import router, execution_manager, TaskNotFound
+import json
+from typing import Optional
+
+from fastapi import Depends, Query
+from fastapi.responses import StreamingResponse
+
+from api.routers._shared import router, TaskNotFound
+from scheduler.control import ControlPlane, get_control_plane
 
 
 @router.get('/executor', status_code=200)
-async def get_executors():
-    return {'task_executors': [
-        executor.to_dict()
-        for task_id, executor
-        in execution_manager.task_executors.items()
-    ]}
+async def get_executors(since: Optional[int] = Query(None, ge=0),
+                        control_plane: ControlPlane = Depends(get_control_plane)):
+    """All executors, or with ``since`` only those changed after that version; ``since=0`` starts polling."""
+    if since is None:
+        return {'task_executors': await control_plane.executors()}
+    return await control_plane.executor_changes(since)
+
+
+@router.get('/executor/events', status_code=200)
+async def get_executor_events(control_plane: ControlPlane = Depends(get_control_plane)):
+    """Executor status changes and syncs as they happen, one JSON object per line."""
+    async def events():
+        async for event in control_plane.subscribe():
+            yield json.dumps(event) + '\n'
+
+    return StreamingResponse(events(), media_type='application/x-ndjson')
+
+
+@router.get('/executor/admission', status_code=200)
+async def get_admission(control_plane: ControlPlane = Depends(get_control_plane)):
+    return {'admission': await control_plane.admission()}
+
+
+@router.get('/executor/forecast', status_code=200)
+async def get_forecast(minutes: int = Query(60, gt=0, le=24 * 60), bucket_seconds: int = Query(60, gt=0),
+                       control_plane: ControlPlane = Depends(get_control_plane)):
+    return {'forecast': await control_plane.forecast(minutes, bucket_seconds)}
 
 
 @router.post('/run_executor/{task_id}', status_code=200)
-async def run_executor(task_id: int):
+async def run_executor(task_id: int, control_plane: ControlPlane = Depends(get_control_plane)):
     try:
-        execution_manager.run_task(task_id)
+        await control_plane.run_task(task_id)
         return {'task_id': task_id}
     except KeyError:
         raise TaskNotFound(task_id)
 
 
 @router.post('/stop_executor/{task_id}', status_code=200)
-async def stop_executor(task_id: int):
+async def stop_executor(task_id: int, control_plane: ControlPlane = Depends(get_control_plane)):
     try:
-        execution_manager.stop_task(task_id)
+        await control_plane.stop_task(task_id)
         return {'task_id': task_id}
     except KeyError:
-        raise TaskNotFound(task_id)
\ No newline at end of file
+        raise TaskNotFound(task_id)
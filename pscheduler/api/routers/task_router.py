@@ -1,8 +1,12 @@
-from fastapi import HTTPException, Depends
+from datetime import datetime, timedelta
 
-from api.models import TaskInputModel
+from fastapi import HTTPException, Depends, Query
+
+from api.models import TaskInputModel, DependencyInputModel
 from api.routers._shared import router, TaskNotFound
 from db.dal import DAL, get_dal
+from db.models import TaskStats
+from scheduler.stats import TaskStatsRecorder
 
 
 @router.get('/task', status_code=200)
@@ -24,6 +28,38 @@ async def get_task(task_id: int, db: DAL = Depends(get_dal)):
         raise TaskNotFound(task_id)
 
 
+@router.get('/task/{task_id}/stats', status_code=200)
+async def get_task_stats(task_id: int, hours: int = Query(24, gt=0, le=24 * 90), db: DAL = Depends(get_dal)):
+    stats = await db.get_task_stats(task_id)
+    if not stats:
+        if not await db.get_task(task_id):
+            raise TaskNotFound(task_id)
+        stats = TaskStats(task_id)
+
+    since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours)
+    buckets = await db.get_task_stats_buckets(task_id, since)
+
+    return {
+        'stats': TaskStatsRecorder.describe(stats),
+        'hourly': [
+            bucket.to_dict()
+            for bucket
+            in buckets
+        ]
+    }
+
+
+@router.get('/stats/tasks', status_code=200)
+async def get_top_task_stats(order_by: str = Query('cpu_time', regex='^(cpu_time|max_rss|io_blocks)$'),
+                             limit: int = Query(10, gt=0, le=1000), db: DAL = Depends(get_dal)):
+    stats = await db.get_top_task_stats(order_by, limit)
+    return {'stats': [
+        TaskStatsRecorder.describe(task_stats)
+        for task_stats
+        in stats
+    ]}
+
+
 @router.post('/task', status_code=201)
 async def add_task(task: TaskInputModel, db: DAL = Depends(get_dal)):
     try:
@@ -42,3 +78,31 @@ async def delete_task(task_id: int, db: DAL = Depends(get_dal)):
 @router.post('/task/{task_id}', status_code=200)
 async def update_task(task_id: int, task: TaskInputModel, db: DAL = Depends(get_dal)):
     await db.update_task(task_id, task)
+
+
+@router.get('/task/{task_id}/dependency', status_code=200)
+async def get_dependencies(task_id: int, db: DAL = Depends(get_dal)):
+    if not await db.get_task(task_id):
+        raise TaskNotFound(task_id)
+
+    dependencies = await db.get_dependencies(task_id)
+    return {'dependencies': [
+        dependency.to_dict()
+        for dependency
+        in dependencies
+    ]}
+
+
+@router.post('/task/{task_id}/dependency', status_code=201)
+async def add_dependency(task_id: int, dependency: DependencyInputModel, db: DAL = Depends(get_dal)):
+    try:
+        new_dependency = await db.add_dependency(task_id, dependency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {'dependency': new_dependency.to_dict()}
+
+
+@router.delete('/task/{task_id}/dependency/{upstream_task_id}', status_code=200)
+async def delete_dependency(task_id: int, upstream_task_id: int, db: DAL = Depends(get_dal)):
+    await db.delete_dependency(task_id, upstream_task_id)
@@ -0,0 +1,261 @@
+"""Parquet archive of aged execution history.
+
+    PYTHONPATH=pscheduler python -m db.archive --older-than-days 90
+
+Requires the optional ``pyarrow`` package.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Union
+
+from dotenv import load_dotenv
+from sqlalchemy import Column, DateTime, Float, Integer, Table, select, delete, update
+from sqlalchemy.engine import Row
+
+from db.connection import Session
+from db.models import ProcessLog, OutputLog, ExecutionState
+from util.loop import new_event_loop
+
+
+log = logging.getLogger(__name__)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('The history archive requires the pyarrow package')
+    return pyarrow
+
+
+class HistoryArchive:
+    """Moves finished executions older than ``after_days`` out of the hot tables into Parquet files.
+
+    ``process_log`` and ``output_log`` rows are streamed out in batches of
+    ``batch_size`` executions, newest first so child runs leave before their
+    parents, and written as zstd-compressed Parquet under
+    ``<directory>/<table>/date=<start date>/task_id=<task>/``. The rows of a
+    batch are deleted once its files are written. File names are derived
+    from the batch's process_log_id range, so rerunning a batch interrupted
+    between the write and the delete rewrites the same files.
+
+    ``query`` scans the archive with the task and date predicates pushed
+    down to the partition directories and the remaining ones to the Parquet
+    row groups.
+    """
+    tables = ('process_log', 'output_log')
+    default_after_days = 30
+    default_batch_size = 1000
+    output_chunk_size = 50000
+    default_interval = 3600
+    unfinished_states = (ExecutionState.AWAITING, ExecutionState.STARTED)
+
+    def __init__(self, directory: str, after_days: float = default_after_days, batch_size: int = default_batch_size):
+        self.directory = directory
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self._archive_task: Union[asyncio.Task, None] = None
+
+    @classmethod
+    def from_env(cls) -> Union['HistoryArchive', None]:
+        """Archive in ``ARCHIVE_DIR``, or None when archiving is not configured."""
+        load_dotenv()
+        directory = os.environ.get('ARCHIVE_DIR')
+        if not directory:
+            return None
+        return cls(directory,
+                   float(os.environ.get('ARCHIVE_AFTER_DAYS', cls.default_after_days)),
+                   int(os.environ.get('ARCHIVE_BATCH_SIZE', cls.default_batch_size)))
+
+    @staticmethod
+    def _arrow_type(column: Column):
+        pa = _pyarrow()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp('us')
+        return pa.string()
+
+    def schema(self, table: Table):
+        """Arrow schema of an archived table, with the ``task_id`` and ``date`` partition columns."""
+        pa = _pyarrow()
+        fields = [pa.field(column.name, self._arrow_type(column)) for column in table.columns]
+        if 'task_id' not in table.columns:
+            fields.append(pa.field('task_id', pa.int64()))
+        return pa.schema(fields + [pa.field('date', pa.string())])
+
+    def partitioning(self):
+        pa = _pyarrow()
+        return pa.dataset.partitioning(pa.schema([('date', pa.string()), ('task_id', pa.int64())]), flavor='hive')
+
+    async def archive(self, before: datetime = None) -> Dict[str, int]:
+        """Archive and delete finished executions started before ``before`` and return the rows moved per table.
+
+        ``before`` defaults to ``after_days`` ago.
+        """
+        _pyarrow()
+        before = before or datetime.utcnow() - timedelta(days=self.after_days)
+        loop = asyncio.get_event_loop()
+        counts = dict.fromkeys(self.tables, 0)
+        unfinished = [state.name.lower() for state in self.unfinished_states]
+        while True:
+            async with Session() as session:
+                rs = await session.execute(
+                    select(ProcessLog.__table__).
+                    filter(ProcessLog.start_date < before).
+                    filter(ProcessLog.status.notin_(unfinished)).
+                    order_by(ProcessLog.process_log_id.desc()).
+                    limit(self.batch_size)
+                )
+                process_logs = rs.all()
+                if not process_logs:
+                    return counts
+
+                ids = [row.process_log_id for row in process_logs]
+                partitions = {
+                    row.process_log_id: (row.task_id, row.start_date.date().isoformat())
+                    for row
+                    in process_logs
+                }
+                tag = f'{min(ids):012d}-{max(ids):012d}'
+
+                await loop.run_in_executor(None, self._write, 'process_log', process_logs, partitions, tag)
+                counts['process_log'] += len(process_logs)
+
+                rs = await session.stream(
+                    select(OutputLog.__table__).
+                    filter(OutputLog.process_log_id.in_(ids)).
+                    order_by(OutputLog.output_log_id).
+                    execution_options(yield_per=self.output_chunk_size)
+                )
+                chunk_number = 0
+                async for rows in rs.partitions(self.output_chunk_size):
+                    await loop.run_in_executor(None, self._write, 'output_log', rows, partitions,
+                                               f'{tag}-{chunk_number:04d}')
+                    counts['output_log'] += len(rows)
+                    chunk_number += 1
+
+                await session.execute(
+                    delete(OutputLog).
+                    filter(OutputLog.process_log_id.in_(ids))
+                )
+                await session.execute(
+                    update(ProcessLog).
+                    filter(ProcessLog.parent_run_id.in_(ids)).
+                    values(parent_run_id=None)
+                )
+                await session.execute(
+                    delete(ProcessLog).
+                    filter(ProcessLog.process_log_id.in_(ids))
+                )
+                await session.commit()
+
+    def _write(self, table_name: str, rows: List[Row], partitions: Dict[int, tuple], tag: str):
+        pa = _pyarrow()
+        schema = self.schema(ProcessLog.__table__ if table_name == 'process_log' else OutputLog.__table__)
+        columns = {name: [] for name in schema.names}
+        for row in rows:
+            mapping = row._mapping
+            task_id, start_date = partitions[mapping['process_log_id']]
+            for name, values in columns.items():
+                if name == 'task_id':
+                    values.append(task_id)
+                elif name == 'date':
+                    values.append(start_date)
+                else:
+                    values.append(mapping[name])
+
+        pa.dataset.write_dataset(
+            pa.table(columns, schema=schema),
+            os.path.join(self.directory, table_name),
+            format='parquet',
+            partitioning=self.partitioning(),
+            basename_template=f'part-{tag}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+            file_options=pa.dataset.ParquetFileFormat().make_write_options(compression='zstd')
+        )
+
+    def query(self, table_name: str = 'process_log', task_id: int = None, since: date = None, until: date = None,
+              process_log_ids: Iterable[int] = None, limit: int = None) -> List[Dict]:
+        """Archived rows of ``table_name`` matching every given predicate, in id order.
+
+        ``since`` and ``until`` bound the execution start date, both inclusive.
+        """
+        if table_name not in self.tables:
+            raise ValueError(f"No archived table '{table_name}'")
+        pa = _pyarrow()
+        path = os.path.join(self.directory, table_name)
+        if not os.path.isdir(path):
+            return []
+
+        field = pa.dataset.field
+        predicates = []
+        if task_id is not None:
+            predicates.append(field('task_id') == task_id)
+        if since is not None:
+            predicates.append(field('date') >= since.isoformat())
+        if until is not None:
+            predicates.append(field('date') <= until.isoformat())
+        if process_log_ids is not None:
+            predicates.append(field('process_log_id').isin(list(process_log_ids)))
+
+        expression = None
+        for predicate in predicates:
+            expression = predicate if expression is None else expression & predicate
+
+        dataset = pa.dataset.dataset(path, format='parquet', partitioning=self.partitioning())
+        result = dataset.to_table(filter=expression).sort_by(f'{table_name}_id')
+        if limit is not None:
+            result = result.slice(0, limit)
+        return result.to_pylist()
+
+    def start(self, interval: float = default_interval):
+        if self._archive_task is None:
+            self._archive_task = asyncio.get_event_loop().create_task(self._archive_periodically(interval))
+
+    async def _archive_periodically(self, interval: float):
+        while True:
+            try:
+                counts = await self.archive()
+                if any(counts.values()):
+                    log.info('Archived %s process logs and %s output logs',
+                             counts['process_log'], counts['output_log'])
+            except Exception:
+                log.exception('Archiving execution history failed, retrying in %ss', interval)
+            await asyncio.sleep(interval)
+
+
+_unset = object()
+_history_archive: Union[HistoryArchive, None, object] = _unset
+
+
+def get_history_archive() -> Union[HistoryArchive, None]:
+    global _history_archive
+    if _history_archive is _unset:
+        _history_archive = HistoryArchive.from_env()
+    return _history_archive
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=HistoryArchive.__doc__.splitlines()[0])
+    parser.add_argument('--older-than-days', type=float, default=HistoryArchive.default_after_days)
+    parser.add_argument('--directory', default=os.environ.get('ARCHIVE_DIR'))
+    parser.add_argument('--batch-size', type=int, default=HistoryArchive.default_batch_size)
+    args = parser.parse_args()
+    if not args.directory:
+        parser.error('--directory or ARCHIVE_DIR is required')
+
+    archive = HistoryArchive(args.directory, args.older_than_days, args.batch_size)
+    print(new_event_loop().run_until_complete(archive.archive()))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,12 @@
+import logging
 import os
+import time
 
 from contextlib import asynccontextmanager
 from typing import ContextManager, Callable, TypeVar, Union
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker as sqlalchemy_sessionmaker, Session as NormalSession
 
 
@@ -14,23 +17,110 @@ def sessionmaker(bind, class_: T) -> T:
     return sqlalchemy_sessionmaker(bind, class_)
 
 
-try:
+log = logging.getLogger(__name__)
+
+engine: Union[AsyncEngine, None] = None
+
+
+def connection_string() -> str:
     load_dotenv()
-    user = os.environ['DB_USER']
-    pwd = os.environ['DB_PASS']
-    host = os.environ['DB_HOST']
-    port = os.environ['DB_PORT']
-    database = os.environ['DB_DATABASE']
-    conn_str = f"postgresql+asyncpg://{user}:{pwd}@{host}:{port}/{database}"
+    if os.environ.get('DB_URL'):
+        return os.environ['DB_URL']
+    try:
+        user = os.environ['DB_USER']
+        pwd = os.environ['DB_PASS']
+        host = os.environ['DB_HOST']
+        port = os.environ['DB_PORT']
+        database = os.environ['DB_DATABASE']
+    except KeyError as e:
+        raise RuntimeError(f'Missing key {e.args[0]} in connection config')
+    return f"postgresql+asyncpg://{user}:{pwd}@{host}:{port}/{database}"
+
 
+def configure(conn_str: str) -> AsyncEngine:
+    global engine
     engine = create_async_engine(conn_str)
-except KeyError as e:
-    print(f'Missing key {e.args[0]} in connection config')
-    exit(1)
+    return engine
+
+
+def get_engine() -> AsyncEngine:
+    """Return the engine, building it from the environment on first use."""
+    if engine is None:
+        return configure(connection_string())
+    return engine
 
 
 def Session(*args, **kwargs):
-    return AsyncSession(bind=engine, *args, **kwargs)
+    return AsyncSession(bind=get_engine(), *args, **kwargs)
+
+
+class Replica:
+    """Read-only engine of a streaming replica, used while it lags the primary by at most ``max_lag`` seconds.
+
+    The lag is measured at most every ``lag_check_interval`` seconds. An
+    unreachable replica counts as too stale, so reads fall back to the
+    primary until it answers again.
+    """
+    default_max_lag = 5.0
+    lag_check_interval = 1.0
+
+    def __init__(self, replica_engine: AsyncEngine, max_lag: float = default_max_lag,
+                 clock: Callable[[], float] = time.monotonic):
+        self.engine = replica_engine
+        self.max_lag = max_lag
+        self._clock = clock
+        self._lag: Union[float, None] = None
+        self._checked_at: Union[float, None] = None
+
+    async def measure_lag(self) -> float:
+        async with self.engine.connect() as conn:
+            if conn.dialect.name != 'postgresql':
+                return 0.0
+            lag = await conn.scalar(text(
+                'SELECT CASE WHEN NOT pg_is_in_recovery() '
+                'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+            ))
+            return float(lag or 0.0)
+
+    async def lag(self) -> Union[float, None]:
+        """Replication lag in seconds, None while the replica is unreachable."""
+        now = self._clock()
+        if self._checked_at is None or now - self._checked_at >= self.lag_check_interval:
+            self._checked_at = now
+            try:
+                self._lag = await self.measure_lag()
+            except Exception:
+                log.warning('Read replica is unreachable, reading from the primary', exc_info=True)
+                self._lag = None
+        return self._lag
+
+    async def usable(self) -> bool:
+        lag = await self.lag()
+        return lag is not None and lag <= self.max_lag
+
+    def session(self, *args, **kwargs) -> AsyncSession:
+        return AsyncSession(bind=self.engine, *args, **kwargs)
+
+
+_unset = object()
+replica: Union[Replica, None, object] = _unset
+
+
+def configure_replica(conn_str: Union[str, None], max_lag: float = Replica.default_max_lag) -> Union[Replica, None]:
+    """Route history reads to the database at ``conn_str``, or back to the primary when it is None."""
+    global replica
+    replica = Replica(create_async_engine(conn_str), max_lag) if conn_str else None
+    return replica
+
+
+def get_replica() -> Union[Replica, None]:
+    """Return the replica configured by ``DB_REPLICA_URL``, None when reads go to the primary."""
+    if replica is _unset:
+        load_dotenv()
+        return configure_replica(os.environ.get('DB_REPLICA_URL'),
+                                 float(os.environ.get('DB_REPLICA_MAX_LAG', Replica.default_max_lag)))
+    return replica
 
 
 @asynccontextmanager
@@ -44,4 +134,4 @@ async def session_scope() -> ContextManager[AsyncSession]:
         await session.rollback()
         raise
     finally:
-        await session.close()
\ No newline at end of file
+        await session.close()
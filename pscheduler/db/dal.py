@@ -1,20 +1,62 @@
 import json
-from typing import List
+from datetime import datetime, timedelta
+from typing import AsyncGenerator, Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy import select, delete, update
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, and_, or_
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine
 
-from api.models import TaskInputModel
-from db.connection import Session
-from db.models import ProcessLog, OutputLog
-from scheduler.executor import ExecutionManager
+from api.models import TaskInputModel, DependencyInputModel
+from db.connection import Session, get_replica
+from db.models import ProcessLog, OutputLog, TaskStats, TaskStatsBucket, TaskDependency, WorkItem
+from db.search import get_search_index
+from scheduler.dag import TaskGraph
+from scheduler.control import ControlPlane, get_control_plane
 from scheduler.task import Task, TaskFactory
 
 
 class DAL:
-    def __init__(self, db_session: AsyncSession, execution_manager: ExecutionManager):
+    """Queries behind the API.
+
+    Writes, task reads and reads of running executions use ``session`` on
+    the primary. History reads use ``read_session``, which is a replica
+    session while the replica lags by at most ``max_lag`` seconds and the
+    primary session otherwise.
+    """
+    settle_seconds = 5.0
+
+    def __init__(self, db_session: AsyncSession, control_plane: ControlPlane, read_session: AsyncSession = None,
+                 max_lag: float = 0.0):
         self.session = db_session
-        self.execution_manager = execution_manager
+        self.control_plane = control_plane
+        self.read_session = read_session or db_session
+        self.max_lag = max_lag
+
+    async def session_for_executions(self, process_log_ids: Iterable[int]) -> AsyncSession:
+        """Read session for output of the given executions.
+
+        The replica only serves executions that finished more than
+        ``max_lag`` plus ``settle_seconds`` ago, the latter covering output
+        flushed after the finish, so polling a running execution reads its
+        own writes on the primary.
+        """
+        if self.read_session is self.session:
+            return self.session
+
+        process_log_ids = set(process_log_ids)
+        rs = await self.session.execute(
+            select(ProcessLog.finish_date).
+            filter(ProcessLog.process_log_id.in_(list(process_log_ids)))
+        )
+        finish_dates = rs.scalars().all()
+        settled_before = datetime.utcnow() - timedelta(seconds=self.max_lag + self.settle_seconds)
+        if len(finish_dates) == len(process_log_ids) and all(
+                finish_date is not None and finish_date <= settled_before
+                for finish_date
+                in finish_dates
+        ):
+            return self.read_session
+        return self.session
 
     async def get_tasks(self) -> List[Task]:
         rs = await self.session.execute(
@@ -31,19 +73,41 @@ class DAL:
 
     async def add_task(self, task: TaskInputModel):
         new_task = TaskFactory.create(task.title, task.command, task.trigger_type, task.trigger_args, descr=task.descr)
+        new_task.output_policy = task.output_policy_json
+        new_task.timeout = task.timeout
+        new_task.kill_grace = task.kill_grace
+        new_task.priority = task.priority
+        new_task.jitter = task.jitter
+        new_task.resource_limits = task.resource_limits_json
         self.session.add(new_task)
 
         await self.session.commit()
-        await self.execution_manager.sync()
+        await self.control_plane.sync()
         return new_task
 
     async def delete_task(self, task_id: int):
+        await self.session.execute(
+            delete(WorkItem).
+            filter(WorkItem.task_id == task_id)
+        )
+        await self.session.execute(
+            delete(TaskDependency).
+            filter((TaskDependency.upstream_task_id == task_id) | (TaskDependency.downstream_task_id == task_id))
+        )
+        await self.session.execute(
+            delete(TaskStatsBucket).
+            filter(TaskStatsBucket.task_id == task_id)
+        )
+        await self.session.execute(
+            delete(TaskStats).
+            filter(TaskStats.task_id == task_id)
+        )
         await self.session.execute(
             delete(Task).
             filter(Task.task_id == task_id)
         )
         await self.session.commit()
-        await self.execution_manager.sync()
+        await self.control_plane.sync()
 
     async def update_task(self, task_id: int, task: TaskInputModel):
         await self.session.execute(
@@ -54,14 +118,82 @@ class DAL:
                 title=task.title,
                 descr=task.descr,
                 trigger_args=json.dumps(task.trigger_args).strip('"'),
-                trigger_type=task.trigger_type
+                trigger_type=task.trigger_type,
+                output_policy=task.output_policy_json,
+                timeout=task.timeout,
+                kill_grace=task.kill_grace,
+                priority=task.priority,
+                jitter=task.jitter,
+                resource_limits=task.resource_limits_json
             )
         )
         await self.session.commit()
-        await self.execution_manager.sync()
+        await self.control_plane.sync()
 
-    async def get_process_logs(self) -> List[ProcessLog]:
+    async def get_dependencies(self, task_id: int) -> List[TaskDependency]:
         rs = await self.session.execute(
+            select(TaskDependency).
+            filter(TaskDependency.downstream_task_id == task_id).
+            order_by(TaskDependency.upstream_task_id)
+        )
+        return rs.scalars().all()
+
+    async def add_dependency(self, task_id: int, dependency: DependencyInputModel) -> TaskDependency:
+        for required_id in (task_id, dependency.upstream_task_id):
+            if not await self.get_task(required_id):
+                raise ValueError(f'task {required_id} not found')
+
+        rs = await self.session.execute(
+            select(TaskDependency)
+        )
+        graph = TaskGraph(
+            (edge.upstream_task_id, edge.downstream_task_id, edge.condition)
+            for edge
+            in rs.scalars()
+            if (edge.upstream_task_id, edge.downstream_task_id) != (dependency.upstream_task_id, task_id)
+        )
+        if graph.would_create_cycle(dependency.upstream_task_id, task_id):
+            raise ValueError(f'dependency {dependency.upstream_task_id} -> {task_id} would create a cycle')
+
+        new_dependency = TaskDependency(dependency.upstream_task_id, task_id, dependency.condition)
+        await self.session.merge(new_dependency)
+        await self.session.commit()
+        await self.control_plane.sync()
+        return new_dependency
+
+    async def delete_dependency(self, task_id: int, upstream_task_id: int):
+        await self.session.execute(
+            delete(TaskDependency).
+            filter(TaskDependency.upstream_task_id == upstream_task_id).
+            filter(TaskDependency.downstream_task_id == task_id)
+        )
+        await self.session.commit()
+        await self.control_plane.sync()
+
+    async def get_task_stats(self, task_id: int) -> TaskStats:
+        return await self.read_session.get(TaskStats, task_id)
+
+    async def get_task_stats_buckets(self, task_id: int, since: datetime) -> List[TaskStatsBucket]:
+        rs = await self.read_session.execute(
+            select(TaskStatsBucket).
+            filter(TaskStatsBucket.task_id == task_id).
+            filter(TaskStatsBucket.hour >= since).
+            order_by(TaskStatsBucket.hour)
+        )
+        return rs.scalars().all()
+
+    async def get_top_task_stats(self, order_by: str, limit: int) -> List[TaskStats]:
+        column = getattr(TaskStats, order_by)
+        rs = await self.read_session.execute(
+            select(TaskStats).
+            filter(column.isnot(None)).
+            order_by(column.desc()).
+            limit(limit)
+        )
+        return rs.scalars().all()
+
+    async def get_process_logs(self) -> List[ProcessLog]:
+        rs = await self.read_session.execute(
             select(ProcessLog).
             order_by(ProcessLog.process_log_id)
         )
@@ -80,11 +212,84 @@ class DAL:
         if last_output_log_id:
             q = q.filter(OutputLog.output_log_id > last_output_log_id)
 
-        rs = await self.session.execute(q)
+        session = await self.session_for_executions([process_log_id])
+        rs = await session.execute(q)
         return rs.scalars().all()
 
+    async def get_process_logs_by_id(self, process_log_ids: Iterable[int]) -> List[ProcessLog]:
+        rs = await self.session.execute(
+            select(ProcessLog).
+            filter(ProcessLog.process_log_id.in_(list(process_log_ids)))
+        )
+        return rs.scalars().all()
+
+    async def get_output_logs_batch(self, cursors: Dict[int, Optional[int]]) -> List[OutputLog]:
+        """New output of several executions, given each one's last seen output_log_id, in one query."""
+        if not cursors:
+            return []
+
+        session = await self.session_for_executions(cursors)
+        rs = await session.execute(
+            select(OutputLog).
+            filter(or_(*(
+                and_(OutputLog.process_log_id == process_log_id, OutputLog.output_log_id > (last_output_log_id or 0))
+                for process_log_id, last_output_log_id
+                in cursors.items()
+            ))).
+            order_by(OutputLog.process_log_id, OutputLog.output_log_id)
+        )
+        return rs.scalars().all()
+
+    @staticmethod
+    async def stream_output_logs(process_log_id: int, chunk_size: int = 1000,
+                                 bind: AsyncEngine = None) -> AsyncGenerator[List[Row], None]:
+        """Output rows of an execution in chunks, read through a server-side cursor.
+
+        The stream runs in a session of its own on ``bind``, the primary by
+        default, so it can outlive the request that started it.
+        """
+        async with (AsyncSession(bind=bind) if bind else Session()) as session:
+            rs = await session.stream(
+                select(OutputLog.__table__).
+                filter(OutputLog.process_log_id == process_log_id).
+                order_by(OutputLog.output_log_id).
+                execution_options(yield_per=chunk_size)
+            )
+            async for rows in rs.partitions(chunk_size):
+                yield rows
+
+    async def search_output_logs(self, query: str, task_id: int = None, since: datetime = None,
+                                 last_output_log_id: int = None, limit: int = 100) -> List[Tuple[OutputLog, ProcessLog]]:
+        search_index = get_search_index(self.read_session.bind.dialect.name)
+        if not search_index.tokenize(query):
+            return []
+
+        q = (
+            select(OutputLog, ProcessLog).
+            join(ProcessLog, ProcessLog.process_log_id == OutputLog.process_log_id).
+            filter(search_index.match(query))
+        )
+        if task_id:
+            q = q.filter(ProcessLog.task_id == task_id)
+        if since:
+            q = q.filter(OutputLog.time >= since)
+        if last_output_log_id:
+            q = q.filter(OutputLog.output_log_id > last_output_log_id)
+
+        rs = await self.read_session.execute(
+            q.order_by(OutputLog.output_log_id).
+            limit(limit)
+        )
+        return rs.all()
+
 
 async def get_dal():
     async with Session(expire_on_commit=False) as session:
         async with session.begin():
-            yield DAL(session, ExecutionManager())
\ No newline at end of file
+            replica = get_replica()
+            if replica is None or not await replica.usable():
+                yield DAL(session, get_control_plane())
+                return
+
+            async with replica.session(expire_on_commit=False) as read_session:
+                yield DAL(session, get_control_plane(), read_session, replica.max_lag)
\ No newline at end of file
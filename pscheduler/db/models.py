@@ -2,10 +2,11 @@ from __future__ import annotations
 
 from abc import ABCMeta, abstractmethod
 import datetime
+import json
 
 from enum import Enum, auto
 
-from sqlalchemy import Column, Text, Integer, DateTime, ForeignKey, Index
+from sqlalchemy import Column, Text, Integer, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import declarative_base, DeclarativeMeta
 
 
@@ -27,6 +28,12 @@ class TaskModel(Base):
     trigger_args = Column(Text, nullable=False)
     starting_date = Column(DateTime)
     last_run = Column(DateTime)
+    output_policy = Column(Text)
+    timeout = Column(Float)
+    kill_grace = Column(Float)
+    priority = Column(Text)
+    jitter = Column(Float)
+    resource_limits = Column(Text)
 
     __mapper_args__ = {
         'polymorphic_on': trigger_type,
@@ -37,15 +44,48 @@ class TaskModel(Base):
         return f'TaskModel({self.task_id}, {self.trigger_type}, {self.command}, {self.trigger_args})'
 
 
+class TaskDependency(Base):
+    __tablename__ = 'task_dependency'
+
+    upstream_task_id = Column(Integer, ForeignKey('task.task_id'), primary_key=True)
+    downstream_task_id = Column(Integer, ForeignKey('task.task_id'), primary_key=True)
+    condition = Column(Text, nullable=False)
+
+    def __init__(self, upstream_task_id: int, downstream_task_id: int, condition: str = 'success'):
+        self.upstream_task_id = upstream_task_id
+        self.downstream_task_id = downstream_task_id
+        self.condition = condition
+
+    def to_dict(self):
+        return {
+            'upstream_task_id': self.upstream_task_id,
+            'downstream_task_id': self.downstream_task_id,
+            'condition': self.condition
+        }
+
+    def __repr__(self):
+        return f"TaskDependency({self.upstream_task_id}, {self.downstream_task_id}, '{self.condition}')"
+
+
 class ProcessLog(Base):
     __tablename__ = 'process_log'
 
     process_log_id = Column(Integer, primary_key=True, autoincrement=True)
     task_id = Column(Integer, ForeignKey('task.task_id'), nullable=False)
+    parent_run_id = Column(Integer, ForeignKey('process_log.process_log_id'))
     status = Column(Text, nullable=False)
+    planned_date = Column(DateTime)
     start_date = Column(DateTime, default=datetime.datetime.utcnow)
     finish_date = Column(DateTime)
     return_code = Column(Integer)
+    queue_wait = Column(Float)
+    cpu_user = Column(Float)
+    cpu_system = Column(Float)
+    max_rss = Column(Integer)
+    io_read_blocks = Column(Integer)
+    io_write_blocks = Column(Integer)
+    ctx_voluntary = Column(Integer)
+    ctx_involuntary = Column(Integer)
 
     def __init__(self, task_id: int, start_date: datetime.datetime = None):
         self.task_id = task_id
@@ -57,6 +97,20 @@ class ProcessLog(Base):
         self.status = state.name.lower()
         self.state = state
 
+    def set_resource_usage(self, rusage):
+        self.cpu_user = rusage.ru_utime
+        self.cpu_system = rusage.ru_stime
+        self.max_rss = rusage.ru_maxrss
+        self.io_read_blocks = rusage.ru_inblock
+        self.io_write_blocks = rusage.ru_oublock
+        self.ctx_voluntary = rusage.ru_nvcsw
+        self.ctx_involuntary = rusage.ru_nivcsw
+
+    @property
+    def cpu_time(self):
+        if self.cpu_user is not None:
+            return self.cpu_user + self.cpu_system
+
     @property
     def state(self) -> ExecutionState:
         return getattr(ExecutionState, self.status.upper())
@@ -77,18 +131,123 @@ class ProcessLog(Base):
         return f"ProcessLog({self.task_id}, '{self.status}', {self.start_date}, {self.finish_date})"
 
 
+class WorkItem(Base):
+    """A run waiting in the work queue for a worker agent, or claimed by one."""
+    __tablename__ = 'work_queue'
+    __table_args__ = (
+        Index('work_queue_claim_index', 'status', 'weight', 'work_item_id'),
+    )
+
+    work_item_id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(Integer, ForeignKey('task.task_id'), nullable=False)
+    parent_run_id = Column(Integer, ForeignKey('process_log.process_log_id'))
+    planned_date = Column(DateTime)
+    weight = Column(Integer, nullable=False)
+    status = Column(Text, nullable=False)
+    enqueued_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    attempts = Column(Integer, nullable=False, default=0)
+    agent_id = Column(Text)
+    claimed_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    process_log_id = Column(Integer, ForeignKey('process_log.process_log_id'))
+    dropped_lines = Column(Integer)
+    dropped_bytes = Column(Integer)
+
+    def __init__(self, task_id: int, weight: int, planned_date: datetime.datetime = None, parent_run_id: int = None):
+        self.task_id = task_id
+        self.weight = weight
+        self.planned_date = planned_date
+        self.parent_run_id = parent_run_id
+        self.status = 'queued'
+        self.attempts = 0
+
+    def __repr__(self):
+        return f"WorkItem({self.work_item_id}, {self.task_id}, '{self.status}', {self.agent_id})"
+
+
 class ExecutionState(Enum):
     AWAITING = auto()
     STARTED = auto()
     FINISHED = auto()
     FAILED = auto()
     MISSED = auto()
+    TIMED_OUT = auto()
+
+
+class TaskStats(Base):
+    __tablename__ = 'task_stats'
+
+    task_id = Column(Integer, primary_key=True)
+    state_counts = Column(Text, nullable=False)
+    last_run = Column(DateTime)
+    last_status = Column(Text)
+    last_return_code = Column(Integer)
+    durations = Column(Text, nullable=False)
+    dropped_lines = Column(Integer, nullable=False)
+    dropped_bytes = Column(Integer, nullable=False)
+    cpu_time = Column(Float, nullable=False)
+    max_rss = Column(Integer)
+    io_blocks = Column(Integer, nullable=False)
+
+    def __init__(self, task_id: int):
+        self.task_id = task_id
+        self.state_counts = '{}'
+        self.durations = ''
+        self.dropped_lines = 0
+        self.dropped_bytes = 0
+        self.cpu_time = 0.0
+        self.io_blocks = 0
+
+    def to_dict(self):
+        return {
+            'task_id': self.task_id,
+            'state_counts': json.loads(self.state_counts),
+            'last_run': self.last_run,
+            'last_status': self.last_status,
+            'last_return_code': self.last_return_code,
+            'dropped_lines': self.dropped_lines,
+            'dropped_bytes': self.dropped_bytes,
+            'cpu_time': self.cpu_time,
+            'max_rss': self.max_rss,
+            'io_blocks': self.io_blocks
+        }
+
+    def __repr__(self):
+        return f"TaskStats({self.task_id}, {self.state_counts})"
+
+
+class TaskStatsBucket(Base):
+    __tablename__ = 'task_stats_bucket'
+
+    task_id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    state_counts = Column(Text, nullable=False)
+    duration_count = Column(Integer, nullable=False)
+    duration_sum = Column(Float, nullable=False)
+
+    def __init__(self, task_id: int, hour: datetime.datetime):
+        self.task_id = task_id
+        self.hour = hour
+        self.state_counts = '{}'
+        self.duration_count = 0
+        self.duration_sum = 0.0
+
+    def to_dict(self):
+        return {
+            'hour': self.hour,
+            'state_counts': json.loads(self.state_counts),
+            'mean_duration': self.duration_sum / self.duration_count if self.duration_count else None
+        }
+
+    def __repr__(self):
+        return f"TaskStatsBucket({self.task_id}, {self.hour}, {self.state_counts})"
 
 
 class OutputLog(Base, metaclass=ABCMeta):
     __tablename__ = 'output_log'
     __table_args__ = (
         Index('ids_index', 'output_log_id', 'process_log_id', unique=True),
+        Index('output_log_process_index', 'process_log_id', 'output_log_id'),
     )
 
     output_log_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -0,0 +1,124 @@
+import re
+from abc import ABCMeta, abstractmethod
+from typing import Dict, List
+
+from sqlalchemy import DDL, event, func, literal_column, select, table, column, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from db.models import OutputLog
+
+
+class OutputSearchIndex(metaclass=ABCMeta):
+    """Full-text index over ``output_log.message``.
+
+    Each dialect keeps its own index structure, created and dropped together
+    with the ``output_log`` table, and exposes a filter clause for queries.
+    The create statements are idempotent, so ``ensure_search_index`` can also
+    add the index to databases created before it existed.
+    """
+    dialect: str
+
+    @property
+    @abstractmethod
+    def create_ddl(self) -> List[str]:
+        pass
+
+    @property
+    @abstractmethod
+    def drop_ddl(self) -> List[str]:
+        pass
+
+    async def refresh(self, session: AsyncSession):
+        """Index output logs inserted since the last refresh."""
+
+    @abstractmethod
+    def match(self, query: str):
+        pass
+
+    @staticmethod
+    def tokenize(query: str) -> List[str]:
+        return re.findall(r'\w+', query)
+
+
+class PostgresSearchIndex(OutputSearchIndex):
+    """GIN index over a tsvector expression, maintained by PostgreSQL on insert."""
+    dialect = 'postgresql'
+
+    create_ddl = [
+        "CREATE INDEX IF NOT EXISTS output_log_message_fts "
+        "ON output_log USING gin (to_tsvector('simple', message))"
+    ]
+    drop_ddl = [
+        "DROP INDEX IF EXISTS output_log_message_fts"
+    ]
+
+    # a literal, not a bound parameter, so the expression always matches the indexed one
+    _config = literal_column("'simple'::regconfig")
+
+    def match(self, query: str):
+        return func.to_tsvector(self._config, OutputLog.message).op('@@')(
+            func.plainto_tsquery(self._config, ' '.join(self.tokenize(query)))
+        )
+
+
+class SqliteSearchIndex(OutputSearchIndex):
+    """Contentless FTS5 table keyed by ``output_log_id``, fed incrementally on refresh."""
+    dialect = 'sqlite'
+
+    _fts = table('output_log_fts', column('rowid'))
+
+    create_ddl = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS output_log_fts USING fts5(message, content='')"
+    ]
+    drop_ddl = [
+        "DROP TABLE IF EXISTS output_log_fts"
+    ]
+
+    async def refresh(self, session: AsyncSession):
+        await session.execute(text(
+            "INSERT INTO output_log_fts(rowid, message) "
+            "SELECT output_log_id, message FROM output_log "
+            "WHERE output_log_id > (SELECT coalesce(max(rowid), 0) FROM output_log_fts)"
+        ))
+
+    def match(self, query: str):
+        fts_query = ' '.join(f'"{token}"' for token in self.tokenize(query))
+        return OutputLog.output_log_id.in_(
+            select(self._fts.c.rowid).
+            where(literal_column('output_log_fts').match(fts_query))
+        )
+
+
+_search_indexes: Dict[str, OutputSearchIndex] = {
+    index.dialect: index
+    for index
+    in (PostgresSearchIndex(), SqliteSearchIndex())
+}
+
+
+def get_search_index(dialect: str) -> OutputSearchIndex:
+    try:
+        return _search_indexes[dialect]
+    except KeyError:
+        raise ValueError(f"Full-text search is not supported for '{dialect}'")
+
+
+async def ensure_search_index(conn: AsyncConnection):
+    """Create the search index of the connection's dialect if it does not exist yet."""
+    index = _search_indexes.get(conn.dialect.name)
+    if index:
+        for statement in index.create_ddl:
+            await conn.execute(text(statement))
+
+
+async def refresh_search_index(session: AsyncSession):
+    index = _search_indexes.get(session.bind.dialect.name)
+    if index:
+        await index.refresh(session)
+
+
+for _index in _search_indexes.values():
+    for _statement in _index.create_ddl:
+        event.listen(OutputLog.__table__, 'after_create', DDL(_statement).execute_if(dialect=_index.dialect))
+    for _statement in _index.drop_ddl:
+        event.listen(OutputLog.__table__, 'before_drop', DDL(_statement).execute_if(dialect=_index.dialect))
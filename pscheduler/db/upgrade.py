@@ -0,0 +1,48 @@
+from typing import List
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from db.models import Base
+
+
+def _missing_ddl(conn: Connection) -> List[str]:
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(f'Cannot add required column {table.name}.{column.name} to an existing table')
+
+            column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            statements.append(f'ALTER TABLE {table.name} ADD COLUMN {column_ddl}')
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                statements.append(str(CreateIndex(index).compile(dialect=conn.dialect)))
+    return statements
+
+
+async def upgrade_schema(conn: AsyncConnection) -> List[str]:
+    """Add columns and indexes of the models that are missing from existing tables.
+
+    ``create_all`` only creates missing tables, so databases created by an
+    older version lack columns and indexes added since. New columns are
+    nullable, which lets them be added in place; the statements run are
+    returned.
+    """
+    statements = await conn.run_sync(_missing_ddl)
+    for statement in statements:
+        await conn.exec_driver_sql(statement)
+    return statements
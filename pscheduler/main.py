@@ -1,24 +1,63 @@
-import asyncio
+import time
+_started_at = time.perf_counter()
 
-from api.app import server
-from scheduler.executor import ExecutionManager
-from db.connection import engine
-from db.models import Base
+import argparse
 
+from api.app import create_app, create_server, run_workers
+from scheduler.agent import WorkerAgent
+from scheduler.control import ControlServer
+from scheduler.factory import create_scheduler
+from util.loop import new_event_loop
+from util.startup import StartupReport
 
-async def main():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
 
-    async_task_manager = ExecutionManager()
-    await async_task_manager.sync()
-    async_task_manager.run_all()
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Process scheduler')
+    parser.add_argument('--mode', choices=('all', 'scheduler', 'api', 'agent'), default='all',
+                        help='all: scheduler and API in one process (default); '
+                             'scheduler: scheduler serving the control socket; '
+                             'api: API workers controlling a separate scheduler process; '
+                             'agent: worker executing runs from the work queue')
+    parser.add_argument('--workers', type=int, default=1, help='number of API worker processes in api mode')
+    return parser.parse_args()
 
-    await server.serve()
 
+async def main(mode: str):
+    report = StartupReport(_started_at)
+    report.record('import', time.perf_counter() - _started_at)
 
-if __name__ == '__main__':
-    loop = asyncio.get_event_loop()
-    task = loop.create_task(main())
+    if mode == 'agent':
+        agent = WorkerAgent.from_env()
+        report.mark_ready()
+        print(report)
+
+        await agent.run()
+        return
+
+    execution_manager = await create_scheduler(report)
+    if mode == 'scheduler':
+        control_server = ControlServer(execution_manager)
+        await control_server.start()
+
+        report.mark_ready()
+        print(report)
+
+        await control_server.serve_forever()
+    else:
+        server = create_server(create_app())
 
-    loop.run_until_complete(task)
+        report.mark_ready()
+        print(report)
+
+        await server.serve()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.mode == 'api':
+        run_workers(args.workers)
+    else:
+        loop = new_event_loop()
+        task = loop.create_task(main(args.mode))
+
+        loop.run_until_complete(task)
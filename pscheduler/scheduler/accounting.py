@@ -0,0 +1,101 @@
+import asyncio
+import os
+import threading
+import time
+import warnings
+from typing import Dict, Tuple
+
+
+class RusageChildWatcher(asyncio.AbstractChildWatcher):
+    """Child watcher that reaps each child with ``wait4`` and keeps its resource usage.
+
+    Works like ``asyncio.ThreadedChildWatcher``: one waiting thread per child,
+    with the exit callback scheduled on the child's event loop. The usage is
+    stored before the callback runs, so it is available once ``Process.wait``
+    returns. Usage nobody collects within ``retention`` seconds is discarded.
+    """
+    retention = 60
+
+    def __init__(self):
+        self._usage: Dict[int, Tuple[float, object]] = {}
+        self._lock = threading.Lock()
+
+    def is_active(self):
+        return True
+
+    def close(self):
+        pass
+
+    def attach_loop(self, loop):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def add_child_handler(self, pid, callback, *args):
+        loop = asyncio.get_running_loop()
+        thread = threading.Thread(target=self._wait, name=f'waitpid-{pid}',
+                                  args=(loop, pid, callback, args), daemon=True)
+        thread.start()
+
+    def remove_child_handler(self, pid):
+        return True
+
+    def _wait(self, loop: asyncio.AbstractEventLoop, pid: int, callback, args):
+        try:
+            _, status, rusage = os.wait4(pid, 0)
+        except ChildProcessError:
+            return_code = 255
+        else:
+            self._store(pid, rusage)
+            return_code = self._return_code(status)
+
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(callback, pid, return_code, *args)
+
+    @staticmethod
+    def _return_code(status: int) -> int:
+        if os.WIFSIGNALED(status):
+            return -os.WTERMSIG(status)
+        if os.WIFEXITED(status):
+            return os.WEXITSTATUS(status)
+        return status
+
+    def _store(self, pid: int, rusage):
+        now = time.monotonic()
+        with self._lock:
+            for stale_pid in [p for p, (stored_at, _) in self._usage.items() if now - stored_at > self.retention]:
+                del self._usage[stale_pid]
+            self._usage[pid] = (now, rusage)
+
+    def pop_usage(self, pid: int):
+        with self._lock:
+            _, rusage = self._usage.pop(pid, (None, None))
+        return rusage
+
+
+_watcher = RusageChildWatcher()
+
+
+def install_child_watcher():
+    """Reap children through ``RusageChildWatcher`` where the platform and loop policy allow it.
+
+    Loops that reap children themselves, such as uvloop, are left alone and
+    their executions have no resource usage recorded.
+    """
+    if not hasattr(os, 'wait4') or not hasattr(asyncio, 'set_child_watcher'):
+        return
+    if type(asyncio.get_event_loop_policy()) is not asyncio.DefaultEventLoopPolicy:
+        return
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        if asyncio.get_child_watcher() is not _watcher:
+            asyncio.set_child_watcher(_watcher)
+
+
+def pop_resource_usage(pid: int):
+    return _watcher.pop_usage(pid)
@@ -0,0 +1,142 @@
+import asyncio
+import collections
+import os
+import time
+from typing import Callable, Deque, Dict
+
+from dotenv import load_dotenv
+
+
+class AdmissionQueue:
+    """Global execution slot budget shared fairly between priority classes.
+
+    Executions that find no free slot wait in a FIFO per priority class.
+    Freed slots go to the class with the smallest virtual finish time
+    (weighted fair queuing), so a class is served in proportion to its
+    weight while it has waiters, and low classes still make progress.
+    """
+    weights = {
+        'critical': 8,
+        'high': 4,
+        'normal': 2,
+        'low': 1
+    }
+    default_priority = 'normal'
+    default_slots = 64
+
+    def __init__(self, slots: int = default_slots):
+        self.slots = slots
+        self.running = 0
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {
+            priority: collections.deque()
+            for priority
+            in self.weights
+        }
+        self._finish_times: Dict[str, float] = dict.fromkeys(self.weights, 0.0)
+        self._virtual_time = 0.0
+
+    @classmethod
+    def from_env(cls) -> 'AdmissionQueue':
+        load_dotenv()
+        return cls(int(os.environ.get('EXECUTION_SLOTS', cls.default_slots)))
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    async def acquire(self, priority: str = None) -> float:
+        """Wait for a free slot and return the time spent waiting in seconds."""
+        priority = priority or self.default_priority
+        if self.running < self.slots and not self.waiting:
+            self._admit(priority)
+            return 0.0
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters[priority].append(waiter)
+        queued_at = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._waiters[priority].remove(waiter)
+            raise
+        return time.monotonic() - queued_at
+
+    def release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def _admit(self, priority: str):
+        self.running += 1
+        start = max(self._finish_times[priority], self._virtual_time)
+        self._finish_times[priority] = start + 1 / self.weights[priority]
+        self._virtual_time = start
+
+    def _next_priority(self):
+        candidates = [
+            priority
+            for priority, waiters
+            in self._waiters.items()
+            if waiters
+        ]
+        if candidates:
+            return min(
+                candidates,
+                key=lambda p: max(self._finish_times[p], self._virtual_time) + 1 / self.weights[p]
+            )
+
+    def _dispatch(self):
+        while self.running < self.slots:
+            priority = self._next_priority()
+            if priority is None:
+                break
+
+            waiter = self._waiters[priority].popleft()
+            self._admit(priority)
+            waiter.set_result(None)
+
+    def to_dict(self):
+        return {
+            'slots': self.slots,
+            'running': self.running,
+            'waiting': {
+                priority: len(waiters)
+                for priority, waiters
+                in self._waiters.items()
+            }
+        }
+
+
+class LaunchRateLimiter:
+    """Token bucket limiting how many executions are launched per second.
+
+    Launches beyond the burst take a token on credit and sleep until it has
+    been refilled, so a burst of due tasks is spread out in launch order.
+    """
+
+    def __init__(self, rate: float = None, burst: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._refilled_at = clock()
+
+    @classmethod
+    def from_env(cls) -> 'LaunchRateLimiter':
+        load_dotenv()
+        rate = os.environ.get('LAUNCH_RATE')
+        return cls(float(rate) if rate else None, int(os.environ.get('LAUNCH_BURST', 1)))
+
+    async def acquire(self):
+        if not self.rate:
+            return
+
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+        self._tokens -= 1
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import timezone
+from typing import Dict, Set, Union
+
+from dotenv import load_dotenv
+
+from db.models import WorkItem
+from scheduler.admission import AdmissionQueue
+from scheduler.executor import ExecutionMonitor
+from scheduler.spec import TaskSpec
+from scheduler.work_queue import WorkQueue
+from util import logger
+
+
+log = logging.getLogger(__name__)
+
+
+class AgentExecutionMonitor(ExecutionMonitor):
+    """Runs a claimed task; its stats are recorded by the scheduler once the run is collected."""
+
+    def __init__(self, task: TaskSpec, item: WorkItem):
+        planned_date = item.planned_date.replace(tzinfo=timezone.utc) if item.planned_date else None
+        super().__init__(task, lambda _: None, planned_date=planned_date, parent_run_id=item.parent_run_id)
+
+    @property
+    def dropped_lines(self) -> int:
+        return self._limiter.dropped_lines
+
+    @property
+    def dropped_bytes(self) -> int:
+        return self._limiter.dropped_bytes
+
+    def _record_stats(self):
+        pass
+
+
+class WorkerAgent:
+    """Claims runs from the work queue and executes them with the regular capture pipeline.
+
+    The agent holds at most ``slots`` runs at a time, heartbeats them every
+    ``heartbeat_interval`` seconds and writes their process and output logs
+    to the shared database, where the scheduler and the API pick them up.
+    """
+    default_heartbeat_interval = 5.0
+
+    def __init__(self, queue: WorkQueue, agent_id: str = None, slots: int = AdmissionQueue.default_slots,
+                 heartbeat_interval: float = default_heartbeat_interval):
+        self.agent_id = agent_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.slots = slots
+        self.heartbeat_interval = heartbeat_interval
+        self._queue = queue
+        self._free_slots = asyncio.Semaphore(slots)
+        self._running: Dict[int, AgentExecutionMonitor] = {}
+        self._reported: Set[int] = set()
+        self._heartbeat_task: Union[asyncio.Task, None] = None
+
+    @classmethod
+    def from_env(cls) -> 'WorkerAgent':
+        load_dotenv()
+        queue = WorkQueue(float(os.environ.get('WORK_QUEUE_POLL_INTERVAL', WorkQueue.default_poll_interval)))
+        return cls(
+            queue,
+            os.environ.get('AGENT_ID'),
+            int(os.environ.get('EXECUTION_SLOTS', AdmissionQueue.default_slots)),
+            float(os.environ.get('AGENT_HEARTBEAT_INTERVAL', cls.default_heartbeat_interval))
+        )
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    async def run(self):
+        logger.start()
+        self._heartbeat_task = asyncio.get_event_loop().create_task(self._heartbeat_periodically())
+        try:
+            while True:
+                await self._free_slots.acquire()
+                try:
+                    claimed = await self._queue.claim(self.agent_id)
+                except Exception:
+                    log.exception('Claiming from the work queue failed, retrying in %ss', self._queue.poll_interval)
+                    claimed = None
+
+                if claimed is None:
+                    self._free_slots.release()
+                    await asyncio.sleep(self._queue.poll_interval)
+                    continue
+                asyncio.get_event_loop().create_task(self._execute(*claimed))
+        finally:
+            self._heartbeat_task.cancel()
+
+    async def _execute(self, item: WorkItem, task: TaskSpec):
+        monitor = AgentExecutionMonitor(task, item)
+        self._running[item.work_item_id] = monitor
+        try:
+            await monitor.start()
+        except Exception:
+            log.exception('Run of task %s failed', task.task_id)
+        finally:
+            del self._running[item.work_item_id]
+            self._reported.discard(item.work_item_id)
+            self._free_slots.release()
+
+        try:
+            await self._queue.complete(self.agent_id, item.work_item_id, monitor.process_log_id,
+                                       monitor.dropped_lines, monitor.dropped_bytes)
+        except Exception:
+            log.exception('Completing run of task %s failed, it is requeued once its heartbeat expires',
+                          task.task_id)
+
+    async def heartbeat(self):
+        started = {
+            work_item_id: monitor.process_log_id
+            for work_item_id, monitor
+            in self._running.items()
+            if work_item_id not in self._reported and monitor.process_log_id is not None
+        }
+        await self._queue.heartbeat(self.agent_id, self._running.keys(), started)
+        self._reported.update(started)
+
+    async def _heartbeat_periodically(self):
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception:
+                log.exception('Heartbeat failed, retrying in %ss', self.heartbeat_interval)
+            await asyncio.sleep(self.heartbeat_interval)
@@ -0,0 +1,338 @@
+import asyncio
+import itertools
+import json
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncGenerator, Dict, List, Set, Union
+
+from dotenv import load_dotenv
+
+from scheduler.executor import ExecutionManager
+from util.profiling import get_profiler
+
+
+default_socket_path = '/tmp/pscheduler-control.sock'
+
+
+def socket_path() -> str:
+    load_dotenv()
+    return os.environ.get('CONTROL_SOCKET', default_socket_path)
+
+
+class ControlPlane(ABC):
+    """Commands the API issues to the scheduler, wherever the scheduler runs."""
+
+    @abstractmethod
+    async def executors(self) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    async def executor_changes(self, since: int) -> Dict:
+        pass
+
+    @abstractmethod
+    async def admission(self) -> Dict:
+        pass
+
+    @abstractmethod
+    async def forecast(self, minutes: int, bucket_seconds: int) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    async def run_task(self, task_id: int):
+        pass
+
+    @abstractmethod
+    async def stop_task(self, task_id: int):
+        pass
+
+    @abstractmethod
+    async def sync(self):
+        pass
+
+    @abstractmethod
+    async def profile(self, action: str, args: Dict) -> Dict:
+        pass
+
+    @abstractmethod
+    def subscribe(self) -> AsyncGenerator[Dict, None]:
+        pass
+
+
+class LocalControlPlane(ControlPlane):
+    """Control plane of a scheduler running in this process."""
+    max_queued_events = 1000
+
+    def __init__(self, manager: ExecutionManager):
+        self._manager = manager
+
+    async def executors(self) -> List[Dict]:
+        return [
+            executor.to_dict()
+            for executor
+            in self._manager.task_executors.values()
+        ]
+
+    async def executor_changes(self, since: int) -> Dict:
+        return self._manager.changes(since)
+
+    async def admission(self) -> Dict:
+        return self._manager.admission.to_dict()
+
+    async def forecast(self, minutes: int, bucket_seconds: int) -> List[Dict]:
+        return self._manager.forecast(minutes, bucket_seconds)
+
+    async def run_task(self, task_id: int):
+        self._manager.run_task(task_id)
+
+    async def stop_task(self, task_id: int):
+        self._manager.stop_task(task_id)
+
+    async def sync(self):
+        await self._manager.sync()
+
+    async def profile(self, action: str, args: Dict) -> Dict:
+        return await get_profiler().run(action, args)
+
+    async def subscribe(self) -> AsyncGenerator[Dict, None]:
+        """Executor status changes and syncs; events are dropped while the subscriber lags behind."""
+        events: asyncio.Queue = asyncio.Queue(self.max_queued_events)
+
+        def listener(event: Dict):
+            if not events.full():
+                events.put_nowait(event)
+
+        self._manager.subscribe(listener)
+        try:
+            while True:
+                yield await events.get()
+        finally:
+            self._manager.unsubscribe(listener)
+
+
+def _encode(message: Dict) -> bytes:
+    def default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+    return json.dumps(message, default=default).encode() + b'\n'
+
+
+class ControlServer:
+    """Serves a ``LocalControlPlane`` over a Unix socket, one JSON message per line.
+
+    Requests are ``{"id": 1, "command": "run_task", "args": {"task_id": 3}}``
+    and are answered with ``{"id": 1, "result": ...}`` or
+    ``{"id": 1, "error": {"type": "KeyError", "message": ...}}``, in
+    completion order. A ``subscribe`` request turns the connection into a
+    stream of events.
+    """
+    commands = {'executors', 'executor_changes', 'admission', 'forecast', 'run_task', 'stop_task', 'sync', 'profile'}
+
+    def __init__(self, manager: ExecutionManager, path: str = None):
+        self.path = path or socket_path()
+        self._control_plane = LocalControlPlane(manager)
+        self._server: Union[asyncio.AbstractServer, None] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        os.chmod(self.path, 0o600)
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        pending: Set[asyncio.Future] = set()
+        self._connections.add(writer)
+        try:
+            while line := await reader.readline():
+                request = json.loads(line)
+                if request.get('command') == 'subscribe':
+                    await self._stream_events(request, reader, writer)
+                    break
+
+                response = asyncio.ensure_future(self._respond(request, writer, write_lock))
+                pending.add(response)
+                response.add_done_callback(pending.discard)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            for response in pending:
+                response.cancel()
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _respond(self, request: Dict, writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        try:
+            if request.get('command') not in self.commands:
+                raise ValueError(f"unknown command {request.get('command')!r}")
+            command = getattr(self._control_plane, request['command'])
+            response = {'id': request['id'], 'result': await command(**request.get('args', {}))}
+        except Exception as e:
+            response = {'id': request.get('id'), 'error': {'type': type(e).__name__, 'message': str(e)}}
+
+        async with write_lock:
+            writer.write(_encode(response))
+            await writer.drain()
+
+    async def _stream_events(self, request: Dict, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(_encode({'id': request['id'], 'result': None}))
+        await writer.drain()
+
+        events = self._control_plane.subscribe()
+        closed = asyncio.ensure_future(reader.read())
+        try:
+            while True:
+                event = asyncio.ensure_future(events.__anext__())
+                await asyncio.wait({event, closed}, return_when=asyncio.FIRST_COMPLETED)
+                if closed.done():
+                    event.cancel()
+                    break
+
+                writer.write(_encode(event.result()))
+                await writer.drain()
+        finally:
+            closed.cancel()
+            await events.aclose()
+
+
+class ControlClient(ControlPlane):
+    """Control plane of a scheduler in another process, reached through ``ControlServer``.
+
+    Requests share one connection per event loop and are matched to
+    responses by id, so concurrent API requests do not queue behind each
+    other.
+    """
+    errors = {
+        'KeyError': KeyError,
+        'ValueError': ValueError,
+        'TypeError': TypeError
+    }
+    timeout = 30
+
+    def __init__(self, path: str = None):
+        self.path = path or socket_path()
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._loop: Union[asyncio.AbstractEventLoop, None] = None
+        self._connect_lock: Union[asyncio.Lock, None] = None
+        self._writer: Union[asyncio.StreamWriter, None] = None
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._connect_lock = asyncio.Lock()
+            self._writer = None
+
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+                self._pending = {}
+                asyncio.ensure_future(self._read_responses(reader, self._writer, self._pending))
+        return self._writer
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+    @staticmethod
+    async def _read_responses(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                              pending: Dict[int, asyncio.Future]):
+        try:
+            while line := await reader.readline():
+                response = json.loads(line)
+                future = pending.pop(response['id'], None)
+                if future and not future.done():
+                    future.set_result(response)
+        finally:
+            writer.close()
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('control server closed the connection'))
+            pending.clear()
+
+    async def _call(self, command: str, **args):
+        writer = await self._connect()
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = future
+        try:
+            writer.write(_encode({'id': request_id, 'command': command, 'args': args}))
+            await writer.drain()
+            response = await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+        if 'error' in response:
+            error = response['error']
+            raise self.errors.get(error['type'], RuntimeError)(error['message'])
+        return response['result']
+
+    async def executors(self) -> List[Dict]:
+        return await self._call('executors')
+
+    async def executor_changes(self, since: int) -> Dict:
+        return await self._call('executor_changes', since=since)
+
+    async def admission(self) -> Dict:
+        return await self._call('admission')
+
+    async def forecast(self, minutes: int, bucket_seconds: int) -> List[Dict]:
+        return await self._call('forecast', minutes=minutes, bucket_seconds=bucket_seconds)
+
+    async def run_task(self, task_id: int):
+        await self._call('run_task', task_id=task_id)
+
+    async def stop_task(self, task_id: int):
+        await self._call('stop_task', task_id=task_id)
+
+    async def sync(self):
+        await self._call('sync')
+
+    async def profile(self, action: str, args: Dict) -> Dict:
+        return await self._call('profile', action=action, args=args)
+
+    async def subscribe(self) -> AsyncGenerator[Dict, None]:
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        try:
+            writer.write(_encode({'id': 0, 'command': 'subscribe'}))
+            await writer.drain()
+            await reader.readline()
+            while line := await reader.readline():
+                yield json.loads(line)
+        finally:
+            writer.close()
+
+
+_control_plane: Union[ControlPlane, None] = None
+
+
+def configure(control_plane: ControlPlane):
+    global _control_plane
+    _control_plane = control_plane
+
+
+def get_control_plane() -> ControlPlane:
+    """Control plane set with ``configure``, or the in-process scheduler by default."""
+    if _control_plane is None:
+        return LocalControlPlane(ExecutionManager())
+    return _control_plane
@@ -0,0 +1,208 @@
+"""Cron expressions compiled to bitsets.
+
+Each field of a five-field expression becomes an int with one bit per
+allowed value, so finding the next allowed minute, hour, day or month is a
+shift and a lowest-set-bit lookup rather than a scan. Expressions are
+compiled once per distinct string and shared. Syntax outside the plain
+five fields (seconds, ``L``, ``W``, ``#``, ``?``, hashed ``H`` values) and
+timezone-aware start dates are left to croniter, which also reports invalid
+expressions.
+"""
+import calendar
+import copy
+import functools
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Tuple, Union
+
+from croniter import croniter
+
+
+_aliases = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *'
+}
+
+_month_names = {name.lower(): number for number, name in enumerate(calendar.month_abbr) if name}
+_weekday_names = {name: number for number, name in enumerate(('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'))}
+
+# (lowest value, highest value, names) of minute, hour, day of month, month and day of week
+_fields = (
+    (0, 59, {}),
+    (0, 23, {}),
+    (1, 31, {}),
+    (1, 12, _month_names),
+    (0, 7, _weekday_names)
+)
+
+_max_search_years = 30
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _bits(low: int, high: int, step: int = 1) -> int:
+    mask = 0
+    for value in range(low, high + 1, step):
+        mask |= 1 << value
+    return mask
+
+
+def _next_bit(mask: int, start: int) -> int:
+    """Lowest set bit of ``mask`` at or above ``start``, or -1."""
+    mask = mask >> start << start
+    return (mask & -mask).bit_length() - 1 if mask else -1
+
+
+def _value(token: str, names: Dict[str, int]) -> int:
+    if token.isdigit():
+        return int(token)
+    if token.lower() in names:
+        return names[token.lower()]
+    raise _Unsupported(token)
+
+
+def _parse_field(field: str, low: int, high: int, names: Dict[str, int]) -> int:
+    mask = 0
+    for part in field.split(','):
+        value_range, _, step = part.partition('/')
+        step = int(step) if step.isdigit() else None
+        if step == 0 or (step is None and '/' in part):
+            raise _Unsupported(part)
+
+        if value_range == '*':
+            first, last = low, high
+        elif '-' in value_range:
+            first, last = (_value(token, names) for token in value_range.split('-', 1))
+        else:
+            first = _value(value_range, names)
+            last = high if step else first
+        if not low <= first <= last <= high:
+            raise _Unsupported(part)
+        mask |= _bits(first, last, step or 1)
+    return mask
+
+
+class CompiledCron:
+    """Run dates of a five-field cron expression, from bitsets of the allowed values of each field.
+
+    Days of month and days of week combine as in cron: when both fields are
+    restricted, a day matching either one fires.
+    """
+    __slots__ = ('expression', 'minutes', 'hours', 'days', 'months', 'weekdays', 'day_or', '_day_masks')
+
+    _all_days = _bits(1, 31)
+    _all_weekdays = _bits(0, 6)
+
+    def __init__(self, expression: str):
+        fields = _aliases.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise _Unsupported(expression)
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, *spec)
+            for field, spec
+            in zip(fields, _fields)
+        )
+        self.weekdays = weekdays & self._all_weekdays | weekdays >> 7
+        self.day_or = self.days != self._all_days and self.weekdays != self._all_weekdays
+        self._day_masks: Dict[Tuple[int, int], int] = {}
+
+        leap_year_months = (self._day_mask(2000, month) for month in range(1, 13) if self.months >> month & 1)
+        if not any(leap_year_months):
+            raise _Unsupported(f'{expression} never fires')
+
+    def _day_mask(self, year: int, month: int) -> int:
+        """Bits of the days of ``month`` the expression fires on."""
+        key = (year, month)
+        mask = self._day_masks.get(key)
+        if mask is None:
+            first_weekday, days_in_month = calendar.monthrange(year, month)
+            first_weekday = (first_weekday + 1) % 7
+            weekday_days = 0
+            for weekday in range(7):
+                if self.weekdays >> weekday & 1:
+                    weekday_days |= _bits(1 + (weekday - first_weekday) % 7, days_in_month, 7)
+
+            valid_days = _bits(1, days_in_month)
+            if self.day_or:
+                mask = (self.days | weekday_days) & valid_days
+            else:
+                mask = self.days & weekday_days & valid_days
+            self._day_masks[key] = mask
+        return mask
+
+    def next_after(self, start: datetime) -> datetime:
+        """First run date strictly after ``start``."""
+        start = start.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        year, month, day, hour, minute = start.year, start.month, start.day, start.hour, start.minute
+        while year <= start.year + _max_search_years:
+            next_month = _next_bit(self.months, month)
+            if next_month < 0:
+                year, month, day, hour, minute = year + 1, 1, 1, 0, 0
+                continue
+            if next_month != month:
+                month, day, hour, minute = next_month, 1, 0, 0
+
+            next_day = _next_bit(self._day_mask(year, month), day)
+            if next_day < 0:
+                month, day, hour, minute = month + 1, 1, 0, 0
+                continue
+            if next_day != day:
+                day, hour, minute = next_day, 0, 0
+
+            next_hour = _next_bit(self.hours, hour)
+            if next_hour < 0:
+                day, hour, minute = day + 1, 0, 0
+                continue
+            if next_hour != hour:
+                hour, minute = next_hour, 0
+
+            next_minute = _next_bit(self.minutes, minute)
+            if next_minute < 0:
+                hour, minute = hour + 1, 0
+                continue
+            return datetime(year, month, day, hour, next_minute)
+        raise ValueError(f"'{self.expression}' does not fire within {_max_search_years} years of {start}")
+
+    def run_dates_after(self, start: datetime) -> Iterator[datetime]:
+        if start.tzinfo is not None:
+            yield from _CroniterSchedule(self.expression).run_dates_after(start)
+            return
+
+        run_date = start
+        while True:
+            run_date = self.next_after(run_date)
+            yield run_date
+
+
+class _CroniterSchedule:
+    """croniter behind the ``CompiledCron`` interface, for what the compiler does not handle."""
+    __slots__ = ('expression', '_template')
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self._template = croniter(expression, ret_type=datetime)
+
+    def next_after(self, start: datetime) -> datetime:
+        return next(self.run_dates_after(start))
+
+    def run_dates_after(self, start: datetime) -> Iterator[datetime]:
+        cron = copy.copy(self._template)
+        cron.set_current(start)
+        return cron
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_cron(expression: str) -> Union[CompiledCron, _CroniterSchedule]:
+    """Compiled run date schedule of ``expression``, shared by every caller of the same string."""
+    try:
+        return CompiledCron(expression)
+    except _Unsupported:
+        return _CroniterSchedule(expression)
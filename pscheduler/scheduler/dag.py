@@ -0,0 +1,66 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from db.models import ExecutionState
+
+
+class TaskGraph:
+    """Dependency edges between tasks, ``upstream -> downstream`` with a run condition."""
+    conditions = {
+        'success': {ExecutionState.FINISHED},
+        'failure': {ExecutionState.FAILED, ExecutionState.TIMED_OUT}
+    }
+
+    def __init__(self, edges: Iterable[Tuple[int, int, str]] = ()):
+        self._downstream: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+        self._upstream: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+        self.load(edges)
+
+    def load(self, edges: Iterable[Tuple[int, int, str]]):
+        self._downstream.clear()
+        self._upstream.clear()
+        for upstream_id, downstream_id, condition in edges:
+            self._downstream[upstream_id].append((downstream_id, condition))
+            self._upstream[downstream_id].append((upstream_id, condition))
+
+    def downstream(self, task_id: int) -> List[Tuple[int, str]]:
+        return self._downstream.get(task_id, [])
+
+    def upstream(self, task_id: int) -> List[Tuple[int, str]]:
+        return self._upstream.get(task_id, [])
+
+    def has_downstream(self, task_id: int) -> bool:
+        return bool(self._downstream.get(task_id))
+
+    def descendants(self, task_id: int) -> List[int]:
+        """Tasks reachable from ``task_id``, in topological order."""
+        reachable: Set[int] = set()
+        stack = [task_id]
+        while stack:
+            for downstream_id, _ in self.downstream(stack.pop()):
+                if downstream_id not in reachable:
+                    reachable.add(downstream_id)
+                    stack.append(downstream_id)
+
+        in_degree = {
+            node: sum(1 for upstream_id, _ in self.upstream(node) if upstream_id in reachable)
+            for node
+            in reachable
+        }
+        order = []
+        ready = sorted(node for node, degree in in_degree.items() if degree == 0)
+        while ready:
+            node = ready.pop(0)
+            order.append(node)
+            for downstream_id, _ in self.downstream(node):
+                in_degree[downstream_id] -= 1
+                if in_degree[downstream_id] == 0:
+                    ready.append(downstream_id)
+        return order
+
+    def would_create_cycle(self, upstream_id: int, downstream_id: int) -> bool:
+        return upstream_id == downstream_id or upstream_id in self.descendants(downstream_id)
+
+    @classmethod
+    def satisfied(cls, condition: str, state: ExecutionState) -> bool:
+        return state in cls.conditions[condition]
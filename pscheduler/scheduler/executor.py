@@ -1,35 +1,58 @@
 import asyncio
+import collections
+import itertools
+import os
+import signal
 import sqlalchemy
+import time
 
 from asyncio import TimerHandle
 from asyncio.subprocess import Process
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from aiostream import stream
-from typing import List, Dict, Union, Callable, AsyncGenerator
+from typing import List, Deque, Dict, Set, Tuple, Union, Callable, AsyncGenerator
 
 from db.connection import Session
-from db.models import ProcessLog, ExecutionState, ConsoleLog, StderrLog
+from db.models import ProcessLog, ExecutionState, ConsoleLog, StderrLog, TaskDependency
+from scheduler.accounting import install_child_watcher, pop_resource_usage
+from scheduler.admission import AdmissionQueue, LaunchRateLimiter
+from scheduler.dag import TaskGraph
+from scheduler.limits import ResourceLimits, ChildLimits
+from scheduler.output import OutputPolicy, OutputLimiter
+from scheduler.spec import TaskSpec
+from scheduler.stats import TaskStatsRecorder
 from scheduler.task import Task
+from scheduler.work_queue import WorkQueue, RemoteExecution
 from util import SingletonMeta, logger
+from util.mirror import get_console_mirror
 
 
 class TaskExecutor:
-    def __init__(self, task: Task):
-        self._task = task
+    max_forecast_runs = 1000
+
+    def __init__(self, task: Union[Task, TaskSpec], manager: 'ExecutionManager' = None):
+        self._task = task if isinstance(task, TaskSpec) else TaskSpec.from_task(task)
+        self._manager = manager
         self._loop = asyncio.get_event_loop()
         self._timer_handle: Union[TimerHandle, None] = None
         self._active = False
+        self._next_run_date: Union[datetime, None] = None
+        self._executions: Dict[asyncio.Task, Union['ExecutionMonitor', 'DagRun']] = {}
 
         self.status = 'never launched'
 
     @property
-    def task(self):
+    def task(self) -> TaskSpec:
         return self._task
 
     @property
     def active(self):
         return self._active
 
+    @property
+    def running_executions(self) -> int:
+        return len(self._executions)
+
     def run(self):
         if not self._active:
             self._active = True
@@ -37,26 +60,77 @@ class TaskExecutor:
             self._loop.create_task(self._scheduling_loop())
 
     async def _scheduling_loop(self):
-        for run_date in RunDateIterator(self.task):
+        for run_date in self._run_dates():
+            if not self._active:
+                break
+            self._next_run_date = run_date
+            await self._await_run(run_date + self.task.launch_offset)
+            if self._manager:
+                await self._manager.launch_limiter.acquire()
             if not self._active:
                 break
-            await self._await_run(run_date)
 
-            self._current_execution = ExecutionMonitor(self.task, status_callback=self._update_status)
-            self._loop.create_task(self._current_execution.start())
+            self._current_execution = self._create_execution(run_date)
+            execution = self._loop.create_task(self._current_execution.start())
+            self._executions[execution] = self._current_execution
+            execution.add_done_callback(self._forget_execution)
 
         self._active = False
+        self._next_run_date = None
+
+    def _create_execution(self, run_date: datetime) -> Union['ExecutionMonitor', 'DagRun']:
+        if not self._manager:
+            return ExecutionMonitor(self.task, status_callback=self.update_status, planned_date=run_date)
+
+        if self._manager.graph.has_downstream(self.task.task_id):
+            return DagRun(self.task, self._manager, status_callback=self.update_status, planned_date=run_date)
+        return self._manager.create_monitor(self.task, self.update_status, planned_date=run_date)
+
+    def _run_dates(self) -> 'RunDateIterator':
+        return RunDateIterator(self.task)
 
     @staticmethod
-    async def _await_run(run_date: datetime):
-        delay = run_date - datetime.now()
+    def _now() -> datetime:
+        return datetime.now()
+
+    async def _await_run(self, run_date: datetime):
+        delay = run_date - self._now()
         await asyncio.sleep(delay.total_seconds())
 
     def stop(self):
+        """Stop scheduling and cancel runs still waiting for an admission slot."""
         self._active = False
+        for execution, monitor in list(self._executions.items()):
+            if monitor.queued:
+                execution.cancel()
+
+    def _forget_execution(self, execution: asyncio.Task):
+        self._executions.pop(execution, None)
 
-    def _update_status(self, status):
+    def update_status(self, status: str):
+        """Status callback of the executor's runs; subscribers of the manager are notified."""
         self.status = status
+        if self._manager:
+            self._manager.notify({'event': 'status', 'task_id': self._task.task_id, 'status': status})
+
+    def forecast(self, until: datetime) -> List[Tuple[datetime, datetime]]:
+        """Run dates before ``until`` together with the jittered launch dates they map to.
+
+        Dates continue from the run the executor is waiting for, and at most
+        ``max_forecast_runs`` of them are returned.
+        """
+        if self._next_run_date is None:
+            run_dates = self._task.run_date_iter
+        else:
+            run_dates = itertools.chain([self._next_run_date], self._task.run_dates_after(self._next_run_date))
+
+        launch_offset = self._task.launch_offset
+        planned = []
+        for run_date in itertools.islice(run_dates, self.max_forecast_runs):
+            if run_date is None or run_date >= until:
+                break
+            planned.append((run_date, run_date + launch_offset))
+        return planned
 
     def to_dict(self):
         return {
@@ -65,16 +139,35 @@ class TaskExecutor:
             'status': self.status
         }
 
+    def status_dict(self):
+        return {
+            'task_id': self._task.task_id,
+            'active': self.active,
+            'status': self.status
+        }
+
     def __str__(self):
         return f"TaskExecutor('{self._task.command}', {self._task.trigger_type}, '{self._task.trigger_args}')"
 
 
 class RunDateIterator:
-    def __init__(self, task: Task):
+    """Run dates of a task from now on, logging the ones already missed.
+
+    ``clock`` and ``start`` let the schedule run against a virtual clock; by
+    default the task's own run dates are checked against the wall clock.
+    """
+
+    def __init__(self, task: Union[Task, TaskSpec], clock: Callable[[], datetime] = datetime.now,
+                 start: datetime = None):
         self._task = task
+        self._clock = clock
+        self._start = start
 
     def __iter__(self):
-        self._run_date_iter = iter(self._task.run_date_iter)
+        if self._start is None:
+            self._run_date_iter = iter(self._task.run_date_iter)
+        else:
+            self._run_date_iter = iter(self._task.run_dates_after(self._start))
         return self
 
     def __next__(self) -> datetime:
@@ -90,7 +183,8 @@ class RunDateIterator:
     def _skip_missed(self, run_date: datetime) -> datetime:
         missed = False
 
-        while run_date < datetime.now():
+        launch_offset = self._task.launch_offset
+        while run_date + launch_offset < self._clock():
             missed = True
             self._log_missed_run(run_date)
             run_date = next(self._run_date_iter)
@@ -104,23 +198,59 @@ class RunDateIterator:
         missed_log = ProcessLog(self._task.task_id, start_date=run_date)
         missed_log.set_state(ExecutionState.MISSED)
         logger.log(missed_log)
+        TaskStatsRecorder().record(missed_log)
 
 
 class ExecutionMonitor:
-    def __init__(self, task: Task, status_callback: Callable):
+    default_kill_grace = 5
+
+    def __init__(self, task: Task, status_callback: Callable, admission: AdmissionQueue = None,
+                 planned_date: datetime = None, parent_run_id: int = None):
         self._task = task
         self._status_callback = status_callback
+        self._admission = admission
+        self._planned_date = planned_date
+        self._parent_run_id = parent_run_id
         self._log = ProcessLog(self._task.task_id)
+        self._limiter = OutputLimiter(OutputPolicy.from_json(self._task.output_policy))
+        self._resource_limits = ResourceLimits.from_json(self._task.resource_limits)
+        self._timed_out = False
+        self._started = False
 
-    async def start(self):
-        await self._log_start()
+    @property
+    def queued(self) -> bool:
+        """Whether the run is still waiting for an admission slot."""
+        return not self._started
 
-        return_code = await self._execute_process()
-        return return_code
+    @property
+    def state(self) -> ExecutionState:
+        return self._log.state
 
-    async def _log_start(self):
+    @property
+    def process_log_id(self) -> int:
+        return self._log.process_log_id
+
+    async def start(self):
+        if not self._admission:
+            await self._log_start()
+            return await self._execute_process()
+
+        self._status_callback(ExecutionState.AWAITING.name.lower())
+        queue_wait = await self._admission.acquire(self._task.priority)
+        try:
+            await self._log_start(queue_wait)
+            return await self._execute_process()
+        finally:
+            self._admission.release()
+
+    async def _log_start(self, queue_wait: float = 0.0):
+        self._started = True
         async with Session(expire_on_commit=False) as session:
             self._log = ProcessLog(self._task.task_id)
+            self._log.queue_wait = queue_wait
+            self._log.parent_run_id = self._parent_run_id
+            if self._planned_date:
+                self._log.planned_date = self._planned_date.astimezone(timezone.utc).replace(tzinfo=None)
             self._log.set_state(ExecutionState.STARTED)
             self._status_callback(self._log.status)
 
@@ -128,21 +258,82 @@ class ExecutionMonitor:
             await session.commit()
 
     async def _execute_process(self) -> int:
+        install_child_watcher()
+        child_limits = self._resource_limits.preexec_fn()
+        try:
+            return await self._run_process(child_limits)
+        finally:
+            if child_limits:
+                child_limits.close()
+
+    async def _run_process(self, child_limits: Union[ChildLimits, None]) -> int:
         process = await asyncio.create_subprocess_shell(
             self._task.command,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+            preexec_fn=child_limits,
             shell=True)
 
-        async for output_log in self._yield_output_logs(process):
-            print(output_log.message, end='')
+        capture = asyncio.ensure_future(self._capture_output(process))
+        exited = asyncio.ensure_future(process.wait())
+        try:
+            await asyncio.wait({capture, exited}, timeout=self._task.timeout)
+        except asyncio.CancelledError:
+            self._signal_group(process, signal.SIGTERM)
+            capture.cancel()
+            raise
+        if not (capture.done() and exited.done()):
+            self._timed_out = True
+            await self._terminate(process, capture, exited)
+        if not capture.cancelled():
+            capture.result()
+
+        for output_log in self._limiter.finish(self._log.process_log_id):
             logger.log(output_log)
 
         await process.wait()
         return_code = process.returncode
+        failure = child_limits.failure() if child_limits else None
+        if failure:
+            logger.log(StderrLog(failure, datetime.utcnow(), self._log.process_log_id))
+
+        rusage = pop_resource_usage(process.pid)
+        if rusage:
+            self._log.set_resource_usage(rusage)
         await self._log_end(return_code)
         return return_code
 
+    async def _capture_output(self, process: Process):
+        console_mirror = get_console_mirror()
+        async for output_log in self._yield_output_logs(process):
+            if self._limiter.admit(output_log):
+                console_mirror.write(output_log.message)
+                logger.log(output_log)
+
+    async def _terminate(self, process: Process, capture: asyncio.Future, exited: asyncio.Future):
+        """SIGTERM the process group, SIGKILL it if it has not exited and closed its pipes after the grace period."""
+        kill_grace = self.default_kill_grace if self._task.kill_grace is None else self._task.kill_grace
+        self._signal_group(process, signal.SIGTERM)
+        await asyncio.wait({capture, exited}, timeout=kill_grace)
+
+        if not (capture.done() and exited.done()):
+            self._signal_group(process, getattr(signal, 'SIGKILL', signal.SIGTERM))
+            await asyncio.wait({capture, exited}, timeout=kill_grace)
+            capture.cancel()
+            await asyncio.wait({capture})
+        await exited
+
+    @staticmethod
+    def _signal_group(process: Process, sig: int):
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(process.pid, sig)
+            else:
+                process.send_signal(sig)
+        except ProcessLookupError:
+            pass
+
     async def _yield_stdout_logs(self, process: Process):
         while line := await process.stdout.readline():
             yield ConsoleLog(line.decode(), datetime.utcnow(), self._log.process_log_id)
@@ -158,25 +349,22 @@ class ExecutionMonitor:
                 yield log
 
     async def _log_end(self, return_code: int):
-        if return_code:
-            await self._log_failed(return_code)
+        if self._timed_out:
+            await self._log_state(ExecutionState.TIMED_OUT, return_code)
+        elif return_code:
+            await self._log_state(ExecutionState.FAILED, return_code)
         else:
-            await self._log_finish()
+            await self._log_state(ExecutionState.FINISHED)
+        self._record_stats()
         await logger.flush()
 
-    async def _log_finish(self):
-        async with Session(expire_on_commit=False) as session:
-            self._log.set_state(ExecutionState.FINISHED)
-            self._log.finish_date = datetime.utcnow()
-            self._status_callback(self._log.status)
+    def _record_stats(self):
+        TaskStatsRecorder().record(self._log, self._limiter.dropped_lines, self._limiter.dropped_bytes)
 
-            session.add(self._log)
-            await session.commit()
-
-    async def _log_failed(self, return_code: int):
+    async def _log_state(self, state: ExecutionState, return_code: int = None):
         async with Session(expire_on_commit=False) as session:
             self._log.return_code = return_code
-            self._log.set_state(ExecutionState.FAILED)
+            self._log.set_state(state)
             self._log.finish_date = datetime.utcnow()
             self._status_callback(self._log.status)
 
@@ -184,57 +372,236 @@ class ExecutionMonitor:
             await session.commit()
 
 
+class DagRun:
+    """Runs a task and then everything downstream of it.
+
+    Every downstream task starts as soon as all of its upstream tasks in this
+    run have ended in a state matching the edge condition, so independent
+    branches run in parallel within the admission slot budget. Tasks whose
+    conditions fail are skipped together with their own downstream tasks.
+    """
+
+    def __init__(self, task: Task, manager: 'ExecutionManager', status_callback: Callable,
+                 planned_date: datetime = None):
+        self._task = task
+        self._manager = manager
+        self._status_callback = status_callback
+        self._planned_date = planned_date
+        self._root = manager.create_monitor(task, status_callback, planned_date=planned_date)
+        self.results: Dict[int, Union[ExecutionState, None]] = {}
+
+    @property
+    def queued(self) -> bool:
+        return self._root.queued
+
+    async def start(self) -> Dict[int, Union[ExecutionState, None]]:
+        root = self._root
+        await root.start()
+        self.results[self._task.task_id] = root.state
+
+        nodes: Dict[int, asyncio.Future] = {}
+        for task_id in self._manager.graph.descendants(self._task.task_id):
+            nodes[task_id] = asyncio.ensure_future(self._run_node(task_id, nodes, root.process_log_id))
+        try:
+            await asyncio.gather(*nodes.values())
+        except BaseException:
+            for node in nodes.values():
+                node.cancel()
+            raise
+
+        return self.results
+
+    async def _run_node(self, task_id: int, nodes: Dict[int, asyncio.Future],
+                        parent_run_id: int) -> Union[ExecutionState, None]:
+        self.results[task_id] = None
+        for upstream_id, condition in self._manager.graph.upstream(task_id):
+            if upstream_id in nodes:
+                state = await nodes[upstream_id]
+            elif upstream_id in self.results:
+                state = self.results[upstream_id]
+            else:
+                continue
+
+            if state is None or not TaskGraph.satisfied(condition, state):
+                return None
+
+        executor = self._manager.task_executors.get(task_id)
+        if not executor:
+            return None
+
+        monitor = self._manager.create_monitor(executor.task, executor.update_status, parent_run_id=parent_run_id)
+        await monitor.start()
+        self.results[task_id] = monitor.state
+        return monitor.state
+
+
 class ExecutionManager(metaclass=SingletonMeta):
+    """Executors of all tasks, kept in step with the database by ``sync``.
+
+    Every executor status change, run, stop and task edit bumps ``version``
+    and is kept in a change log of ``change_log_size`` entries, from which
+    ``changes`` answers pollers with only what changed since the version
+    they last saw. Versions start at the wall clock in microseconds, so
+    those of a restarted scheduler are ahead of any a client kept.
+    """
+    sync_chunk_size = 1000
+    change_log_size = 10000
+
     def __init__(self):
         self.task_executors: Dict[int, TaskExecutor] = {}
-        self._loop = asyncio.get_event_loop()
+        self.admission = AdmissionQueue.from_env()
+        self.launch_limiter = LaunchRateLimiter.from_env()
+        self.graph = TaskGraph()
+        self.work_queue = WorkQueue.from_env()
+        self.version = time.time_ns() // 1000
+        self._changes: Deque[Tuple[int, int, bool]] = collections.deque(maxlen=self.change_log_size)
+        self._changes_complete_after = self.version
+        self._sync_lock = asyncio.Lock()
+        self._listeners: List[Callable[[Dict], None]] = []
 
     async def sync(self):
-        async with Session() as session:
-            select_stmt = sqlalchemy.select(Task)
-            tasks_rs = await session.execute(select_stmt)
-            db_tasks: List[Task] = list(tasks_rs.scalars())
-
-            self._update_db_tasks(db_tasks)
-            self._delete_db_tasks(db_tasks)
+        async with self._sync_lock:
+            db_task_ids = set()
+            async with Session() as session:
+                select_stmt = sqlalchemy.select(Task).execution_options(yield_per=self.sync_chunk_size)
+                tasks_rs = await session.stream_scalars(select_stmt)
+                async for db_tasks in tasks_rs.partitions(self.sync_chunk_size):
+                    self._update_db_tasks(db_tasks)
+                    db_task_ids.update(db_task.task_id for db_task in db_tasks)
+                    await asyncio.sleep(0)
+
+                dependencies_rs = await session.execute(sqlalchemy.select(TaskDependency))
+                self.graph.load(
+                    (dependency.upstream_task_id, dependency.downstream_task_id, dependency.condition)
+                    for dependency
+                    in dependencies_rs.scalars()
+                )
+
+            self._delete_db_tasks(db_task_ids)
+        self.notify({'event': 'sync'})
+
+    def subscribe(self, listener: Callable[[Dict], None]):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[Dict], None]):
+        self._listeners.remove(listener)
+
+    def notify(self, event: Dict):
+        if 'task_id' in event:
+            self._record_change(event['task_id'])
+        for listener in list(self._listeners):
+            listener(event)
+
+    def _record_change(self, task_id: int, task_changed: bool = False):
+        if len(self._changes) == self._changes.maxlen:
+            self._changes_complete_after = self._changes[0][0]
+        self.version += 1
+        self._changes.append((self.version, task_id, task_changed))
+
+    def changes(self, since: int) -> Dict:
+        """Executors changed after version ``since``, or all of them when the change log does not reach back to it.
+
+        Executors whose task was edited are returned in full, the others
+        only with their status; deleted tasks are listed in ``removed``.
+        """
+        if not self._changes_complete_after <= since <= self.version:
+            return {
+                'version': self.version,
+                'full': True,
+                'task_executors': [executor.to_dict() for executor in self.task_executors.values()],
+                'removed': []
+            }
+
+        changed: Dict[int, bool] = {}
+        for version, task_id, task_changed in reversed(self._changes):
+            if version <= since:
+                break
+            changed[task_id] = changed.get(task_id, False) or task_changed
+
+        executors, removed = [], []
+        for task_id, task_changed in sorted(changed.items()):
+            executor = self.task_executors.get(task_id)
+            if executor is None:
+                removed.append(task_id)
+            elif task_changed:
+                executors.append({'task_id': task_id, **executor.to_dict()})
+            else:
+                executors.append(executor.status_dict())
+        return {'version': self.version, 'full': False, 'task_executors': executors, 'removed': removed}
 
     def _update_db_tasks(self, db_tasks: List[Task]):
         for db_task in db_tasks:
             if db_task.task_id in self.task_executors:
                 current_executor = self.task_executors[db_task.task_id]
-                if db_task != current_executor.task:
+                if TaskSpec.fingerprint_of(db_task) != current_executor.task.fingerprint:
                     self._update_task(current_executor, db_task)
             else:
                 self._add_task(db_task)
 
+    def create_monitor(self, task: TaskSpec, status_callback: Callable, planned_date: datetime = None,
+                       parent_run_id: int = None) -> Union[ExecutionMonitor, RemoteExecution]:
+        """Monitor of a single run: in this process, or through the work queue when agents execute runs."""
+        if self.work_queue:
+            return RemoteExecution(self.work_queue, task, status_callback, planned_date, parent_run_id)
+        return ExecutionMonitor(task, status_callback, admission=self.admission, planned_date=planned_date,
+                                parent_run_id=parent_run_id)
+
+    def _create_executor(self, task: Task) -> TaskExecutor:
+        return TaskExecutor(TaskSpec.from_task(task), self)
+
     def _add_task(self, new_task: Task):
-        self.task_executors.update({new_task.task_id: TaskExecutor(new_task)})
+        self.task_executors.update({new_task.task_id: self._create_executor(new_task)})
+        self._record_change(new_task.task_id, task_changed=True)
 
     def _update_task(self, current_executor: TaskExecutor, new_task: Task):
-        new_executor = TaskExecutor(new_task)
+        new_executor = self._create_executor(new_task)
         self.task_executors.update({new_task.task_id: new_executor})
+        self._record_change(new_task.task_id, task_changed=True)
         if current_executor.active:
             new_executor.run()
 
         current_executor.stop()
         del current_executor
 
-    def _delete_db_tasks(self, db_tasks: List[Task]):
-        db_task_ids = set(db_task.task_id for db_task in db_tasks)
+    def _delete_db_tasks(self, db_task_ids: Set[int]):
         curr_task_ids = set(self.task_executors.keys())
         for task_id in curr_task_ids - db_task_ids:
             self.task_executors[task_id].stop()
             del self.task_executors[task_id]
+            self._record_change(task_id, task_changed=True)
 
     def run_task(self, task_id: int):
         self.task_executors[task_id].run()
+        self._record_change(task_id)
 
     def run_all(self):
         for task_id in self.task_executors.keys():
             self.run_task(task_id)
 
+    def forecast(self, minutes: int, bucket_seconds: int = 60) -> List[Dict]:
+        """Scheduled versus jittered launch counts of active executors, per time bucket."""
+        now = datetime.now()
+        until = now + timedelta(minutes=minutes)
+        bucket_count = -(-minutes * 60 // bucket_seconds)
+        buckets = [
+            {'time': now + timedelta(seconds=i * bucket_seconds), 'scheduled': 0, 'planned': 0}
+            for i
+            in range(bucket_count)
+        ]
+
+        for executor in self.task_executors.values():
+            if not executor.active:
+                continue
+            for run_date, launch_date in executor.forecast(until):
+                for key, date in (('scheduled', run_date), ('planned', launch_date)):
+                    index = int((date - now).total_seconds() // bucket_seconds)
+                    if 0 <= index < bucket_count:
+                        buckets[index][key] += 1
+        return buckets
+
     def stop_task(self, task_id: int):
         self.task_executors[task_id].stop()
+        self._record_change(task_id)
 
     def stop_all(self):
         for task_id in self.task_executors.keys():
@@ -0,0 +1,36 @@
+from db.archive import get_history_archive
+from db.connection import get_engine
+from db.models import Base
+from db.search import ensure_search_index
+from db.upgrade import upgrade_schema
+from scheduler.executor import ExecutionManager
+from util import logger
+from util.loop_monitor import get_loop_monitor
+from util.startup import StartupReport
+
+
+async def create_scheduler(report: StartupReport = None) -> ExecutionManager:
+    """Create the schema, load every task into an executor and start dispatching."""
+    report = report or StartupReport()
+
+    with report.phase('schema_create'):
+        async with get_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await upgrade_schema(conn)
+            await ensure_search_index(conn)
+
+    execution_manager = ExecutionManager()
+    with report.phase('sync'):
+        await execution_manager.sync()
+
+    with report.phase('first_dispatch'):
+        logger.start()
+        get_loop_monitor().start()
+        execution_manager.run_all()
+        if execution_manager.work_queue:
+            execution_manager.work_queue.start()
+        history_archive = get_history_archive()
+        if history_archive:
+            history_archive.start()
+
+    return execution_manager
@@ -0,0 +1,204 @@
+import ctypes
+import json
+import logging
+import os
+import platform
+import sys
+from typing import Callable, List, Union
+
+from dotenv import load_dotenv
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+log = logging.getLogger(__name__)
+
+
+default_cgroup_root = '/sys/fs/cgroup'
+
+_ioprio_set_syscalls = {
+    'x86_64': 251,
+    'i386': 289,
+    'i686': 289,
+    'aarch64': 30,
+    'armv7l': 314,
+    'ppc64le': 273,
+    's390x': 282
+}
+_ioprio_classes = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+_ioprio_class_shift = 13
+_ioprio_who_process = 1
+
+
+def cgroup_root() -> str:
+    load_dotenv()
+    return os.environ.get('CGROUP_ROOT', default_cgroup_root)
+
+
+class ResourceLimits:
+    """Per-task OS limits for the child process, parsed from ``TaskModel.resource_limits``.
+
+    ``preexec_fn`` applies them in the forked child before the shell is
+    exec'd: scheduling niceness, I/O priority, CPU affinity, ``RLIMIT_AS``,
+    ``RLIMIT_CPU`` and ``RLIMIT_NOFILE``, and placement into a cgroup v2
+    group relative to ``CGROUP_ROOT``. A limit that cannot be applied fails
+    the run with exit code 126 and the reason on its error output, rather
+    than letting the command run unconstrained. Settings the platform does
+    not support, and the cgroup on hosts without the cgroup v2 hierarchy,
+    are skipped with a warning.
+    """
+    __slots__ = ('nice', 'ionice_class', 'ionice_level', 'cpu_affinity', 'max_memory', 'max_cpu_seconds',
+                 'max_open_files', 'cgroup')
+
+    failure_code = 126
+
+    def __init__(self, nice: int = None, ionice_class: str = None, ionice_level: int = None,
+                 cpu_affinity: List[int] = None, max_memory: int = None, max_cpu_seconds: int = None,
+                 max_open_files: int = None, cgroup: str = None):
+        if ionice_class is not None and ionice_class not in _ioprio_classes:
+            raise ValueError(f"No such I/O priority class '{ionice_class}'")
+        if cgroup is not None and (os.path.isabs(cgroup) or '..' in cgroup.split('/')):
+            raise ValueError(f"cgroup '{cgroup}' must be a path below the cgroup root")
+
+        self.nice = nice
+        self.ionice_class = ionice_class
+        self.ionice_level = ionice_level
+        self.cpu_affinity = cpu_affinity
+        self.max_memory = max_memory
+        self.max_cpu_seconds = max_cpu_seconds
+        self.max_open_files = max_open_files
+        self.cgroup = cgroup
+
+    @property
+    def limited(self) -> bool:
+        return any(getattr(self, name) is not None for name in self.__slots__)
+
+    @classmethod
+    def from_json(cls, data: Union[str, None]) -> 'ResourceLimits':
+        if not data:
+            return cls()
+        return cls(**json.loads(data))
+
+    def _rlimits(self) -> List[tuple]:
+        limits = (
+            ('RLIMIT_AS', self.max_memory),
+            ('RLIMIT_CPU', self.max_cpu_seconds),
+            ('RLIMIT_NOFILE', self.max_open_files)
+        )
+        return [(getattr(resource, name), value) for name, value in limits if value is not None]
+
+    @staticmethod
+    def _ioprio_set() -> Union[Callable[[int], None], None]:
+        syscall_number = _ioprio_set_syscalls.get(platform.machine())
+        if syscall_number is None or not sys.platform.startswith('linux'):
+            return None
+        libc = ctypes.CDLL(None, use_errno=True)
+
+        def ioprio_set(ioprio: int):
+            if libc.syscall(syscall_number, _ioprio_who_process, 0, ioprio) != 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, os.strerror(errno))
+
+        return ioprio_set
+
+    def _cgroup_procs(self) -> Union[str, None]:
+        root = cgroup_root()
+        if not os.path.exists(os.path.join(root, 'cgroup.controllers')):
+            log.warning('No cgroup v2 hierarchy at %s, not placing runs in %s', root, self.cgroup)
+            return None
+        path = os.path.join(root, self.cgroup)
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError as e:
+            log.warning('Cannot create cgroup %s, not placing runs in it: %s', path, e)
+            return None
+        return os.path.join(path, 'cgroup.procs')
+
+    def preexec_fn(self) -> Union['ChildLimits', None]:
+        """Callable applying the limits in the child, or None when there are none to apply.
+
+        Everything that can be resolved up front is resolved here, in the
+        parent, so the child only makes system calls between fork and exec.
+        """
+        if not self.limited:
+            return None
+        if os.name != 'posix':
+            log.warning('Resource limits are not supported on %s, running without them', os.name)
+            return None
+
+        ioprio_set = ioprio = None
+        if self.ionice_class is not None or self.ionice_level is not None:
+            ioprio_set = self._ioprio_set()
+            ioprio_class = _ioprio_classes[self.ionice_class or 'best-effort']
+            ioprio = ioprio_class << _ioprio_class_shift | (self.ionice_level or 0)
+            if ioprio_set is None:
+                log.warning('I/O priority is not supported on %s %s, ignoring it', sys.platform, platform.machine())
+        cpu_affinity = self.cpu_affinity
+        if cpu_affinity is not None and not hasattr(os, 'sched_setaffinity'):
+            log.warning('CPU affinity is not supported on %s, ignoring it', sys.platform)
+            cpu_affinity = None
+        cgroup_procs = self._cgroup_procs() if self.cgroup else None
+        return ChildLimits(cgroup_procs, self.nice, ioprio_set, ioprio, cpu_affinity, self._rlimits())
+
+
+class ChildLimits:
+    """``preexec_fn`` of one launch, reporting a failure to the parent through a pipe.
+
+    The child's stdio cannot carry the reason: uvloop runs ``preexec_fn``
+    right after fork, before the pipes to the parent are in place. The
+    report pipe is close-on-exec, so it reads as empty once the command
+    was exec'd.
+    """
+
+    def __init__(self, cgroup_procs: Union[str, None], nice: Union[int, None],
+                 ioprio_set: Union[Callable[[int], None], None], ioprio: Union[int, None],
+                 cpu_affinity: Union[List[int], None], rlimits: List[tuple]):
+        self._cgroup_procs = cgroup_procs
+        self._nice = nice
+        self._ioprio_set = ioprio_set
+        self._ioprio = ioprio
+        self._cpu_affinity = cpu_affinity
+        self._rlimits = rlimits
+        self._report_fd, self._child_report_fd = os.pipe()
+
+    def __call__(self):
+        try:
+            if self._cgroup_procs:
+                with open(self._cgroup_procs, 'w') as f:
+                    f.write(str(os.getpid()))
+            if self._nice is not None:
+                os.setpriority(os.PRIO_PROCESS, 0, self._nice)
+            if self._ioprio_set:
+                self._ioprio_set(self._ioprio)
+            if self._cpu_affinity is not None:
+                os.sched_setaffinity(0, self._cpu_affinity)
+            for limit, value in self._rlimits:
+                _, hard = resource.getrlimit(limit)
+                if hard != resource.RLIM_INFINITY:
+                    value = min(value, hard)
+                resource.setrlimit(limit, (value, value))
+        except Exception as e:
+            os.write(self._child_report_fd, f'Cannot apply resource limits: {e}\n'.encode())
+            os._exit(ResourceLimits.failure_code)
+
+    def failure(self) -> Union[str, None]:
+        """Why the child could not apply the limits, or None; read once the child has exited."""
+        self._close_child_end()
+        chunks = []
+        while chunk := os.read(self._report_fd, 4096):
+            chunks.append(chunk)
+        return b''.join(chunks).decode() or None
+
+    def _close_child_end(self):
+        if self._child_report_fd is not None:
+            os.close(self._child_report_fd)
+            self._child_report_fd = None
+
+    def close(self):
+        self._close_child_end()
+        if self._report_fd is not None:
+            os.close(self._report_fd)
+            self._report_fd = None
@@ -0,0 +1,110 @@
+import collections
+import json
+import time
+from datetime import datetime
+from typing import Deque, List, Union
+
+from db.models import OutputLog, ConsoleLog
+
+
+class OutputPolicy:
+    """Per-task limits on captured output, parsed from ``TaskModel.output_policy``."""
+    __slots__ = ('max_lines', 'max_bytes', 'max_lines_per_second', 'tail_lines')
+
+    default_tail_lines = 100
+
+    def __init__(self, max_lines: int = None, max_bytes: int = None, max_lines_per_second: float = None,
+                 tail_lines: int = None):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.max_lines_per_second = max_lines_per_second
+        self.tail_lines = self.default_tail_lines if tail_lines is None else tail_lines
+
+    @property
+    def limited(self) -> bool:
+        return any(limit is not None for limit in (self.max_lines, self.max_bytes, self.max_lines_per_second))
+
+    @classmethod
+    def from_json(cls, data: Union[str, None]) -> 'OutputPolicy':
+        if not data:
+            return cls()
+        return cls(**json.loads(data))
+
+
+class OutputLimiter:
+    """Applies an ``OutputPolicy`` to the output of a single execution.
+
+    Lines are admitted until ``max_lines`` or ``max_bytes`` is hit. From then
+    on, lines are kept in a ring buffer of ``tail_lines``, everything pushed
+    out of it is counted as dropped, and ``finish`` returns a truncation
+    marker followed by the tail. Lines over ``max_lines_per_second`` are
+    dropped only while the rate is exceeded; admission resumes as the token
+    bucket refills.
+    """
+
+    def __init__(self, policy: OutputPolicy):
+        self._policy = policy
+        self._lines = 0
+        self._bytes = 0
+        self._tokens = policy.max_lines_per_second
+        self._refilled_at = time.monotonic()
+        self._tail: Deque[OutputLog] = collections.deque()
+
+        self.truncated = False
+        self.dropped_lines = 0
+        self.dropped_bytes = 0
+
+    def admit(self, log: OutputLog) -> bool:
+        if not self._policy.limited:
+            return True
+
+        size = len(log.message.encode())
+        if not self.truncated:
+            self.truncated = self._exceeds(size)
+
+        if not self.truncated:
+            if not self._take_token():
+                self._drop(log)
+                return False
+            self._lines += 1
+            self._bytes += size
+            return True
+
+        self._tail.append(log)
+        if len(self._tail) > self._policy.tail_lines:
+            self._drop(self._tail.popleft())
+        return False
+
+    def _exceeds(self, size: int) -> bool:
+        policy = self._policy
+        if policy.max_lines is not None and self._lines + 1 > policy.max_lines:
+            return True
+        if policy.max_bytes is not None and self._bytes + size > policy.max_bytes:
+            return True
+        return False
+
+    def _take_token(self) -> bool:
+        rate = self._policy.max_lines_per_second
+        if rate is None:
+            return True
+
+        now = time.monotonic()
+        self._tokens = min(rate, self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _drop(self, log: OutputLog):
+        self.dropped_lines += 1
+        self.dropped_bytes += len(log.message.encode())
+
+    def finish(self, process_log_id: int) -> List[OutputLog]:
+        logs = []
+        if self.dropped_lines:
+            message = f'[truncated {self.dropped_lines} lines / {self.dropped_bytes} bytes]\n'
+            logs.append(ConsoleLog(message, datetime.utcnow(), process_log_id))
+        logs.extend(self._tail)
+        self._tail.clear()
+        return logs
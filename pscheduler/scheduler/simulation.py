@@ -0,0 +1,299 @@
+"""Capacity planning: run task schedules against a virtual clock.
+
+The real ``TaskExecutor`` scheduling loop, ``RunDateIterator``, admission
+queue and launch rate limiter run on an event loop whose clock jumps to
+the next timer instead of waiting for it, so a week of schedule takes
+seconds. Executions are replaced by a model of their duration and output
+rate. Dependencies between tasks are not simulated.
+
+    PYTHONPATH=pscheduler python -m scheduler.simulation tasks.json --days 7
+
+``tasks.json`` holds a list of task definitions as accepted by
+``POST /task``, each with optional ``duration`` (seconds) and
+``output_rate`` (lines per second) fields.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import selectors
+from datetime import datetime, timedelta
+from typing import Counter, Dict, List, Sequence, Tuple
+
+from scheduler.admission import AdmissionQueue, LaunchRateLimiter
+from scheduler.dag import TaskGraph
+from scheduler.executor import TaskExecutor, RunDateIterator
+from scheduler.output import OutputPolicy
+from scheduler.spec import TaskSpec
+
+
+class VirtualClock:
+    def __init__(self, start: datetime):
+        self.start = start
+        self.monotonic = 0.0
+
+    def advance(self, seconds: float):
+        self.monotonic += seconds
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.monotonic)
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """Polls without blocking and advances the clock by the time the loop would have waited."""
+
+    def __init__(self, clock: VirtualClock):
+        super().__init__()
+        self._clock = clock
+
+    def select(self, timeout=None):
+        ready = super().select(0)
+        if not ready and timeout:
+            self._clock.advance(timeout)
+        return ready
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop whose ``time()`` is a ``VirtualClock``, which jumps straight to the next due timer."""
+
+    def __init__(self, clock: VirtualClock):
+        super().__init__(_VirtualSelector(clock))
+        self.clock = clock
+
+    def time(self) -> float:
+        return self.clock.monotonic
+
+
+class ExecutionModel:
+    """How long a run of a task takes and how many output lines per second it writes."""
+    __slots__ = ('duration', 'output_rate')
+
+    def __init__(self, duration: float = 1.0, output_rate: float = 0.0):
+        self.duration = duration
+        self.output_rate = output_rate
+
+    def output_lines(self, policy: OutputPolicy) -> int:
+        """Output rows stored for one run once ``policy`` has been applied."""
+        rate = self.output_rate
+        if policy.max_lines_per_second is not None:
+            rate = min(rate, policy.max_lines_per_second)
+        lines = int(rate * self.duration)
+        if policy.max_lines is not None and lines > policy.max_lines:
+            lines = policy.max_lines + min(policy.tail_lines, lines - policy.max_lines) + 1
+        return lines
+
+
+class SimulationReport:
+    def __init__(self, clock: VirtualClock, seconds: float):
+        self._clock = clock
+        self.seconds = seconds
+        self.executions = 0
+        self.missed = 0
+        self.running = 0
+        self.queued = 0
+        self.peak_concurrency = 0
+        self.peak_queued = 0
+        self.launches: Counter[int] = collections.Counter()
+        self.process_log_rows: Counter[int] = collections.Counter()
+        self.output_log_rows: Counter[int] = collections.Counter()
+
+    def missed_run(self, run_date: datetime):
+        self.missed += 1
+        self.process_log_rows[int((run_date - self._clock.start).total_seconds() // 3600)] += 1
+
+    def launched(self):
+        self.launches[int(self._clock.monotonic // 60)] += 1
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+
+    def started(self, duration: float, output_lines: int):
+        self.executions += 1
+        self.queued -= 1
+        self.running += 1
+        self.peak_concurrency = max(self.peak_concurrency, self.running)
+
+        now = self._clock.monotonic
+        self.process_log_rows[int(now // 3600)] += 1
+        self._spread(self.output_log_rows, now, now + duration, output_lines)
+
+    def finished(self):
+        self.running -= 1
+
+    @staticmethod
+    def _spread(buckets: Counter[int], start: float, end: float, amount: int):
+        """Add ``amount`` to the hourly buckets between ``start`` and ``end``, in proportion to the overlap."""
+        if end <= start:
+            buckets[int(start // 3600)] += amount
+            return
+        hour = int(start // 3600)
+        while hour * 3600 < end:
+            overlap = min(end, (hour + 1) * 3600) - max(start, hour * 3600)
+            buckets[hour] += amount * overlap / (end - start)
+            hour += 1
+
+    @staticmethod
+    def _rate(buckets: Counter[int], count: int) -> Dict:
+        values = [buckets.get(i, 0) for i in range(count)]
+        return {
+            'peak': round(max(values, default=0), 1),
+            'mean': round(sum(values) / count, 1) if count else 0.0
+        }
+
+    def to_dict(self) -> Dict:
+        minutes = max(1, int(self.seconds // 60))
+        hours = max(1, int(self.seconds // 3600))
+        busiest_minute = max(range(minutes), key=lambda minute: self.launches.get(minute, 0))
+        return {
+            'start': self._clock.start,
+            'simulated_seconds': self.seconds,
+            'executions': self.executions,
+            'missed': self.missed,
+            'peak_concurrency': self.peak_concurrency,
+            'peak_queued': self.peak_queued,
+            'launches_per_minute': self._rate(self.launches, minutes),
+            'busiest_minute': self._clock.start + timedelta(minutes=busiest_minute),
+            'process_log_rows_per_hour': self._rate(self.process_log_rows, hours),
+            'output_log_rows_per_hour': self._rate(self.output_log_rows, hours)
+        }
+
+
+class _SimulatedManager:
+    """The parts of ``ExecutionManager`` a ``TaskExecutor`` uses, without the database."""
+
+    def __init__(self, slots: int, launch_rate: float = None, launch_burst: int = 1):
+        self.admission = AdmissionQueue(slots)
+        self.launch_limiter = LaunchRateLimiter(launch_rate, launch_burst, clock=asyncio.get_event_loop().time)
+        self.graph = TaskGraph()
+
+    def notify(self, event: Dict):
+        pass
+
+
+class _SimulatedRunDateIterator(RunDateIterator):
+    def __init__(self, task: TaskSpec, report: SimulationReport, clock: VirtualClock):
+        super().__init__(task, clock=clock.now, start=clock.now())
+        self._report = report
+
+    def _log_missed_run(self, run_date: datetime):
+        self._report.missed_run(run_date)
+
+
+class SimulatedExecution:
+    """Stands in for ``ExecutionMonitor``: waits for a slot, then holds it for the modeled duration."""
+
+    def __init__(self, task: TaskSpec, model: ExecutionModel, admission: AdmissionQueue, report: SimulationReport):
+        self._task = task
+        self._model = model
+        self._admission = admission
+        self._report = report
+        self._started = False
+
+    @property
+    def queued(self) -> bool:
+        return not self._started
+
+    async def start(self):
+        self._report.launched()
+        await self._admission.acquire(self._task.priority)
+        self._started = True
+        self._report.started(self._model.duration,
+                             self._model.output_lines(OutputPolicy.from_json(self._task.output_policy)))
+        try:
+            await asyncio.sleep(self._model.duration)
+        finally:
+            self._report.finished()
+            self._admission.release()
+
+
+class SimulatedTaskExecutor(TaskExecutor):
+    def __init__(self, task: TaskSpec, manager: _SimulatedManager, clock: VirtualClock, model: ExecutionModel,
+                 report: SimulationReport):
+        super().__init__(task, manager)
+        self._clock = clock
+        self._model = model
+        self._report = report
+
+    def _run_dates(self) -> RunDateIterator:
+        return _SimulatedRunDateIterator(self.task, self._report, self._clock)
+
+    def _now(self) -> datetime:
+        return self._clock.now()
+
+    def _create_execution(self, run_date: datetime) -> SimulatedExecution:
+        return SimulatedExecution(self.task, self._model, self._manager.admission, self._report)
+
+
+async def _simulate(tasks: Sequence[Tuple[TaskSpec, ExecutionModel]], clock: VirtualClock, seconds: float,
+                    slots: int, launch_rate: float, launch_burst: int) -> Dict:
+    manager = _SimulatedManager(slots, launch_rate, launch_burst)
+    report = SimulationReport(clock, seconds)
+    executors = [
+        SimulatedTaskExecutor(task, manager, clock, model, report)
+        for task, model
+        in tasks
+    ]
+    for executor in executors:
+        executor.run()
+
+    await asyncio.sleep(seconds)
+
+    for executor in executors:
+        executor.stop()
+    pending = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return report.to_dict()
+
+
+def simulate(tasks: Sequence[Tuple[TaskSpec, ExecutionModel]], days: float = 7, start: datetime = None,
+             slots: int = AdmissionQueue.default_slots, launch_rate: float = None, launch_burst: int = 1) -> Dict:
+    """Run ``tasks`` for ``days`` of virtual time and report the load they produce."""
+    clock = VirtualClock(start or datetime.now().replace(second=0, microsecond=0))
+    loop = VirtualTimeLoop(clock)
+    try:
+        return loop.run_until_complete(
+            _simulate(tasks, clock, days * 24 * 3600, slots, launch_rate, launch_burst)
+        )
+    finally:
+        loop.close()
+
+
+def load_tasks(definitions: List[Dict]) -> List[Tuple[TaskSpec, ExecutionModel]]:
+    tasks = []
+    for task_id, definition in enumerate(definitions, start=1):
+        trigger_args = definition['trigger_args']
+        output_policy = definition.get('output_policy')
+        task = TaskSpec(
+            task_id,
+            definition.get('title', f'task {task_id}'),
+            definition.get('command', ''),
+            definition['trigger_type'],
+            trigger_args if isinstance(trigger_args, str) else json.dumps(trigger_args),
+            output_policy=json.dumps(output_policy) if output_policy else None,
+            priority=definition.get('priority'),
+            jitter=definition.get('jitter')
+        )
+        model = ExecutionModel(definition.get('duration', 1.0), definition.get('output_rate', 0.0))
+        tasks.append((task, model))
+    return tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('tasks', help='JSON file with a list of task definitions')
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument('--slots', type=int, default=AdmissionQueue.default_slots)
+    parser.add_argument('--launch-rate', type=float)
+    parser.add_argument('--launch-burst', type=int, default=1)
+    args = parser.parse_args()
+
+    with open(args.tasks) as f:
+        tasks = load_tasks(json.load(f))
+    report = simulate(tasks, args.days, slots=args.slots, launch_rate=args.launch_rate,
+                      launch_burst=args.launch_burst)
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
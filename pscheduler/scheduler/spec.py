@@ -0,0 +1,170 @@
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Union
+
+from scheduler.cron import compile_cron
+from scheduler.task import Task, jitter_offset
+
+
+class IntervalTrigger:
+    __slots__ = ('interval',)
+
+    def __init__(self, trigger_args: str):
+        self.interval = timedelta(**json.loads(trigger_args))
+
+    @property
+    def period(self) -> timedelta:
+        return self.interval
+
+    def run_date_iter(self) -> Iterator[datetime]:
+        return self.run_dates_after(datetime.now())
+
+    def run_dates_after(self, start: datetime) -> Iterator[datetime]:
+        run_date = start
+        while True:
+            run_date += self.interval
+            yield run_date
+
+
+class CronTrigger:
+    """Cron expression compiled once; tasks sharing an expression share the compiled form."""
+    __slots__ = ('_template',)
+
+    def __init__(self, trigger_args: str):
+        self._template = compile_cron(trigger_args)
+
+    @property
+    def period(self) -> timedelta:
+        run_dates = self.run_date_iter()
+        first = next(run_dates)
+        return next(run_dates) - first
+
+    def run_date_iter(self) -> Iterator[datetime]:
+        return self.run_dates_after(datetime.now())
+
+    def run_dates_after(self, start: datetime) -> Iterator[datetime]:
+        return self._template.run_dates_after(start)
+
+
+class DateTrigger:
+    __slots__ = ('date',)
+
+    def __init__(self, trigger_args: str):
+        self.date = datetime.fromisoformat(trigger_args)
+
+    @property
+    def period(self) -> None:
+        return None
+
+    def run_date_iter(self) -> Iterator[Union[datetime, None]]:
+        yield self.date
+        while True:
+            yield None
+
+    def run_dates_after(self, start: datetime) -> Iterator[datetime]:
+        if self.date > start:
+            yield self.date
+
+
+class TaskSpec:
+    """Immutable snapshot of what an executor needs from a task, detached from the session.
+
+    Mapped ``Task`` instances carry SQLAlchemy instance state and re-parse
+    their trigger on every access. A spec copies the executor columns into
+    slots, parses the trigger once and stores the fingerprint used to
+    detect changes on sync.
+    """
+    triggers = {
+        'interval': IntervalTrigger,
+        'cron': CronTrigger,
+        'date': DateTrigger
+    }
+
+    descriptive_columns = ('task_id', 'title', 'descr', 'starting_date', 'last_run')
+    __slots__ = descriptive_columns + Task._executor_columns + ('trigger', 'fingerprint')
+
+    def __init__(self, task_id: int, title: str, command: str, trigger_type: str, trigger_args: str,
+                 output_policy: str = None, timeout: float = None, kill_grace: float = None,
+                 priority: str = None, jitter: float = None, resource_limits: str = None, descr: str = None,
+                 starting_date: datetime = None, last_run: datetime = None):
+        if trigger_type not in self.triggers:
+            raise ValueError(f"No such trigger type '{trigger_type}'")
+
+        values = {
+            'task_id': task_id,
+            'title': title,
+            'descr': descr,
+            'starting_date': starting_date,
+            'last_run': last_run,
+            'command': command,
+            'trigger_type': trigger_type,
+            'trigger_args': trigger_args,
+            'output_policy': output_policy,
+            'timeout': timeout,
+            'kill_grace': kill_grace,
+            'priority': priority,
+            'jitter': jitter,
+            'resource_limits': resource_limits
+        }
+        values['trigger'] = self.triggers[trigger_type](trigger_args)
+        values['fingerprint'] = hash(tuple(values[column] for column in Task._executor_columns))
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_task(cls, task: Task) -> 'TaskSpec':
+        return cls(**{
+            column: getattr(task, column)
+            for column
+            in cls.descriptive_columns + Task._executor_columns
+        })
+
+    @staticmethod
+    def fingerprint_of(task: Task) -> int:
+        """Fingerprint the spec of ``task`` would have, without building it."""
+        return hash(task)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    @property
+    def run_date_iter(self) -> Iterator[datetime]:
+        return self.trigger.run_date_iter()
+
+    def run_dates_after(self, start: datetime) -> Iterator[datetime]:
+        return self.trigger.run_dates_after(start)
+
+    @property
+    def period(self) -> Union[timedelta, None]:
+        return self.trigger.period
+
+    @property
+    def launch_offset(self) -> timedelta:
+        return jitter_offset(self.task_id, self.jitter, self.period)
+
+    def to_dict(self) -> Dict:
+        _dict = {
+            column: getattr(self, column)
+            for column
+            in self.descriptive_columns + Task._executor_columns
+        }
+        if self.trigger_type == 'interval':
+            _dict['trigger_args'] = json.loads(self.trigger_args)
+        for column in ('output_policy', 'resource_limits'):
+            if getattr(self, column):
+                _dict[column] = json.loads(getattr(self, column))
+        return _dict
+
+    def __hash__(self):
+        return self.fingerprint
+
+    def __eq__(self, other):
+        if isinstance(other, (TaskSpec, Task)):
+            return hash(self) == hash(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TaskSpec({self.task_id}, '{self.command}', {self.trigger_type}, '{self.trigger_args}')"
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+
+from db.connection import Session
+from db.models import ProcessLog, TaskStats, TaskStatsBucket
+from util import SingletonMeta
+from util.sketch import DurationSketch
+
+
+log = logging.getLogger(__name__)
+
+class ExecutionRecord:
+    __slots__ = ('task_id', 'status', 'start_date', 'finish_date', 'return_code', 'dropped_lines', 'dropped_bytes',
+                 'cpu_time', 'max_rss', 'io_blocks')
+
+    def __init__(self, process_log: ProcessLog, dropped_lines: int = 0, dropped_bytes: int = 0):
+        self.task_id = process_log.task_id
+        self.status = process_log.status
+        self.start_date = process_log.start_date
+        self.finish_date = process_log.finish_date
+        self.return_code = process_log.return_code
+        self.dropped_lines = dropped_lines
+        self.dropped_bytes = dropped_bytes
+        self.cpu_time = process_log.cpu_time
+        self.max_rss = process_log.max_rss
+        self.io_blocks = None
+        if process_log.io_read_blocks is not None:
+            self.io_blocks = process_log.io_read_blocks + process_log.io_write_blocks
+
+    @property
+    def duration(self) -> Union[float, None]:
+        if self.start_date and self.finish_date:
+            return max((self.finish_date - self.start_date).total_seconds(), 0.0)
+
+    @property
+    def hour(self) -> datetime:
+        return self.start_date.replace(minute=0, second=0, microsecond=0)
+
+
+class TaskStatsRecorder(metaclass=SingletonMeta):
+    """Keeps per-task execution rollups up to date.
+
+    Finished and missed executions are recorded in memory and merged into
+    ``task_stats`` and the hourly ``task_stats_bucket`` series on every flush.
+    """
+    quantiles = (0.5, 0.95, 0.99)
+
+    def __init__(self):
+        self._pending: List[ExecutionRecord] = []
+        self._lock = asyncio.Lock()
+        self._flush_task: Union[asyncio.Task, None] = None
+
+    def record(self, process_log: ProcessLog, dropped_lines: int = 0, dropped_bytes: int = 0):
+        self.start()
+        self._pending.append(ExecutionRecord(process_log, dropped_lines, dropped_bytes))
+
+    def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_event_loop().create_task(self._flush_periodically())
+
+    async def _flush_periodically(self, seconds=1):
+        while True:
+            try:
+                await self.flush()
+            except Exception:
+                log.exception('Flushing task stats failed, retrying in %ss', seconds)
+            await asyncio.sleep(seconds)
+
+    async def flush(self):
+        async with self._lock:
+            await self._flush()
+
+    async def _flush(self):
+        records, self._pending = self._pending, []
+        if not records:
+            return
+
+        try:
+            await self._write(records)
+        except BaseException:
+            self._pending[:0] = records
+            raise
+
+    async def _write(self, records: List[ExecutionRecord]):
+        by_task: Dict[int, List[ExecutionRecord]] = defaultdict(list)
+        by_hour: Dict[Tuple[int, datetime], List[ExecutionRecord]] = defaultdict(list)
+        for record in records:
+            by_task[record.task_id].append(record)
+            by_hour[record.task_id, record.hour].append(record)
+
+        async with Session() as session:
+            for task_id, task_records in by_task.items():
+                stats = await session.get(TaskStats, task_id) or TaskStats(task_id)
+                self._apply(stats, task_records)
+                session.add(stats)
+
+            for (task_id, hour), hour_records in by_hour.items():
+                bucket = await session.get(TaskStatsBucket, (task_id, hour)) or TaskStatsBucket(task_id, hour)
+                self._apply_bucket(bucket, hour_records)
+                session.add(bucket)
+
+            await session.commit()
+
+    @staticmethod
+    def _count_states(state_counts: str, records: List[ExecutionRecord]) -> str:
+        counts = json.loads(state_counts)
+        for record in records:
+            counts[record.status] = counts.get(record.status, 0) + 1
+        return json.dumps(counts)
+
+    def _apply(self, stats: TaskStats, records: List[ExecutionRecord]):
+        stats.state_counts = self._count_states(stats.state_counts, records)
+
+        sketch = DurationSketch.from_json(stats.durations)
+        for record in records:
+            if record.duration is not None:
+                sketch.add(record.duration)
+        stats.durations = sketch.to_json()
+
+        stats.dropped_lines += sum(record.dropped_lines for record in records)
+        stats.dropped_bytes += sum(record.dropped_bytes for record in records)
+
+        stats.cpu_time += sum(record.cpu_time for record in records if record.cpu_time is not None)
+        stats.io_blocks += sum(record.io_blocks for record in records if record.io_blocks is not None)
+        max_rss = [record.max_rss for record in records if record.max_rss is not None]
+        if max_rss:
+            stats.max_rss = max(stats.max_rss or 0, *max_rss)
+
+        last = max(records, key=lambda r: r.start_date)
+        if not stats.last_run or last.start_date >= stats.last_run:
+            stats.last_run = last.start_date
+            stats.last_status = last.status
+            stats.last_return_code = last.return_code
+
+    def _apply_bucket(self, bucket: TaskStatsBucket, records: List[ExecutionRecord]):
+        bucket.state_counts = self._count_states(bucket.state_counts, records)
+        for record in records:
+            if record.duration is not None:
+                bucket.duration_count += 1
+                bucket.duration_sum += record.duration
+
+    @classmethod
+    def describe(cls, stats: TaskStats) -> Dict:
+        sketch = DurationSketch.from_json(stats.durations)
+        counts = json.loads(stats.state_counts)
+        completed = sum(counts.get(state, 0) for state in ('finished', 'failed', 'timed_out'))
+
+        description = stats.to_dict()
+        description['success_rate'] = counts.get('finished', 0) / completed if completed else None
+        description['duration'] = {
+            'count': sketch.count,
+            'mean': sketch.mean,
+            **{
+                f'p{round(q * 100)}': sketch.quantile(q)
+                for q
+                in cls.quantiles
+            }
+        }
+        return description
@@ -2,10 +2,25 @@ import json
 
 from datetime import datetime, timedelta
 from abc import abstractmethod, ABCMeta
-from typing import Iterator, Dict
-from croniter import croniter
+from typing import Iterator, Dict, Union
 
 from db.models import TaskModel
+from scheduler.cron import compile_cron
+
+
+def jitter_offset(task_id: int, jitter: Union[float, None], period: Union[timedelta, None]) -> timedelta:
+    """Deterministic delay within the task's jitter window, derived from its ID.
+
+    The window is clamped to the trigger period, so a jittered launch
+    always happens before the next run is due.
+    """
+    if not jitter:
+        return timedelta()
+    window = jitter
+    if period is not None:
+        window = min(window, period.total_seconds())
+    fraction = (task_id * 2654435761 % 2 ** 32) / 2 ** 32
+    return timedelta(seconds=window * fraction)
 
 
 class Task(TaskModel, metaclass=ABCMeta):
@@ -20,15 +35,35 @@ class Task(TaskModel, metaclass=ABCMeta):
     def run_date_iter(self) -> Iterator[datetime]:
         pass
 
+    def run_dates_after(self, start: datetime) -> Iterator[datetime]:
+        """Run dates following ``start``, which must itself be a run date of the task."""
+        return iter(())
+
+    @property
+    def period(self) -> Union[timedelta, None]:
+        """Time between consecutive runs, or None for tasks that do not repeat."""
+        return None
+
+    @property
+    def launch_offset(self) -> timedelta:
+        return jitter_offset(self.task_id, self.jitter, self.period)
+
     def to_dict(self):
-        return {
+        _dict = {
             k: v
             for k, v in self.__dict__.items()
             if k in self.__table__.columns
         }
+        for column in ('output_policy', 'resource_limits'):
+            if _dict.get(column):
+                _dict[column] = json.loads(_dict[column])
+        return _dict
+
+    _executor_columns = ('command', 'trigger_args', 'trigger_type', 'output_policy', 'timeout', 'kill_grace',
+                         'priority', 'jitter', 'resource_limits')
 
     def __hash__(self):
-        return hash((self.command, self.trigger_args, self.trigger_type))
+        return hash(tuple(getattr(self, column) for column in self._executor_columns))
 
     def __eq__(self, other):
         if isinstance(other, Task):
@@ -46,7 +81,16 @@ class CronTask(Task):
 
     @property
     def run_date_iter(self) -> Iterator[datetime]:
-        return croniter(self.trigger_args, ret_type=datetime)
+        return self.run_dates_after(datetime.now())
+
+    def run_dates_after(self, start: datetime) -> Iterator[datetime]:
+        return compile_cron(self.trigger_args).run_dates_after(start)
+
+    @property
+    def period(self) -> timedelta:
+        run_dates = self.run_date_iter
+        first = next(run_dates)
+        return next(run_dates) - first
 
 
 class IntervalTask(Task):
@@ -91,13 +135,19 @@ class IntervalTask(Task):
         args = json.loads(self.trigger_args)
         return timedelta(**args)
 
+    @property
+    def period(self) -> timedelta:
+        return self.interval
+
     @property
     def run_date_iter(self) -> Iterator[datetime]:
-        self.run_date = datetime.now()
+        return self.run_dates_after(datetime.now())
 
+    def run_dates_after(self, start: datetime) -> Iterator[datetime]:
+        run_date = start
         while True:
-            self.run_date += self.interval
-            yield self.run_date
+            run_date += self.interval
+            yield run_date
 
 
 class DateTask(Task):
@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Tuple, Union
+
+from dotenv import load_dotenv
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.connection import Session
+from db.models import WorkItem, ProcessLog, ExecutionState
+from scheduler.admission import AdmissionQueue
+from scheduler.spec import TaskSpec
+from scheduler.stats import TaskStatsRecorder
+from scheduler.task import Task
+
+
+log = logging.getLogger(__name__)
+
+
+class WorkQueue:
+    """Database table of runs handed from the scheduler to worker agents.
+
+    The scheduler enqueues due runs and agents claim them, highest priority
+    first: with ``SELECT ... FOR UPDATE SKIP LOCKED`` on PostgreSQL, and with
+    an UPDATE conditional on the row still being queued elsewhere, so every
+    run is claimed by one agent only. Agents heartbeat their claimed runs;
+    runs whose agent stopped heartbeating are requeued, up to
+    ``max_attempts`` times, and the process log of the lost attempt is marked
+    failed. Delivery is therefore at least once.
+
+    The scheduler side polls for finished runs, records their stats and
+    wakes the ``RemoteExecution`` waiting for each of them.
+    """
+    default_poll_interval = 1.0
+    default_heartbeat_timeout = 30.0
+    max_attempts = 3
+    claim_candidates = 10
+
+    def __init__(self, poll_interval: float = default_poll_interval,
+                 heartbeat_timeout: float = default_heartbeat_timeout):
+        self.poll_interval = poll_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self._watch_task: Union[asyncio.Task, None] = None
+
+    @classmethod
+    def from_env(cls) -> Union['WorkQueue', None]:
+        """Queue configured by ``WORK_QUEUE``, or None when runs execute in the scheduler process."""
+        load_dotenv()
+        if os.environ.get('WORK_QUEUE', '').lower() not in ('1', 'true', 'yes', 'on'):
+            return None
+        return cls(
+            float(os.environ.get('WORK_QUEUE_POLL_INTERVAL', cls.default_poll_interval)),
+            float(os.environ.get('WORK_QUEUE_HEARTBEAT_TIMEOUT', cls.default_heartbeat_timeout))
+        )
+
+    async def enqueue(self, task: TaskSpec, planned_date: datetime = None, parent_run_id: int = None) -> int:
+        if planned_date:
+            planned_date = planned_date.astimezone(timezone.utc).replace(tzinfo=None)
+        weight = AdmissionQueue.weights[task.priority or AdmissionQueue.default_priority]
+        async with Session() as session:
+            item = WorkItem(task.task_id, weight, planned_date, parent_run_id)
+            session.add(item)
+            await session.flush()
+            work_item_id = item.work_item_id
+            await session.commit()
+        return work_item_id
+
+    async def wait(self, work_item_id: int) -> Union[ProcessLog, None]:
+        """Wait until the run is done and return its process log, None if it never started."""
+        self.start()
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters[work_item_id] = waiter
+        try:
+            return await waiter
+        finally:
+            self._waiters.pop(work_item_id, None)
+
+    def start(self):
+        if self._watch_task is None:
+            self._watch_task = asyncio.get_event_loop().create_task(self._watch_periodically())
+
+    def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def _watch_periodically(self):
+        while True:
+            try:
+                await self.requeue_stale()
+                await self.collect()
+            except Exception:
+                log.exception('Polling the work queue failed, retrying in %ss', self.poll_interval)
+            await asyncio.sleep(self.poll_interval)
+
+    async def collect(self) -> int:
+        """Record every finished run, wake its waiter and remove it from the queue."""
+        async with Session(expire_on_commit=False) as session:
+            rs = await session.execute(
+                select(WorkItem, ProcessLog).
+                outerjoin(ProcessLog, WorkItem.process_log_id == ProcessLog.process_log_id).
+                filter(WorkItem.status == 'done')
+            )
+            done = rs.all()
+            if not done:
+                return 0
+
+            for item, process_log in done:
+                if process_log is not None:
+                    TaskStatsRecorder().record(process_log, item.dropped_lines or 0, item.dropped_bytes or 0)
+                waiter = self._waiters.get(item.work_item_id)
+                if waiter and not waiter.done():
+                    waiter.set_result(process_log)
+
+            await session.execute(
+                delete(WorkItem).
+                filter(WorkItem.work_item_id.in_([item.work_item_id for item, _ in done]))
+            )
+            await session.commit()
+        return len(done)
+
+    async def requeue_stale(self) -> int:
+        """Requeue runs of agents that stopped heartbeating, failing the runs they had started."""
+        deadline = datetime.utcnow() - timedelta(seconds=self.heartbeat_timeout)
+        requeued = 0
+        async with Session() as session:
+            rs = await session.execute(
+                select(WorkItem).
+                filter(WorkItem.status == 'claimed', WorkItem.heartbeat_at < deadline)
+            )
+            for item in rs.scalars().all():
+                exhausted = item.attempts >= self.max_attempts
+                values = {'status': 'done'} if exhausted else {
+                    'status': 'queued', 'agent_id': None, 'claimed_at': None, 'heartbeat_at': None,
+                    'process_log_id': None
+                }
+                result = await session.execute(
+                    update(WorkItem).
+                    filter(WorkItem.work_item_id == item.work_item_id,
+                           WorkItem.status == 'claimed',
+                           WorkItem.heartbeat_at < deadline).
+                    values(**values).
+                    execution_options(synchronize_session=False)
+                )
+                if result.rowcount != 1:
+                    continue
+
+                log.warning('Agent %s stopped heartbeating, %s run of task %s',
+                            item.agent_id, 'giving up on the' if exhausted else 'requeuing the', item.task_id)
+                if item.process_log_id is not None:
+                    await self._fail_lost_run(session, item.process_log_id, record_stats=not exhausted)
+                requeued += not exhausted
+            await session.commit()
+        return requeued
+
+    @staticmethod
+    async def _fail_lost_run(session: AsyncSession, process_log_id: int, record_stats: bool):
+        """Mark the process log of a lost run failed; runs given up on are recorded by ``collect`` instead."""
+        process_log = await session.get(ProcessLog, process_log_id)
+        if process_log is not None and process_log.state is ExecutionState.STARTED:
+            process_log.set_state(ExecutionState.FAILED)
+            process_log.finish_date = datetime.utcnow()
+            if record_stats:
+                TaskStatsRecorder().record(process_log)
+
+    async def claim(self, agent_id: str) -> Union[Tuple[WorkItem, TaskSpec], None]:
+        """Claim the next queued run for ``agent_id`` together with its task, None if the queue is empty."""
+        async with Session(expire_on_commit=False) as session:
+            if session.bind.dialect.name == 'postgresql':
+                item = await self._claim_locked(session, agent_id)
+            else:
+                item = await self._claim_conditional(session, agent_id)
+            if item is None:
+                return None
+
+            rs = await session.execute(
+                select(Task).
+                filter(Task.task_id == item.task_id)
+            )
+            task = rs.scalar()
+            if task is None:
+                item.status = 'done'
+            await session.commit()
+
+        if task is None:
+            return await self.claim(agent_id)
+        return item, TaskSpec.from_task(task)
+
+    async def _claim_locked(self, session: AsyncSession, agent_id: str) -> Union[WorkItem, None]:
+        rs = await session.execute(
+            select(WorkItem).
+            filter(WorkItem.status == 'queued').
+            order_by(WorkItem.weight.desc(), WorkItem.work_item_id).
+            limit(1).
+            with_for_update(skip_locked=True)
+        )
+        item = rs.scalar()
+        if item is not None:
+            self._mark_claimed(item, agent_id)
+            await session.flush()
+        return item
+
+    async def _claim_conditional(self, session: AsyncSession, agent_id: str) -> Union[WorkItem, None]:
+        rs = await session.execute(
+            select(WorkItem).
+            filter(WorkItem.status == 'queued').
+            order_by(WorkItem.weight.desc(), WorkItem.work_item_id).
+            limit(self.claim_candidates)
+        )
+        for item in rs.scalars().all():
+            now = datetime.utcnow()
+            result = await session.execute(
+                update(WorkItem).
+                filter(WorkItem.work_item_id == item.work_item_id, WorkItem.status == 'queued').
+                values(status='claimed', agent_id=agent_id, claimed_at=now, heartbeat_at=now,
+                       attempts=WorkItem.attempts + 1).
+                execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                await session.refresh(item)
+                return item
+        return None
+
+    @staticmethod
+    def _mark_claimed(item: WorkItem, agent_id: str):
+        item.status = 'claimed'
+        item.agent_id = agent_id
+        item.claimed_at = item.heartbeat_at = datetime.utcnow()
+        item.attempts += 1
+
+    @staticmethod
+    async def heartbeat(agent_id: str, work_item_ids: Iterable[int], process_log_ids: Dict[int, int] = None):
+        """Keep runs of ``agent_id`` alive and record the process logs they have started."""
+        async with Session() as session:
+            await session.execute(
+                update(WorkItem).
+                filter(WorkItem.work_item_id.in_(list(work_item_ids)),
+                       WorkItem.agent_id == agent_id,
+                       WorkItem.status == 'claimed').
+                values(heartbeat_at=datetime.utcnow())
+            )
+            for work_item_id, process_log_id in (process_log_ids or {}).items():
+                await session.execute(
+                    update(WorkItem).
+                    filter(WorkItem.work_item_id == work_item_id, WorkItem.agent_id == agent_id).
+                    values(process_log_id=process_log_id)
+                )
+            await session.commit()
+
+    @staticmethod
+    async def complete(agent_id: str, work_item_id: int, process_log_id: Union[int, None],
+                       dropped_lines: int = 0, dropped_bytes: int = 0) -> bool:
+        """Mark a run done, unless it was requeued after ``agent_id`` missed its heartbeats."""
+        async with Session() as session:
+            result = await session.execute(
+                update(WorkItem).
+                filter(WorkItem.work_item_id == work_item_id,
+                       WorkItem.agent_id == agent_id,
+                       WorkItem.status == 'claimed').
+                values(status='done', process_log_id=process_log_id, dropped_lines=dropped_lines,
+                       dropped_bytes=dropped_bytes)
+            )
+            await session.commit()
+        return result.rowcount == 1
+
+
+class RemoteExecution:
+    """Stands in for ``ExecutionMonitor`` when runs go to worker agents.
+
+    The run is enqueued and its status follows the process log the agent
+    wrote once the queue reports it done.
+    """
+
+    def __init__(self, queue: WorkQueue, task: TaskSpec, status_callback: Callable, planned_date: datetime = None,
+                 parent_run_id: int = None):
+        self._queue = queue
+        self._task = task
+        self._status_callback = status_callback
+        self._planned_date = planned_date
+        self._parent_run_id = parent_run_id
+        self._enqueued = False
+        self._log: Union[ProcessLog, None] = None
+
+    @property
+    def queued(self) -> bool:
+        return not self._enqueued
+
+    @property
+    def state(self) -> Union[ExecutionState, None]:
+        if self._log is None:
+            return ExecutionState.FAILED if self._enqueued else None
+        return self._log.state
+
+    @property
+    def process_log_id(self) -> Union[int, None]:
+        return self._log.process_log_id if self._log is not None else None
+
+    async def start(self) -> Union[int, None]:
+        work_item_id = await self._queue.enqueue(self._task, self._planned_date, self._parent_run_id)
+        self._enqueued = True
+        self._status_callback(ExecutionState.AWAITING.name.lower())
+
+        self._log = await self._queue.wait(work_item_id)
+        self._status_callback(self.state.name.lower())
+        if self._log is not None:
+            return self._log.return_code or 0
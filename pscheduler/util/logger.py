@@ -1,29 +1,104 @@
 import asyncio
 import collections
-from typing import Deque
+import logging
+from typing import Deque, List, Union
 
 from db.connection import Session
 from db.models import ConsoleLog
+from db.search import refresh_search_index
 from util.singleton import SingletonMeta
+from util.spool import OutputSpool
+
+
+log = logging.getLogger(__name__)
 
 
 class OutputLogger(metaclass=SingletonMeta):
+    """Buffers log records and writes them to the database in batches.
+
+    With ``OUTPUT_SPOOL_DIR`` set, each batch is first appended to an
+    ``OutputSpool`` and then replayed into the database, so records survive
+    a database outage and are inserted once it is reachable again.
+    Otherwise a batch that fails to commit goes back to the buffer.
+    """
+    _unset = object()
+
     def __init__(self):
-        self._loop = asyncio.get_event_loop()
         self._buffer: Deque[ConsoleLog] = collections.deque()
+        self._flush_task: Union[asyncio.Task, None] = None
+        self._spool = self._unset
+        self._replaying = False
+
+    @property
+    def spool(self) -> Union[OutputSpool, None]:
+        if self._spool is self._unset:
+            self._spool = OutputSpool.from_env()
+        return self._spool
+
+    @property
+    def pending(self) -> int:
+        """Records buffered for the next flush."""
+        return len(self._buffer)
 
-        self._loop.create_task(self._flush_periodically())
+    def configure_spool(self, spool: Union[OutputSpool, None]):
+        self._spool = spool
 
     def log(self, record: ConsoleLog):
+        self.start()
         self._buffer.append(record)
 
+    def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_event_loop().create_task(self._flush_periodically())
+
     async def _flush_periodically(self, seconds=1):
         while True:
-            await self.flush()
+            try:
+                await self.flush()
+            except Exception:
+                log.exception('Flushing output logs failed, retrying in %ss', seconds)
             await asyncio.sleep(seconds)
 
     async def flush(self):
+        records = [self._buffer.popleft() for _ in range(len(self._buffer))]
+        try:
+            if self.spool is None:
+                await self._write(records)
+            else:
+                await asyncio.get_event_loop().run_in_executor(None, self.spool.append, records)
+        except BaseException:
+            self._buffer.extendleft(reversed(records))
+            raise
+
+        if self.spool is not None:
+            try:
+                await self.replay()
+            except Exception:
+                log.exception('Output logs stay spooled in %s until the database is reachable',
+                              self.spool.directory)
+
+    @staticmethod
+    async def _write(records: List[ConsoleLog]):
         async with Session() as session:
-            logs = [self._buffer.popleft() for _ in range(len(self._buffer))]
-            session.add_all(logs)
-            await session.commit()
\ No newline at end of file
+            session.add_all(records)
+            await session.flush()
+            await refresh_search_index(session)
+            await session.commit()
+
+    async def replay(self):
+        """Insert the spooled records into the database, oldest segment first."""
+        if self._replaying:
+            return
+
+        loop = asyncio.get_event_loop()
+        self._replaying = True
+        try:
+            for path in await loop.run_in_executor(None, self.spool.seal):
+                rows = await loop.run_in_executor(None, self.spool.read, path)
+                async with Session() as session:
+                    await self.spool.insert(session, rows)
+                    await refresh_search_index(session)
+                    await session.commit()
+                await loop.run_in_executor(None, self.spool.remove, path)
+        finally:
+            self._replaying = False
@@ -0,0 +1,36 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+
+loop_names = ('asyncio', 'uvloop')
+
+
+def loop_name() -> str:
+    """Event loop implementation selected by ``EVENT_LOOP``, ``asyncio`` by default."""
+    load_dotenv()
+    name = os.environ.get('EVENT_LOOP', 'asyncio')
+    if name not in loop_names:
+        raise ValueError(f'unknown event loop {name!r}, expected one of {", ".join(loop_names)}')
+    return name
+
+
+def install_loop_policy(name: str = None) -> str:
+    name = name or loop_name()
+    if name == 'uvloop':
+        try:
+            import uvloop
+        except ImportError:
+            raise RuntimeError('EVENT_LOOP=uvloop requires the uvloop package')
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    else:
+        asyncio.set_event_loop_policy(None)
+    return name
+
+
+def new_event_loop(name: str = None) -> asyncio.AbstractEventLoop:
+    install_loop_policy(name)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return loop
@@ -0,0 +1,113 @@
+import asyncio
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Deque, Dict, Union
+
+from dotenv import load_dotenv
+
+from util.sketch import DurationSketch
+
+
+log = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop runs its callbacks.
+
+    A sampler coroutine sleeps for ``interval`` and records how much later
+    than requested it woke up. A watchdog thread checks the sampler's
+    heartbeat; when the loop has not come back for ``threshold`` seconds it
+    captures the stack of the loop thread, which points at the blocking call.
+    """
+    default_interval = 0.1
+    default_threshold = 0.25
+    max_stalls = 20
+
+    def __init__(self, interval: float = None, threshold: float = None):
+        load_dotenv()
+        self.interval = interval or float(os.environ.get('LOOP_LAG_INTERVAL', self.default_interval))
+        self.threshold = threshold or float(os.environ.get('LOOP_STALL_THRESHOLD', self.default_threshold))
+
+        self.lag = DurationSketch()
+        self.max_lag = 0.0
+        self.stalls: Deque[Dict] = collections.deque(maxlen=self.max_stalls)
+
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Union[int, None] = None
+        self._stalled = False
+        self._sampler: Union[asyncio.Task, None] = None
+        self._watchdog: Union[threading.Thread, None] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._sampler is None:
+            self._loop_thread_id = threading.get_ident()
+            self._heartbeat = time.monotonic()
+            self._stopped.clear()
+            self._sampler = asyncio.get_event_loop().create_task(self._sample())
+            self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+            self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.cancel()
+            self._sampler = None
+
+    async def _sample(self):
+        while True:
+            slept_at = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._heartbeat = now = time.monotonic()
+            self._record(max(0.0, now - slept_at - self.interval))
+
+    def _record(self, lag: float):
+        self.lag.add(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if self._stalled:
+            self._stalled = False
+            self.stalls[-1]['duration'] = round(lag, 4)
+            log.warning('Event loop stalled for %.3fs:\n%s', lag, self.stalls[-1]['stack'])
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            if self._stalled or time.monotonic() - self._heartbeat < self.interval + self.threshold:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            self.stalls.append({
+                'detected_at': datetime.utcnow(),
+                'duration': None,
+                'stack': ''.join(traceback.format_stack(frame)) if frame else ''
+            })
+            self._stalled = True
+
+    def to_dict(self):
+        return {
+            'interval': self.interval,
+            'threshold': self.threshold,
+            'samples': self.lag.count,
+            'mean': self.lag.mean,
+            'p50': self.lag.quantile(0.5),
+            'p95': self.lag.quantile(0.95),
+            'p99': self.lag.quantile(0.99),
+            'max': self.max_lag,
+            'stalls': list(self.stalls)
+        }
+
+
+_loop_monitor: Union[LoopLagMonitor, None] = None
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """Monitor configured from the environment, created on first use."""
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopLagMonitor()
+    return _loop_monitor
@@ -0,0 +1,100 @@
+import os
+import queue
+import sys
+import threading
+import time
+from typing import TextIO, Union
+
+from dotenv import load_dotenv
+
+
+class ConsoleMirror:
+    """Optional copy of captured output to the console, written off the event loop.
+
+    ``write`` never blocks: lines go to a bounded queue drained by a writer
+    thread, so a slow terminal or journald only ever costs dropped mirror
+    lines, never loop time. Lines over ``rate`` per second or arriving while
+    the queue is full are dropped and counted; the output itself is still
+    stored by ``OutputLogger``.
+    """
+    default_rate = 1000
+    queue_size = 10000
+
+    def __init__(self, enabled: bool = None, rate: float = None, stream: TextIO = None):
+        load_dotenv()
+        if enabled is None:
+            enabled = os.environ.get('MIRROR_OUTPUT', '').lower() in ('1', 'true', 'yes')
+        if rate is None:
+            rate = float(os.environ.get('MIRROR_OUTPUT_RATE', self.default_rate))
+
+        self.enabled = enabled
+        self.rate = rate
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._stream = stream
+        self._queue: 'queue.Queue[str]' = queue.Queue(self.queue_size)
+        self._tokens = rate
+        self._refilled_at = time.monotonic()
+        self._writer: Union[threading.Thread, None] = None
+
+    def write(self, message: str):
+        if not self.enabled:
+            return
+        if not self._take_token():
+            self._drop()
+            return
+
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self._drop()
+            return
+        self.start()
+
+    def start(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._drain, name='console-mirror', daemon=True)
+            self._writer.start()
+
+    def _drop(self):
+        with self._dropped_lock:
+            self.dropped += 1
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _drain(self):
+        while True:
+            message = self._queue.get()
+            stream = self._stream or sys.stdout
+            try:
+                stream.write(message)
+                if self._queue.empty():
+                    stream.flush()
+            except (OSError, ValueError):
+                self._drop()
+
+    def to_dict(self):
+        return {
+            'enabled': self.enabled,
+            'rate': self.rate,
+            'queued': self._queue.qsize(),
+            'dropped': self.dropped
+        }
+
+
+_console_mirror: Union[ConsoleMirror, None] = None
+
+
+def get_console_mirror() -> ConsoleMirror:
+    """Mirror configured from the environment, created on first use."""
+    global _console_mirror
+    if _console_mirror is None:
+        _console_mirror = ConsoleMirror()
+    return _console_mirror
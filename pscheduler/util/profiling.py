@@ -0,0 +1,249 @@
+import collections
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Counter, Dict, List, Union
+
+
+class SamplingProfiler:
+    """Samples the stack of every thread but its own at a fixed interval, for a limited window.
+
+    Sampling from a thread needs no tracing hooks, so the overhead is
+    independent of how much Python code runs and the profiler can be
+    switched on in a production process. Stacks are aggregated in the
+    collapsed ``outer;inner`` format read by flame graph tools.
+    """
+    default_interval = 0.005
+    max_seconds = 600
+
+    def __init__(self):
+        self.started_at: Union[datetime, None] = None
+        self.interval = self.default_interval
+        self.seconds = 0.0
+        self.samples = 0
+        self.stacks: Counter[str] = collections.Counter()
+        self._thread: Union[threading.Thread, None] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = default_interval):
+        if self.running:
+            raise ValueError('The CPU profiler is already running')
+        if not 0 < seconds <= self.max_seconds:
+            raise ValueError(f'Profiling window must be between 0 and {self.max_seconds} seconds')
+
+        self.started_at = datetime.utcnow()
+        self.interval = interval
+        self.seconds = seconds
+        self.samples = 0
+        self.stacks = collections.Counter()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sample, name='cpu-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _sample(self):
+        deadline = time.monotonic() + self.seconds
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval) and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.stacks[self._collapse(frame)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        functions = []
+        while frame is not None:
+            code = frame.f_code
+            functions.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(functions))
+
+    def to_dict(self, limit: int = 50) -> Dict:
+        leaves: Counter[str] = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return {
+            'running': self.running,
+            'started_at': self.started_at,
+            'seconds': self.seconds,
+            'interval': self.interval,
+            'samples': self.samples,
+            'top_functions': [
+                {'function': function, 'samples': count, 'share': round(count / total, 4)}
+                for function, count
+                in leaves.most_common(limit)
+            ],
+            'collapsed_stacks': [
+                f'{stack} {count}'
+                for stack, count
+                in self.stacks.most_common(limit)
+            ]
+        }
+
+
+class Profiler:
+    """Memory and CPU introspection of the scheduler process, driven by the debug endpoints.
+
+    ``tracemalloc`` tracing is started and stopped on demand; ``snapshot``
+    keeps a baseline that ``diff`` compares the current allocations with,
+    which separates steady growth from allocations that are freed again.
+    """
+    actions = {'tracemalloc_start', 'tracemalloc_stop', 'top_allocations', 'snapshot', 'diff', 'objects',
+                'cpu_start', 'cpu_stop', 'cpu_profile'}
+    group_by = ('lineno', 'filename', 'traceback')
+
+    def __init__(self):
+        self.cpu = SamplingProfiler()
+        self._baseline: Union[tracemalloc.Snapshot, None] = None
+        self._baseline_at: Union[datetime, None] = None
+
+    async def run(self, action: str, args: Dict) -> Dict:
+        if action not in self.actions:
+            raise ValueError(f'unknown profiler action {action!r}')
+        return getattr(self, action)(**args)
+
+    @staticmethod
+    def _tracing() -> Dict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'tracing': tracemalloc.is_tracing(),
+            'frames': tracemalloc.get_traceback_limit(),
+            'traced_bytes': current,
+            'peak_traced_bytes': peak,
+            'overhead_bytes': tracemalloc.get_tracemalloc_memory()
+        }
+
+    def tracemalloc_start(self, frames: int = 1) -> Dict:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self._tracing()
+
+    def tracemalloc_stop(self) -> Dict:
+        tracemalloc.stop()
+        self._baseline = self._baseline_at = None
+        return self._tracing()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        if not tracemalloc.is_tracing():
+            raise ValueError('tracemalloc is not tracing, start it first')
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')
+        ))
+
+    @staticmethod
+    def _traceback(traceback: tracemalloc.Traceback) -> List[str]:
+        return [f'{frame.filename}:{frame.lineno}' for frame in traceback]
+
+    def _check_group_by(self, group_by: str):
+        if group_by not in self.group_by:
+            raise ValueError(f"group_by must be one of {', '.join(self.group_by)}")
+
+    def top_allocations(self, limit: int = 20, group_by: str = 'lineno') -> Dict:
+        """Allocation sites holding the most memory right now."""
+        self._check_group_by(group_by)
+        statistics = self._snapshot().statistics(group_by)
+        return {
+            **self._tracing(),
+            'allocations': [
+                {'traceback': self._traceback(stat.traceback), 'size': stat.size, 'count': stat.count}
+                for stat
+                in statistics[:limit]
+            ]
+        }
+
+    def snapshot(self) -> Dict:
+        self._baseline = self._snapshot()
+        self._baseline_at = datetime.utcnow()
+        return {**self._tracing(), 'baseline_at': self._baseline_at}
+
+    def diff(self, limit: int = 20, group_by: str = 'lineno') -> Dict:
+        """Allocation sites that grew or shrank the most since the ``snapshot`` baseline."""
+        self._check_group_by(group_by)
+        if self._baseline is None:
+            raise ValueError('No baseline snapshot, take one first')
+
+        statistics = self._snapshot().compare_to(self._baseline, group_by)
+        return {
+            **self._tracing(),
+            'baseline_at': self._baseline_at,
+            'allocations': [
+                {
+                    'traceback': self._traceback(stat.traceback),
+                    'size': stat.size,
+                    'size_diff': stat.size_diff,
+                    'count': stat.count,
+                    'count_diff': stat.count_diff
+                }
+                for stat
+                in statistics[:limit]
+            ]
+        }
+
+    @staticmethod
+    def objects() -> Dict:
+        """Live instances of the scheduler's own classes and the sizes of its long-lived containers.
+
+        Walks every object the garbage collector tracks, so it takes time on
+        a large heap and blocks the event loop meanwhile.
+        """
+        from sqlalchemy.orm import Session
+        from db.models import ConsoleLog
+        from scheduler.executor import ExecutionManager, TaskExecutor, ExecutionMonitor, DagRun
+        from scheduler.work_queue import RemoteExecution
+        from util.logger import OutputLogger
+
+        classes = (TaskExecutor, ExecutionMonitor, DagRun, RemoteExecution, ConsoleLog, Session)
+        instances = dict.fromkeys((cls.__name__ for cls in classes), 0)
+        identity_map_size = 0
+        for obj in gc.get_objects():
+            for cls in classes:
+                if isinstance(obj, cls):
+                    instances[cls.__name__] += 1
+            if isinstance(obj, Session):
+                identity_map_size += len(obj.identity_map)
+
+        manager = ExecutionManager()
+        return {
+            'instances': instances,
+            'task_executors': len(manager.task_executors),
+            'running_executions': sum(executor.running_executions for executor in manager.task_executors.values()),
+            'output_logs_pending_flush': OutputLogger().pending,
+            'session_identity_map_size': identity_map_size,
+            'gc_counts': gc.get_count()
+        }
+
+    def cpu_start(self, seconds: float, interval: float = SamplingProfiler.default_interval) -> Dict:
+        self.cpu.start(seconds, interval)
+        return self.cpu.to_dict()
+
+    def cpu_stop(self, limit: int = 50) -> Dict:
+        self.cpu.stop()
+        return self.cpu.to_dict(limit)
+
+    def cpu_profile(self, limit: int = 50) -> Dict:
+        return self.cpu.to_dict(limit)
+
+
+_profiler: Union[Profiler, None] = None
+
+
+def get_profiler() -> Profiler:
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
@@ -0,0 +1,83 @@
+import json
+import math
+from typing import Dict
+
+
+class DurationSketch:
+    """Log-bucketed quantile sketch with bounded relative error.
+
+    Values are grouped into buckets whose bounds grow geometrically, so the
+    sketch stays a few hundred integers wide regardless of how many durations
+    it has seen, and any quantile is within ``relative_accuracy`` of the truth.
+    """
+    min_value = 1e-3
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        if value <= self.min_value:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def quantile(self, q: float):
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if rank < seen:
+                return 2 * self._gamma ** index / (self._gamma + 1)
+        return 2 * self._gamma ** max(self._buckets) / (self._gamma + 1)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def merge(self, other: 'DurationSketch'):
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'accuracy': self.relative_accuracy,
+            'zero': self.zero_count,
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': self._buckets
+        })
+
+    @classmethod
+    def from_json(cls, data: str) -> 'DurationSketch':
+        if not data:
+            return cls()
+
+        args = json.loads(data)
+        sketch = cls(args['accuracy'])
+        sketch.zero_count = args['zero']
+        sketch.count = args['count']
+        sketch.sum = args['sum']
+        sketch._buckets = {
+            int(index): count
+            for index, count
+            in args['buckets'].items()
+        }
+        return sketch
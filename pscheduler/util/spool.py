@@ -0,0 +1,149 @@
+import datetime
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Tuple, Union
+
+from dotenv import load_dotenv
+from sqlalchemy import DateTime, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Base
+
+
+log = logging.getLogger(__name__)
+
+
+def to_row(record: Base) -> Tuple[str, Dict]:
+    """Table name and JSON-safe column values of a mapped record, without an unassigned key."""
+    row = {}
+    for column in record.__table__.columns:
+        value = getattr(record, column.key)
+        if value is None and column.primary_key:
+            continue
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+        row[column.name] = value
+    return record.__table__.name, row
+
+
+def from_row(table_name: str, row: Dict) -> Dict:
+    table = Base.metadata.tables[table_name]
+    return {
+        name: datetime.datetime.fromisoformat(value) if value and isinstance(table.c[name].type, DateTime) else value
+        for name, value
+        in row.items()
+    }
+
+
+class OutputSpool:
+    """Append-only on-disk journal of log records waiting to reach the database.
+
+    Records are appended as JSON lines to numbered segment files, with one
+    fsync per appended batch. ``replay`` seals the open segment and inserts
+    the sealed ones into the database in bulk, deleting each segment once its
+    rows are committed, oldest first. A crash between the commit and the
+    delete replays that segment again, so delivery is at least once.
+
+    File operations block, so callers on the event loop run ``append``,
+    ``seal`` and ``read`` in an executor.
+    """
+    default_segment_bytes = 16 * 2 ** 20
+    insert_chunk_size = 1000
+    suffix = '.jsonl'
+
+    def __init__(self, directory: str, segment_bytes: int = None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes or self.default_segment_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = None
+        existing = self.segments()
+        self._next_segment = self._segment_number(existing[-1]) + 1 if existing else 1
+
+    @classmethod
+    def from_env(cls) -> Union['OutputSpool', None]:
+        """Spool in ``OUTPUT_SPOOL_DIR``, or None when spooling is not configured."""
+        load_dotenv()
+        directory = os.environ.get('OUTPUT_SPOOL_DIR')
+        if not directory:
+            return None
+        segment_bytes = os.environ.get('OUTPUT_SPOOL_SEGMENT_BYTES')
+        return cls(directory, int(segment_bytes) if segment_bytes else None)
+
+    def segments(self) -> List[str]:
+        return sorted(
+            os.path.join(self.directory, name)
+            for name
+            in os.listdir(self.directory)
+            if name.endswith(self.suffix)
+        )
+
+    def _segment_number(self, path: str) -> int:
+        return int(os.path.basename(path)[:-len(self.suffix)])
+
+    def append(self, records: List[Base]):
+        """Write ``records`` and fsync them before returning."""
+        if not records:
+            return
+        data = ''.join(json.dumps(to_row(record)) + '\n' for record in records).encode()
+
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if self._file.tell() >= self.segment_bytes:
+                self._close_segment()
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f'{self._next_segment:012d}{self.suffix}')
+        self._next_segment += 1
+        self._file = open(path, 'ab')
+        directory = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def _close_segment(self):
+        self._file.close()
+        self._file = None
+
+    def seal(self) -> List[str]:
+        """Close the open segment and return every segment ready to replay, oldest first."""
+        with self._lock:
+            if self._file is not None:
+                self._close_segment()
+            return self.segments()
+
+    @staticmethod
+    def read(path: str) -> Dict[str, List[Dict]]:
+        """Rows of a segment grouped by table, skipping a line torn by a crash."""
+        rows: Dict[str, List[Dict]] = {}
+        with open(path, 'rb') as segment:
+            for line in segment:
+                try:
+                    table_name, row = json.loads(line)
+                except ValueError:
+                    log.warning('Skipping a torn record in %s', path)
+                    continue
+                rows.setdefault(table_name, []).append(from_row(table_name, row))
+        return rows
+
+    async def insert(self, session: AsyncSession, rows: Dict[str, List[Dict]]):
+        for table in Base.metadata.sorted_tables:
+            table_rows = rows.get(table.name, [])
+            for start in range(0, len(table_rows), self.insert_chunk_size):
+                await session.execute(insert(table), table_rows[start:start + self.insert_chunk_size])
+
+    def remove(self, path: str):
+        os.unlink(path)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._close_segment()
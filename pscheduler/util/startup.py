@@ -0,0 +1,36 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class StartupReport:
+    """Wall-clock time spent in each startup phase, measured from process start."""
+
+    def __init__(self, started_at: float = None):
+        self._started_at = time.perf_counter() if started_at is None else started_at
+        self.phases: Dict[str, float] = {}
+
+    def record(self, phase: str, seconds: float):
+        self.phases[phase] = seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started_at)
+
+    def mark_ready(self):
+        self.record('ready', time.perf_counter() - self._started_at)
+
+    def to_dict(self):
+        return {
+            phase: round(seconds, 4)
+            for phase, seconds
+            in self.phases.items()
+        }
+
+    def __str__(self):
+        return f'Startup report: {json.dumps(self.to_dict())}'
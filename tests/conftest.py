@@ -0,0 +1,11 @@
+import pytest
+
+from util.loop import new_event_loop
+
+
+@pytest.fixture
+def event_loop():
+    """Run every test on the loop selected by ``EVENT_LOOP``."""
+    loop = new_event_loop()
+    yield loop
+    loop.close()
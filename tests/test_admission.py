@@ -0,0 +1,220 @@
+import asyncio
+import datetime
+import json
+import time
+from typing import List
+
+import pytest
+from sqlalchemy import select
+
+from db.models import ProcessLog
+from scheduler.admission import AdmissionQueue, LaunchRateLimiter
+from scheduler.executor import ExecutionManager, ExecutionMonitor, RunDateIterator, TaskExecutor
+from scheduler.task import IntervalTask, CronTask
+from tests.testing import *
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestAdmissionQueue:
+    async def test_immediate(self):
+        queue = AdmissionQueue(slots=2)
+        assert await queue.acquire() == 0.0
+        assert await queue.acquire() == 0.0
+        assert queue.running == 2
+
+    async def test_slot_budget(self):
+        queue = AdmissionQueue(slots=1)
+        await queue.acquire()
+
+        waiter = asyncio.ensure_future(queue.acquire())
+        await asyncio.sleep(0)
+        queued_at = time.monotonic()
+        while time.monotonic() - queued_at < 0.05:
+            await asyncio.sleep(0.01)
+        assert not waiter.done() and queue.waiting == 1
+
+        queue.release()
+        assert await waiter >= 0.05
+        assert queue.running == 1
+
+    async def test_weighted_fairness(self):
+        queue = AdmissionQueue(slots=1)
+        await queue.acquire()
+
+        order: List[str] = []
+
+        async def run(priority: str):
+            await queue.acquire(priority)
+            order.append(priority)
+
+        waiters = [
+            asyncio.ensure_future(run(priority))
+            for priority
+            in ['low'] * 4 + ['critical'] * 8
+        ]
+        await asyncio.sleep(0)
+
+        for _ in waiters:
+            queue.release()
+            await asyncio.sleep(0)
+
+        assert order[:4] == ['critical'] * 4
+        assert order.count('low') == 4 and 'low' in order[:9]
+
+    async def test_cancelled_waiter(self):
+        queue = AdmissionQueue(slots=1)
+        await queue.acquire()
+
+        waiter = asyncio.ensure_future(queue.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+
+        queue.release()
+        assert queue.running == 0 and queue.waiting == 0
+
+
+class TestAdmission:
+    async def test_queue_wait(self, session):
+        queue = AdmissionQueue(slots=1)
+        statuses: List[str] = []
+
+        def monitor(seconds: float) -> ExecutionMonitor:
+            task = IntervalTask('sleep', f'sleep {seconds}', seconds=1)
+            task.task_id = 1
+            return ExecutionMonitor(task, statuses.append, admission=queue)
+
+        await asyncio.gather(monitor(0.2).start(), monitor(0).start())
+
+        process_logs = (await session.scalars(
+            select(ProcessLog).
+            order_by(ProcessLog.process_log_id)
+        )).all()
+        assert process_logs[0].queue_wait == 0.0
+        assert process_logs[1].queue_wait >= 0.2
+        assert statuses[:2] == ['awaiting', 'started'] and 'awaiting' in statuses[2:]
+
+    async def test_stop_cancels_queued(self, session, monkeypatch):
+        execution_manager = ExecutionManager()
+        queue = AdmissionQueue(slots=1)
+        await queue.acquire()
+        monkeypatch.setattr(execution_manager, 'admission', queue)
+
+        task = IntervalTask('echo', 'echo', seconds=1)
+        task.task_id = 1
+        executor = TaskExecutor(task, execution_manager)
+        executor.run()
+
+        deadline = time.monotonic() + 3
+        while not queue.waiting and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        assert queue.waiting == 1
+
+        executor.stop()
+        await asyncio.sleep(0)
+        queue.release()
+        await asyncio.sleep(0.1)
+
+        assert queue.waiting == 0 and queue.running == 0
+        assert (await session.scalars(select(ProcessLog))).all() == []
+
+
+class TestLaunchSmoothing:
+    @staticmethod
+    def cron_task(task_id: int, jitter: float = None) -> CronTask:
+        task = CronTask('hourly', 'echo hourly', '0 * * * *')
+        task.task_id = task_id
+        task.jitter = jitter
+        return task
+
+    def test_no_jitter(self):
+        assert self.cron_task(1).launch_offset == datetime.timedelta()
+
+    def test_deterministic_offset(self):
+        assert self.cron_task(7, jitter=600).launch_offset == self.cron_task(7, jitter=600).launch_offset
+
+    def test_offsets_spread(self):
+        offsets = [self.cron_task(task_id, jitter=600).launch_offset for task_id in range(1, 101)]
+        assert all(datetime.timedelta() <= offset < datetime.timedelta(seconds=600) for offset in offsets)
+        assert len(set(offset.seconds // 60 for offset in offsets)) == 10
+
+    def test_jitter_clamped_to_period(self):
+        task = IntervalTask('often', 'echo often', seconds=1)
+        task.task_id = 8
+        task.jitter = 10
+        assert datetime.timedelta() < task.launch_offset < datetime.timedelta(seconds=1)
+        assert self.cron_task(8, jitter=7200).launch_offset < datetime.timedelta(hours=1)
+
+    def test_jittered_run_not_missed(self, monkeypatch):
+        now = datetime.datetime.now()
+        run_dates = [now - datetime.timedelta(seconds=10), now + datetime.timedelta(minutes=1)]
+        monkeypatch.setattr(IntervalTask, 'run_date_iter', property(lambda task: iter(run_dates)))
+        missed: List[datetime.datetime] = []
+        monkeypatch.setattr(RunDateIterator, '_log_missed_run', lambda iterator, run_date: missed.append(run_date))
+
+        task = IntervalTask('minutely', 'echo minutely', minutes=1)
+        task.task_id = 3
+        task.jitter = 60
+        assert next(iter(RunDateIterator(task))) == run_dates[0]
+        assert missed == []
+
+    def test_forecast_continues_schedule(self):
+        task = IntervalTask('ten minutes', 'echo ten minutes', minutes=10)
+        task.task_id = 1
+        executor = TaskExecutor(task)
+        next_run_date = datetime.datetime.now() + datetime.timedelta(minutes=3)
+        executor._next_run_date = next_run_date
+
+        forecast = executor.forecast(next_run_date + datetime.timedelta(minutes=25))
+        assert [run_date for run_date, _ in forecast] == [
+            next_run_date + datetime.timedelta(minutes=minutes)
+            for minutes
+            in (0, 10, 20)
+        ]
+
+    def test_forecast_capped(self):
+        task = IntervalTask('every second', 'echo every second', seconds=1)
+        task.task_id = 1
+        forecast = TaskExecutor(task).forecast(datetime.datetime.now() + datetime.timedelta(days=1))
+        assert len(forecast) == TaskExecutor.max_forecast_runs
+
+    async def test_rate_limit(self):
+        limiter = LaunchRateLimiter(rate=20, burst=2)
+        started = time.monotonic()
+        for _ in range(6):
+            await limiter.acquire()
+        assert 0.15 <= time.monotonic() - started < 0.5
+
+    async def test_unlimited(self):
+        limiter = LaunchRateLimiter()
+        started = time.monotonic()
+        for _ in range(1000):
+            await limiter.acquire()
+        assert time.monotonic() - started < 0.1
+
+    async def test_planned_date(self, session):
+        planned = datetime.datetime.now()
+        task = IntervalTask('echo', 'echo', seconds=1)
+        task.task_id = 1
+        await ExecutionMonitor(task, lambda _: None, planned_date=planned).start()
+
+        process_log = (await session.scalars(select(ProcessLog))).one()
+        assert process_log.planned_date == planned.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        assert process_log.start_date >= process_log.planned_date
+
+    async def test_forecast(self, session):
+        execution_manager = ExecutionManager()
+        for task_id in range(1, 31):
+            execution_manager.task_executors[task_id] = TaskExecutor(self.cron_task(task_id, jitter=1800))
+            execution_manager.task_executors[task_id]._active = True
+        try:
+            forecast = json.loads(client.get('/executor/forecast', params={'minutes': 120}).content)['forecast']
+        finally:
+            execution_manager.task_executors.clear()
+
+        assert len(forecast) == 120
+        assert sum(bucket['scheduled'] for bucket in forecast) == 60
+        assert max(bucket['scheduled'] for bucket in forecast) == 30
+        assert max(bucket['planned'] for bucket in forecast) < 30
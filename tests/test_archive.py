@@ -0,0 +1,119 @@
+import datetime
+import json
+import os
+
+import pytest
+from sqlalchemy import select
+
+from db import archive as archive_module
+from db.archive import HistoryArchive
+from db.models import ProcessLog, ConsoleLog, StderrLog, OutputLog, ExecutionState
+from tests.testing import *
+
+
+pyarrow = pytest.importorskip('pyarrow')
+pytestmark = pytest.mark.asyncio
+
+old = datetime.datetime(2020, 1, 1, 12)
+recent = datetime.datetime.utcnow()
+
+
+async def add_execution(session, task_id: int, start_date: datetime.datetime, state: ExecutionState,
+                        lines: int = 2, parent_run_id: int = None) -> int:
+    process_log = ProcessLog(task_id, start_date=start_date)
+    process_log.set_state(state)
+    process_log.parent_run_id = parent_run_id
+    if state is not ExecutionState.STARTED:
+        process_log.finish_date = start_date + datetime.timedelta(seconds=1)
+    session.add(process_log)
+    await session.flush()
+    process_log_id = process_log.process_log_id
+    for i in range(lines):
+        session.add(ConsoleLog(f'{task_id} line {i}\n', start_date, process_log_id))
+    session.add(StderrLog(f'{task_id} done\n', start_date, process_log_id))
+    await session.commit()
+    return process_log_id
+
+
+@pytest.fixture
+async def executions(session, add_three_tasks):
+    parent = await add_execution(session, 1, old, ExecutionState.FINISHED)
+    ids = {
+        'parent': parent,
+        'child': await add_execution(session, 2, old, ExecutionState.FAILED, parent_run_id=parent),
+        'next_day': await add_execution(session, 1, old + datetime.timedelta(days=1), ExecutionState.FINISHED, lines=3),
+        'running': await add_execution(session, 3, old, ExecutionState.STARTED),
+        'recent': await add_execution(session, 1, recent, ExecutionState.FINISHED)
+    }
+    return ids
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return HistoryArchive(str(tmp_path), after_days=30, batch_size=2)
+
+
+class TestHistoryArchive:
+    async def test_archive(self, session, executions, archive):
+        counts = await archive.archive(datetime.datetime(2020, 1, 3))
+        assert counts == {'process_log': 3, 'output_log': 10}
+
+        remaining = (await session.scalars(select(ProcessLog.process_log_id))).all()
+        assert sorted(remaining) == sorted([executions['running'], executions['recent']])
+        assert {log.process_log_id for log in (await session.scalars(select(OutputLog))).all()} == set(remaining)
+        assert os.path.isdir(os.path.join(archive.directory, 'output_log', 'date=2020-01-02', 'task_id=1'))
+
+        assert await archive.archive(datetime.datetime(2020, 1, 3)) == {'process_log': 0, 'output_log': 0}
+
+    async def test_query(self, executions, archive):
+        await archive.archive(datetime.datetime(2020, 1, 3))
+
+        rows = archive.query(task_id=1)
+        assert [row['process_log_id'] for row in rows] == [executions['parent'], executions['next_day']]
+        assert rows[0]['status'] == 'finished' and rows[0]['start_date'] == old and rows[0]['date'] == '2020-01-01'
+
+        child = archive.query(task_id=2)[0]
+        assert child['parent_run_id'] == executions['parent'] and child['status'] == 'failed'
+
+        assert [row['process_log_id'] for row in archive.query(since=datetime.date(2020, 1, 2))] == \
+               [executions['next_day']]
+        assert len(archive.query(until=datetime.date(2020, 1, 1))) == 2
+        assert archive.query(task_id=3) == []
+
+        output = archive.query('output_log', process_log_ids=[executions['next_day']])
+        assert [row['message'] for row in output] == ['1 line 0\n', '1 line 1\n', '1 line 2\n', '1 done\n']
+        assert [row['is_error'] for row in output] == [0, 0, 0, 1]
+        assert len(archive.query('output_log', limit=4)) == 4
+
+        with pytest.raises(ValueError):
+            archive.query('task')
+
+    async def test_empty_archive(self, archive):
+        assert archive.query(task_id=1) == []
+
+    async def test_default_cutoff(self, session, executions, archive):
+        counts = await archive.archive()
+        assert counts['process_log'] == 3
+
+    async def test_api(self, executions, archive, monkeypatch):
+        monkeypatch.setattr(archive_module, '_history_archive', None)
+        assert client.get('/archive/process_log').status_code == 404
+
+        await archive.archive(datetime.datetime(2020, 1, 3))
+        monkeypatch.setattr(archive_module, '_history_archive', archive)
+        process_logs = json.loads(client.get('/archive/process_log', params={'task_id': 1}).content)['process_logs']
+        assert len(process_logs) == 2
+
+        response = json.loads(client.get(f"/archive/execution/output/{executions['child']}").content)
+        assert response['process_log']['task_id'] == 2
+        assert [log['message'] for log in response['output_logs']] == ['2 line 0\n', '2 line 1\n', '2 done\n']
+        assert response['output_logs'][-1]['error'] is True
+
+        assert client.get(f"/archive/execution/output/{executions['recent']}").status_code == 404
+
+    async def test_from_env(self, tmp_path, monkeypatch):
+        monkeypatch.delenv('ARCHIVE_DIR', raising=False)
+        assert HistoryArchive.from_env() is None
+        monkeypatch.setenv('ARCHIVE_DIR', str(tmp_path))
+        monkeypatch.setenv('ARCHIVE_AFTER_DAYS', '365')
+        assert HistoryArchive.from_env().after_days == 365
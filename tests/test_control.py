@@ -0,0 +1,186 @@
+import asyncio
+import collections
+import json
+import sys
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from api.routers.task_executor_router import run_executor
+from scheduler.control import ControlServer, ControlClient
+from scheduler.executor import ExecutionManager, TaskExecutor
+from scheduler.task import CronTask
+from tests.testing import *
+
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def execution_manager():
+    execution_manager = ExecutionManager()
+    for task_id in (3, 4):
+        task = CronTask(f'yearly {task_id}', 'echo yearly', '0 0 1 1 *')
+        task.task_id = task_id
+        execution_manager.task_executors[task_id] = TaskExecutor(task, execution_manager)
+    yield execution_manager
+    execution_manager.stop_all()
+    execution_manager.task_executors.clear()
+
+
+@pytest.fixture
+async def control_server(tmp_path, execution_manager):
+    control_server = ControlServer(execution_manager, str(tmp_path / 'control.sock'))
+    await control_server.start()
+    yield control_server
+    await control_server.close()
+
+
+@pytest.fixture
+async def control_client(control_server):
+    control_client = ControlClient(control_server.path)
+    yield control_client
+    await control_client.close()
+
+
+class TestControlPlane:
+    async def test_executors(self, control_client):
+        executors = await control_client.executors()
+        assert [executor['task']['task_id'] for executor in executors] == [3, 4]
+        assert not any(executor['active'] for executor in executors)
+
+    async def test_run_and_stop(self, control_client, execution_manager):
+        await control_client.run_task(3)
+        assert execution_manager.task_executors[3].active
+
+        await control_client.stop_task(3)
+        assert not execution_manager.task_executors[3].active
+
+    async def test_not_found(self, control_client):
+        with pytest.raises(KeyError):
+            await control_client.run_task(42)
+
+        with pytest.raises(HTTPException) as e:
+            await run_executor(42, control_plane=control_client)
+        assert e.value.status_code == 404
+
+    async def test_unexpected_error(self, control_client, execution_manager, monkeypatch):
+        async def broken_sync():
+            raise RuntimeError('database is down')
+
+        monkeypatch.setattr(execution_manager, 'sync', broken_sync)
+        started = time.monotonic()
+        with pytest.raises(RuntimeError, match='database is down'):
+            await control_client.sync()
+        assert time.monotonic() - started < 1
+
+    async def test_sync(self, session, control_client, execution_manager):
+        session.add(CronTask('cron', 'echo cron', '1 0 * * *'))
+        await session.commit()
+
+        await control_client.sync()
+        assert sorted(execution_manager.task_executors) == [1]
+
+    async def test_concurrent_requests(self, control_client):
+        results = await asyncio.gather(
+            control_client.admission(),
+            control_client.executors(),
+            control_client.forecast(10, 60)
+        )
+        assert 'slots' in results[0]
+        assert len(results[1]) == 2
+        assert len(results[2]) == 10 and isinstance(results[2][0]['time'], str)
+
+    async def test_reconnect(self, control_server, control_client):
+        await control_client.executors()
+
+        await control_server.close()
+        await control_server.start()
+        await asyncio.sleep(0.01)
+
+        assert len(await control_client.executors()) == 2
+
+    async def test_subscribe(self, control_client, execution_manager):
+        events = control_client.subscribe()
+        first = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.05)
+
+        execution_manager.task_executors[3].update_status('started')
+        assert await asyncio.wait_for(first, 1) == {'event': 'status', 'task_id': 3, 'status': 'started'}
+        await events.aclose()
+
+
+class TestExecutorChanges:
+    async def test_delta(self, control_client, execution_manager):
+        snapshot = await control_client.executor_changes(0)
+        assert snapshot['full'] and len(snapshot['task_executors']) == 2
+        version = snapshot['version']
+
+        assert await control_client.executor_changes(version) == {
+            'version': version, 'full': False, 'task_executors': [], 'removed': []
+        }
+
+        execution_manager.task_executors[4].update_status('started')
+        await control_client.run_task(3)
+        changes = await control_client.executor_changes(version)
+        assert not changes['full'] and changes['version'] == version + 2
+        assert changes['task_executors'] == [
+            {'task_id': 3, 'active': True, 'status': 'never launched'},
+            {'task_id': 4, 'active': False, 'status': 'started'}
+        ]
+        assert (await control_client.executor_changes(version + 1))['task_executors'] == [
+            {'task_id': 3, 'active': True, 'status': 'never launched'}
+        ]
+
+    async def test_task_edits(self, session, execution_manager):
+        version = execution_manager.version
+        session.add(CronTask('cron', 'echo cron', '1 0 * * *'))
+        await session.commit()
+        await execution_manager.sync()
+
+        changes = execution_manager.changes(version)
+        assert changes['removed'] == [3, 4]
+        assert [executor['task_id'] for executor in changes['task_executors']] == [1]
+        assert changes['task_executors'][0]['task']['command'] == 'echo cron'
+
+    async def test_snapshot_when_behind(self, execution_manager, monkeypatch):
+        monkeypatch.setattr(execution_manager, '_changes', collections.deque(maxlen=2))
+        version = execution_manager.version
+        for status in ('started', 'finished'):
+            execution_manager.task_executors[3].update_status(status)
+        assert not execution_manager.changes(version)['full']
+
+        execution_manager.task_executors[4].update_status('started')
+        assert execution_manager.changes(version)['full']
+        assert not execution_manager.changes(version + 1)['full']
+        assert execution_manager.changes(execution_manager.version + 1)['full']
+
+    async def test_endpoint(self, execution_manager):
+        assert len(json.loads(client.get('/executor').content)['task_executors']) == 2
+
+        version = json.loads(client.get('/executor?since=0').content)['version']
+        execution_manager.task_executors[3].update_status('failed')
+        changes = json.loads(client.get(f'/executor?since={version}').content)
+        assert changes['task_executors'] == [{'task_id': 3, 'active': False, 'status': 'failed'}]
+        assert client.get('/executor?since=-1').status_code == 422
+
+
+class TestModes:
+    @pytest.mark.parametrize('mode', ['all', 'scheduler', 'api'])
+    def test_modes(self, monkeypatch, mode):
+        from main import parse_args
+
+        monkeypatch.setattr(sys, 'argv', ['main.py', '--mode', mode, '--workers', '4'])
+        args = parse_args()
+        assert args.mode == mode and args.workers == 4
+
+    def test_worker_app_uses_client(self, monkeypatch, tmp_path):
+        from api.app import create_worker_app
+        from scheduler import control
+
+        monkeypatch.setenv('CONTROL_SOCKET', str(tmp_path / 'control.sock'))
+        monkeypatch.setattr(control, '_control_plane', None)
+        create_worker_app()
+        assert isinstance(control.get_control_plane(), ControlClient)
+        assert control.get_control_plane().path == str(tmp_path / 'control.sock')
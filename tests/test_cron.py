@@ -0,0 +1,118 @@
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from croniter import croniter
+
+from scheduler.cron import CompiledCron, compile_cron
+
+
+expressions = [
+    '* * * * *',
+    '*/7 * * * *',
+    '5/15 * * * *',
+    '0,30 9-17 * * *',
+    '0 9-17/2 * * mon-fri',
+    '15 3 1 * *',
+    '0 0 31 * *',
+    '0 0 29 2 *',
+    '0 12 13 * 5',
+    '0 0 * * 7',
+    '30 4 1,15 jan,jul *',
+    '0 0 1-7 * sun',
+    '@daily',
+    '@hourly',
+    '@weekly'
+]
+starts = [
+    datetime(2023, 2, 27, 23, 59, 30),
+    datetime(2023, 12, 31, 23, 59),
+    datetime(2024, 2, 28, 12, 0),
+    datetime(2030, 6, 15, 8, 7, 6, 5)
+]
+
+
+def scan(cron: CompiledCron, start: datetime, count: int) -> List[datetime]:
+    """Run dates found by checking every minute against the cron rules."""
+    run_dates = []
+    minute = start.replace(second=0, microsecond=0)
+    while len(run_dates) < count:
+        minute += timedelta(minutes=1)
+        day = cron.days >> minute.day & 1
+        weekday = cron.weekdays >> (minute.weekday() + 1) % 7 & 1
+        if not ((day or weekday) if cron.day_or else (day and weekday)):
+            continue
+        if cron.months >> minute.month & 1 and cron.hours >> minute.hour & 1 and cron.minutes >> minute.minute & 1:
+            run_dates.append(minute)
+    return run_dates
+
+
+def take(run_dates, count: int) -> List[datetime]:
+    return list(itertools.islice(run_dates, count))
+
+
+class TestCompiledCron:
+    @pytest.mark.parametrize('expression', expressions)
+    def test_matches_croniter(self, expression):
+        cron = compile_cron(expression)
+        assert isinstance(cron, CompiledCron)
+        for start in starts:
+            reference = croniter(expression, start, ret_type=datetime)
+            assert take(cron.run_dates_after(start), 50) == [reference.get_next() for _ in range(50)]
+
+    def test_matches_minute_scan(self):
+        generator = random.Random(42)
+
+        def field(low: int, high: int) -> str:
+            first = generator.randint(low, high)
+            return generator.choice([
+                '*',
+                f'*/{generator.randint(2, 10)}',
+                str(first),
+                f'{first}-{generator.randint(first, high)}',
+                f'{first}-{high}/{generator.randint(2, 5)}',
+                ','.join(str(generator.randint(low, high)) for _ in range(3))
+            ])
+
+        for _ in range(100):
+            expression = ' '.join((field(0, 59), field(0, 23), field(1, 31), '*', field(0, 7)))
+            start = datetime(2020, 1, 1) + timedelta(minutes=generator.randint(0, 4 * 365 * 24 * 60))
+            cron = compile_cron(expression)
+            assert take(cron.run_dates_after(start), 5) == scan(cron, start, 5), expression
+
+    def test_day_of_month_or_weekday(self):
+        run_dates = take(compile_cron('0 12 13 * 5').run_dates_after(datetime(2023, 1, 1)), 5)
+        assert all(run_date.day == 13 or run_date.weekday() == 4 for run_date in run_dates)
+        assert datetime(2023, 1, 13, 12) in run_dates and datetime(2023, 1, 6, 12) in run_dates
+
+    def test_first_of_month_after_february(self):
+        assert compile_cron('0 2 */10 * *').next_after(datetime(2030, 2, 25)) == datetime(2030, 3, 1, 2)
+
+    def test_leap_day(self):
+        assert take(compile_cron('0 0 29 2 *').run_dates_after(datetime(2021, 1, 1)), 2) == [
+            datetime(2024, 2, 29), datetime(2028, 2, 29)
+        ]
+
+    def test_shared(self):
+        assert compile_cron('*/5 * * * *') is compile_cron('*/5 * * * *')
+
+    @pytest.mark.parametrize('expression', ['0 0 L * *', '0 0 * * 5#2', '0 0 1 1 * 30', '0 0 30 2 *'])
+    def test_croniter_fallback(self, expression):
+        cron = compile_cron(expression)
+        assert not isinstance(cron, CompiledCron)
+        start = datetime(2023, 1, 1)
+        if expression != '0 0 30 2 *':
+            reference = croniter(expression, start, ret_type=datetime)
+            assert take(cron.run_dates_after(start), 3) == [reference.get_next() for _ in range(3)]
+
+    @pytest.mark.parametrize('expression', ['* * * *', '61 * * * *', '* * * * funday', '0 22-2 * * *'])
+    def test_invalid(self, expression):
+        with pytest.raises(ValueError):
+            compile_cron(expression)
+
+    def test_aware_start(self):
+        start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+        run_date = next(compile_cron('0 * * * *').run_dates_after(start))
+        assert run_date == datetime(2023, 1, 1, 1, tzinfo=timezone.utc)
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import time
+
+import pytest
+from sqlalchemy import select
+
+from db.models import ProcessLog, ExecutionState
+from scheduler.dag import TaskGraph
+from scheduler.executor import ExecutionManager, ExecutionMonitor, TaskExecutor, DagRun
+from scheduler.task import CronTask
+from tests.testing import *
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestTaskGraph:
+    def test_descendants_order(self):
+        graph = TaskGraph([(1, 2, 'success'), (1, 3, 'success'), (2, 4, 'success'), (3, 4, 'success'),
+                           (4, 5, 'failure'), (6, 1, 'success')])
+        order = graph.descendants(1)
+        assert set(order) == {2, 3, 4, 5}
+        assert order.index(4) > order.index(2) and order.index(4) > order.index(3)
+        assert order[-1] == 5
+
+    def test_cycle(self):
+        graph = TaskGraph([(1, 2, 'success'), (2, 3, 'success')])
+        assert graph.would_create_cycle(3, 1)
+        assert graph.would_create_cycle(2, 2)
+        assert not graph.would_create_cycle(1, 3)
+
+    def test_satisfied(self):
+        assert TaskGraph.satisfied('success', ExecutionState.FINISHED)
+        assert not TaskGraph.satisfied('success', ExecutionState.FAILED)
+        assert TaskGraph.satisfied('failure', ExecutionState.TIMED_OUT)
+
+
+@pytest.fixture
+async def add_cron_tasks(session):
+    for i in range(3):
+        session.add(CronTask(f'yearly {i}', f'echo {i}', '0 0 1 1 *'))
+    await session.commit()
+
+
+class TestDependencyAPI:
+    async def test_add_dependency(self, add_cron_tasks):
+        response = client.post('/task/2/dependency', json={'upstream_task_id': 1})
+        assert response.status_code == 201
+        assert json.loads(response.content)['dependency'] == \
+               {'upstream_task_id': 1, 'downstream_task_id': 2, 'condition': 'success'}
+
+        response = client.post('/task/3/dependency', json={'upstream_task_id': 2, 'condition': 'failure'})
+        assert response.status_code == 201
+        assert ExecutionManager().graph.descendants(1) == [2, 3]
+
+        dependencies = json.loads(client.get('/task/3/dependency').content)['dependencies']
+        assert dependencies == [{'upstream_task_id': 2, 'downstream_task_id': 3, 'condition': 'failure'}]
+
+        client.delete('/task/3/dependency/2')
+        assert json.loads(client.get('/task/3/dependency').content)['dependencies'] == []
+        assert ExecutionManager().graph.descendants(1) == [2]
+
+    async def test_reject_cycle(self, add_cron_tasks):
+        assert client.post('/task/2/dependency', json={'upstream_task_id': 1}).status_code == 201
+        assert client.post('/task/3/dependency', json={'upstream_task_id': 2}).status_code == 201
+
+        response = client.post('/task/1/dependency', json={'upstream_task_id': 3})
+        assert response.status_code == 400
+        assert 'cycle' in json.loads(response.content)['detail']
+        assert client.post('/task/1/dependency', json={'upstream_task_id': 1}).status_code == 400
+
+    async def test_invalid(self, add_cron_tasks):
+        assert client.post('/task/2/dependency', json={'upstream_task_id': 42}).status_code == 400
+        assert client.post('/task/2/dependency', json={'upstream_task_id': 1, 'condition': 'x'}).status_code == 422
+        assert client.get('/task/42/dependency').status_code == 404
+
+    async def test_delete_task(self, add_cron_tasks):
+        assert client.post('/task/2/dependency', json={'upstream_task_id': 1}).status_code == 201
+        assert client.post('/task/3/dependency', json={'upstream_task_id': 2}).status_code == 201
+
+        assert client.delete('/task/2').status_code == 200
+        assert json.loads(client.get('/task/3/dependency').content)['dependencies'] == []
+        assert ExecutionManager().graph.descendants(1) == []
+
+
+class TestDagRun:
+    @staticmethod
+    def cron_task(task_id: int, command: str) -> CronTask:
+        task = CronTask(f'task {task_id}', command, '0 0 1 1 *')
+        task.task_id = task_id
+        return task
+
+    async def run(self, commands, edges):
+        execution_manager = ExecutionManager()
+        graph, execution_manager.graph = execution_manager.graph, TaskGraph(edges)
+        for task_id, command in commands.items():
+            execution_manager.task_executors[task_id] = TaskExecutor(self.cron_task(task_id, command),
+                                                                     execution_manager)
+        try:
+            root = execution_manager.task_executors[min(commands)]
+            return await DagRun(root.task, execution_manager, root.update_status).start()
+        finally:
+            execution_manager.graph = graph
+            for task_id in commands:
+                execution_manager.task_executors.pop(task_id)
+
+    async def test_fan_out(self, session):
+        commands = {3: 'echo root', 4: 'sleep 0.3', 5: 'sleep 0.3', 6: 'echo join', 7: 'echo on failure'}
+        edges = [(3, 4, 'success'), (3, 5, 'success'), (4, 6, 'success'), (5, 6, 'success'), (3, 7, 'failure')]
+
+        started = time.monotonic()
+        results = await self.run(commands, edges)
+        assert time.monotonic() - started < 0.55
+
+        assert results == {3: ExecutionState.FINISHED, 4: ExecutionState.FINISHED, 5: ExecutionState.FINISHED,
+                           6: ExecutionState.FINISHED, 7: None}
+
+        process_logs = {
+            process_log.task_id: process_log
+            for process_log
+            in (await session.scalars(select(ProcessLog))).all()
+        }
+        assert set(process_logs) == {3, 4, 5, 6}
+        assert process_logs[3].parent_run_id is None
+        assert all(process_logs[task_id].parent_run_id == process_logs[3].process_log_id for task_id in (4, 5, 6))
+        assert process_logs[6].start_date >= max(process_logs[4].finish_date, process_logs[5].finish_date)
+
+    async def test_failure_branch(self, session):
+        commands = {3: 'false', 4: 'echo on success', 5: 'echo on failure', 6: 'echo after success'}
+        edges = [(3, 4, 'success'), (3, 5, 'failure'), (4, 6, 'success')]
+
+        results = await self.run(commands, edges)
+        assert results == {3: ExecutionState.FAILED, 4: None, 5: ExecutionState.FINISHED, 6: None}
+
+    async def test_error_cancels_siblings(self, session, monkeypatch):
+        cancelled = []
+        start = ExecutionMonitor.start
+
+        async def start_or_fail(monitor: ExecutionMonitor):
+            if monitor._task.task_id == 5:
+                raise RuntimeError('database is down')
+            try:
+                return await start(monitor)
+            except asyncio.CancelledError:
+                cancelled.append(monitor._task.task_id)
+                raise
+
+        monkeypatch.setattr(ExecutionMonitor, 'start', start_or_fail)
+        started = time.monotonic()
+        with pytest.raises(RuntimeError, match='database is down'):
+            await self.run({3: 'echo root', 4: 'sleep 5', 5: 'echo never'}, [(3, 4, 'success'), (3, 5, 'success')])
+        await asyncio.sleep(0.1)
+
+        assert time.monotonic() - started < 2
+        assert cancelled == [4]
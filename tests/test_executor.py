@@ -1,6 +1,8 @@
 import asyncio
 import datetime
 import json
+import signal
+import time
 from typing import List
 
 import pytest
@@ -54,6 +56,12 @@ class TestExecutorManager:
         client.delete('/task/1')
         assert len(execution_manager.task_executors) == 0
 
+    async def test_sync_chunks(self, session, add_three_tasks, execution_manager, monkeypatch):
+        monkeypatch.setattr(ExecutionManager, 'sync_chunk_size', 2)
+        execution_manager.task_executors.clear()
+        await execution_manager.sync()
+        assert sorted(execution_manager.task_executors) == [1, 2, 3]
+
     async def test_update(self, session, add_one_task, execution_manager):
         old_task = execution_manager.task_executors[1].task
         assert old_task == IntervalTask('every 0.25s', 'echo 0.25s', seconds=0.25)
@@ -169,4 +177,52 @@ class TestExecution:
         )
 
         for log, is_error in zip(logs, mixed_output_error_order):
-            assert log.__class__ == [ConsoleLog, StderrLog][is_error]
\ No newline at end of file
+            assert log.__class__ == [ConsoleLog, StderrLog][is_error]
+
+
+class TestTimeout:
+    @staticmethod
+    def monitor(command: str, timeout: float, kill_grace: float = 0.2) -> ExecutionMonitor:
+        task = IntervalTask('hung', command, seconds=1)
+        task.task_id = 1
+        task.timeout = timeout
+        task.kill_grace = kill_grace
+        return ExecutionMonitor(task, lambda _: None)
+
+    async def test_no_timeout(self, session):
+        await self.monitor('echo done', timeout=5).start()
+        process_log = (await session.scalars(select(ProcessLog))).one()
+        assert process_log.status == 'finished'
+
+    async def test_timed_out(self, session):
+        started = time.monotonic()
+        return_code = await self.monitor('echo started; sleep 30', timeout=0.3).start()
+
+        process_log = (await session.scalars(select(ProcessLog))).one()
+        output_logs = (await session.scalars(select(ConsoleLog))).all()
+        assert time.monotonic() - started < 5
+        assert process_log.status == 'timed_out' and return_code == -signal.SIGTERM
+        assert [log.message for log in output_logs] == ['started\n']
+
+    async def test_redirected_output(self, session):
+        started = time.monotonic()
+        return_code = await self.monitor('exec >/dev/null 2>&1; sleep 4', timeout=0.3).start()
+
+        process_log = (await session.scalars(select(ProcessLog))).one()
+        assert time.monotonic() - started < 2
+        assert process_log.status == 'timed_out' and return_code == -signal.SIGTERM
+
+    async def test_process_group_killed(self, session):
+        started = time.monotonic()
+        await self.monitor('sleep 30 & sleep 30', timeout=0.3).start()
+
+        process_log = (await session.scalars(select(ProcessLog))).one()
+        assert time.monotonic() - started < 5
+        assert process_log.status == 'timed_out'
+
+    async def test_sigterm_ignored(self, session):
+        started = time.monotonic()
+        return_code = await self.monitor('trap "" TERM; sleep 30', timeout=0.3).start()
+
+        assert time.monotonic() - started < 5
+        assert return_code == -signal.SIGKILL
@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+import sys
+from typing import List
+
+import pytest
+from sqlalchemy import select
+
+from db.models import OutputLog
+from scheduler.executor import ExecutionMonitor
+from scheduler.limits import ResourceLimits
+from scheduler.task import IntervalTask
+from tests.testing import *
+
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.skipif(not sys.platform.startswith('linux'), reason='resource limits are tested on Linux')
+]
+
+
+def limited_monitor(command: str, **limits) -> ExecutionMonitor:
+    task = IntervalTask('limited', command, seconds=1)
+    task.task_id = 3
+    task.resource_limits = json.dumps(limits)
+    return ExecutionMonitor(task, lambda _: None)
+
+
+def python_command(code: str) -> str:
+    return f'{sys.executable} -c "{code}"'
+
+
+async def output(session) -> List[str]:
+    logs = (await session.scalars(select(OutputLog).order_by(OutputLog.output_log_id))).all()
+    return [log.message.strip() for log in logs]
+
+
+class TestResourceLimits:
+    def test_unlimited(self):
+        assert ResourceLimits.from_json(None).preexec_fn() is None
+        assert ResourceLimits.from_json('{}').preexec_fn() is None
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            ResourceLimits(ionice_class='urgent')
+        with pytest.raises(ValueError):
+            ResourceLimits(cgroup='../escape')
+
+    async def test_applied(self, session):
+        cpu = min(os.sched_getaffinity(0))
+        monitor = limited_monitor(
+            python_command('import os, resource; '
+                           'print(os.getpriority(os.PRIO_PROCESS, 0)); '
+                           'print(resource.getrlimit(resource.RLIMIT_NOFILE)[0]); '
+                           'print(resource.getrlimit(resource.RLIMIT_CPU)[0]); '
+                           'print(sorted(os.sched_getaffinity(0)))'),
+            nice=10, max_open_files=64, max_cpu_seconds=100, cpu_affinity=[cpu]
+        )
+        assert await monitor.start() == 0
+        assert await output(session) == ['10', '64', '100', f'[{cpu}]']
+
+    @pytest.mark.skipif(not shutil.which('ionice'), reason='needs ionice')
+    async def test_io_priority(self, session):
+        assert await limited_monitor('ionice -p $$', ionice_class='idle').start() == 0
+        assert await output(session) == ['idle']
+
+    async def test_memory_limit(self, session):
+        monitor = limited_monitor(python_command('bytearray(512 * 1024 * 1024)'), max_memory=256 * 1024 * 1024)
+        assert await monitor.start() != 0
+        assert 'MemoryError' in (await output(session))[-1]
+
+    async def test_failure_fails_run(self, session):
+        monitor = limited_monitor('echo unconstrained', cpu_affinity=[4096])
+        assert await monitor.start() == ResourceLimits.failure_code
+
+        messages = await output(session)
+        assert messages[0].startswith('Cannot apply resource limits:')
+        assert 'unconstrained' not in messages
+
+    async def test_cgroup(self, session, tmp_path, monkeypatch):
+        monkeypatch.setenv('CGROUP_ROOT', str(tmp_path))
+        assert await limited_monitor('echo no hierarchy', cgroup='batch').start() == 0
+        assert not (tmp_path / 'batch').exists()
+
+        (tmp_path / 'cgroup.controllers').write_text('cpu memory io\n')
+        assert await limited_monitor('echo $$', cgroup='pscheduler/batch').start() == 0
+        assert (tmp_path / 'pscheduler' / 'batch' / 'cgroup.procs').read_text() == (await output(session))[-1]
+
+
+class TestResourceLimitsApi:
+    async def test_insert(self, session):
+        limits = {'nice': 5, 'ionice_class': 'best-effort', 'ionice_level': 7, 'max_memory': 1 << 30}
+        response = client.post('/task', json={
+            'title': 'batch',
+            'descr': None,
+            'command': 'echo batch',
+            'trigger_type': 'interval',
+            'trigger_args': {'seconds': 1},
+            'resource_limits': limits
+        })
+        assert response.status_code == 201
+        assert json.loads(client.get('/task/1').content)['task']['resource_limits'] == limits
+
+    @pytest.mark.parametrize('limits', [{'nice': 40}, {'ionice_class': 'urgent'}, {'cgroup': '/sys/fs/cgroup'},
+                                        {'cgroup': 'a/../../b'}, {'cpu_affinity': []}])
+    async def test_rejected(self, session, limits):
+        response = client.post('/task', json={
+            'title': 'batch',
+            'descr': None,
+            'command': 'echo batch',
+            'trigger_type': 'interval',
+            'trigger_args': {'seconds': 1},
+            'resource_limits': limits
+        })
+        assert response.status_code == 422
@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from util.loop import loop_name, install_loop_policy, new_event_loop
+
+
+class TestLoopPolicy:
+    def test_default(self, monkeypatch):
+        monkeypatch.delenv('EVENT_LOOP', raising=False)
+        assert loop_name() == 'asyncio'
+
+    def test_unknown(self, monkeypatch):
+        monkeypatch.setenv('EVENT_LOOP', 'tokio')
+        with pytest.raises(ValueError):
+            loop_name()
+
+    def test_uvloop(self):
+        uvloop = pytest.importorskip('uvloop')
+        loop = new_event_loop('uvloop')
+        try:
+            assert isinstance(loop, uvloop.Loop)
+            assert loop.run_until_complete(asyncio.sleep(0, 'done')) == 'done'
+        finally:
+            loop.close()
+            install_loop_policy()
@@ -0,0 +1,118 @@
+import asyncio
+import io
+import json
+import threading
+import time
+
+import pytest
+
+from util import loop_monitor, mirror
+from util.loop_monitor import LoopLagMonitor
+from util.mirror import ConsoleMirror
+from tests.testing import *
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def blocking_call(seconds: float):
+    time.sleep(seconds)
+
+
+class TestLoopLagMonitor:
+    async def test_samples(self):
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.15)
+        monitor.stop()
+
+        metrics = monitor.to_dict()
+        assert metrics['samples'] >= 5
+        assert metrics['p50'] < 0.05
+        assert metrics['stalls'] == []
+
+    async def test_stall_stack(self):
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_call(0.3)
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+        assert monitor.max_lag >= 0.25
+        stall = monitor.stalls[-1]
+        assert 'blocking_call' in stall['stack']
+        assert stall['duration'] >= 0.25
+
+    async def test_metrics_endpoint(self):
+        response = client.get('/metrics/loop')
+        assert response.status_code == 200
+        metrics = json.loads(response.content)
+        assert {'samples', 'p50', 'p95', 'p99', 'max', 'stalls'} <= set(metrics['loop_lag'])
+        assert 'dropped' in metrics['console_mirror']
+
+    def test_configured_on_first_use(self, monkeypatch):
+        monkeypatch.setattr(loop_monitor, '_loop_monitor', None)
+        monkeypatch.setenv('LOOP_LAG_INTERVAL', '0.5')
+        assert loop_monitor.get_loop_monitor().interval == 0.5
+        assert loop_monitor.get_loop_monitor() is loop_monitor.get_loop_monitor()
+
+
+class TestConsoleMirror:
+    @staticmethod
+    def drain(mirror: ConsoleMirror):
+        deadline = time.monotonic() + 1
+        while mirror.to_dict()['queued'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.01)
+
+    def test_disabled(self):
+        stream = io.StringIO()
+        mirror = ConsoleMirror(enabled=False, stream=stream)
+        mirror.write('line\n')
+        assert mirror.to_dict()['queued'] == 0 and stream.getvalue() == ''
+
+    def test_rate_limit(self):
+        stream = io.StringIO()
+        mirror = ConsoleMirror(enabled=True, rate=5, stream=stream)
+        for i in range(10):
+            mirror.write(f'line {i}\n')
+        self.drain(mirror)
+
+        assert stream.getvalue() == ''.join(f'line {i}\n' for i in range(5))
+        assert mirror.dropped == 5
+
+    def test_configured_on_first_use(self, monkeypatch):
+        monkeypatch.setattr(mirror, '_console_mirror', None)
+        monkeypatch.setenv('MIRROR_OUTPUT', 'true')
+        monkeypatch.setenv('MIRROR_OUTPUT_RATE', '5')
+        console_mirror = mirror.get_console_mirror()
+        assert console_mirror.enabled and console_mirror.rate == 5
+        assert mirror.get_console_mirror() is console_mirror
+
+    def test_dropped_from_threads(self):
+        console_mirror = ConsoleMirror(enabled=True, rate=0.001, stream=io.StringIO())
+        console_mirror._tokens = 0
+
+        def write():
+            for _ in range(10000):
+                console_mirror.write('line\n')
+
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert console_mirror.dropped == 40000
+
+    def test_non_blocking(self):
+        class SlowStream(io.StringIO):
+            def write(self, s):
+                time.sleep(0.05)
+                return super().write(s)
+
+        mirror = ConsoleMirror(enabled=True, rate=1000, stream=SlowStream())
+        started = time.monotonic()
+        for i in range(100):
+            mirror.write(f'line {i}\n')
+        assert time.monotonic() - started < 0.05
@@ -0,0 +1,111 @@
+import datetime
+import json
+from typing import List
+
+import pytest
+from sqlalchemy import select
+
+from db.models import ConsoleLog, OutputLog
+from scheduler.executor import ExecutionMonitor
+from scheduler.output import OutputPolicy, OutputLimiter
+from scheduler.stats import TaskStatsRecorder
+from scheduler.task import IntervalTask
+from tests.testing import *
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def feed(limiter: OutputLimiter, count: int) -> List[str]:
+    now = datetime.datetime.utcnow()
+    return [
+        log.message
+        for log
+        in (ConsoleLog(f'{i}\n', now, 1) for i in range(count))
+        if limiter.admit(log)
+    ]
+
+
+class TestOutputLimiter:
+    def test_unlimited(self):
+        limiter = OutputLimiter(OutputPolicy())
+        assert len(feed(limiter, 1000)) == 1000
+        assert limiter.finish(1) == []
+
+    def test_head_and_tail(self):
+        limiter = OutputLimiter(OutputPolicy(max_lines=3, tail_lines=2))
+        admitted = feed(limiter, 10)
+        finished = [log.message for log in limiter.finish(1)]
+
+        assert admitted == ['0\n', '1\n', '2\n']
+        assert finished == ['[truncated 5 lines / 10 bytes]\n', '8\n', '9\n']
+        assert limiter.dropped_lines == 5 and limiter.dropped_bytes == 10
+
+    def test_bytes(self):
+        limiter = OutputLimiter(OutputPolicy(max_bytes=5, tail_lines=0))
+        assert feed(limiter, 10) == ['0\n', '1\n']
+        assert limiter.dropped_lines == 8
+
+    def test_rate(self):
+        limiter = OutputLimiter(OutputPolicy(max_lines_per_second=10, tail_lines=1))
+        assert len(feed(limiter, 100)) == 10
+        assert limiter.dropped_lines == 90
+        assert not limiter.truncated
+
+    def test_rate_resumes(self):
+        limiter = OutputLimiter(OutputPolicy(max_lines_per_second=10))
+        feed(limiter, 100)
+
+        limiter._refilled_at -= 1
+        assert len(feed(limiter, 100)) == 10
+        assert limiter.dropped_lines == 180
+        assert limiter.finish(1)[0].message == '[truncated 180 lines / 540 bytes]\n'
+
+    def test_no_marker_within_tail(self):
+        limiter = OutputLimiter(OutputPolicy(max_lines=2, tail_lines=5))
+        feed(limiter, 4)
+        assert [log.message for log in limiter.finish(1)] == ['2\n', '3\n']
+
+
+class TestOutputPolicy:
+    @pytest.fixture
+    def limited_monitor(self, session) -> ExecutionMonitor:
+        task = IntervalTask('noisy', 'seq 1 1000', seconds=1)
+        task.task_id = 3
+        task.output_policy = json.dumps({'max_lines': 10, 'tail_lines': 5})
+        return ExecutionMonitor(task, lambda _: None)
+
+    async def test_truncated_output(self, session, limited_monitor):
+        await limited_monitor.start()
+        logs: List[OutputLog] = (await session.scalars(
+            select(OutputLog).
+            order_by(OutputLog.output_log_id)
+        )).all()
+
+        assert [log.message for log in logs] == [
+            *[f'{i}\n' for i in range(1, 11)],
+            '[truncated 985 lines / 3851 bytes]\n',
+            *[f'{i}\n' for i in range(996, 1001)]
+        ]
+
+    async def test_dropped_counters(self, session, add_three_tasks, limited_monitor):
+        await limited_monitor.start()
+        await TaskStatsRecorder().flush()
+
+        stats = json.loads(client.get('/task/3/stats').content)['stats']
+        assert stats['dropped_lines'] == 985 and stats['dropped_bytes'] == 3851
+
+    async def test_insert(self, session):
+        client.post(
+            '/task',
+            json={
+                'title': 'noisy',
+                'descr': None,
+                'command': 'seq 1 1000',
+                'trigger_type': 'interval',
+                'trigger_args': {'seconds': 1},
+                'output_policy': {'max_lines': 10}
+            }
+        )
+        task = json.loads(client.get('/task/1').content)['task']
+        assert task['output_policy'] == {'max_lines': 10}
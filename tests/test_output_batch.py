@@ -0,0 +1,74 @@
+import datetime
+import json
+
+import pytest
+
+from db.models import ProcessLog, ConsoleLog, StderrLog, ExecutionState
+from tests.testing import *
+from util import OutputLogger
+
+
+logger = OutputLogger()
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def executions(session, add_three_tasks):
+    running, finished = ProcessLog(1), ProcessLog(2)
+    finished.set_state(ExecutionState.FAILED)
+    finished.return_code = 2
+    session.add_all([running, finished])
+    await session.flush()
+    ids = [running.process_log_id, finished.process_log_id]
+    await session.commit()
+
+    now = datetime.datetime.utcnow()
+    for i in range(3):
+        logger.log(ConsoleLog(f'running {i}\n', now, ids[0]))
+    logger.log(StderrLog('failed\n', now, ids[1]))
+    await logger.flush()
+    return ids
+
+
+def fetch(executions):
+    response = client.post('/execution/output', json={'executions': executions})
+    return response.status_code, json.loads(response.content)
+
+
+class TestOutputBatch:
+    async def test_grouped(self, executions):
+        running, finished = executions
+        status, body = fetch({running: None, finished: None})
+        assert status == 200
+
+        result = body['executions']
+        assert [log['message'] for log in result[str(running)]['output_logs']] == \
+               ['running 0\n', 'running 1\n', 'running 2\n']
+        assert result[str(running)]['status'] == 'awaiting'
+        assert result[str(finished)]['status'] == 'failed' and result[str(finished)]['return_code'] == 2
+        assert result[str(finished)]['output_logs'][0]['error'] is True
+
+    async def test_cursors(self, executions):
+        running, finished = executions
+        first = fetch({running: None, finished: None})[1]['executions']
+
+        cursors = {
+            running: first[str(running)]['output_logs'][0]['output_log_id'],
+            finished: first[str(finished)]['last_output_log_id']
+        }
+        result = fetch(cursors)[1]['executions']
+        assert [log['message'] for log in result[str(running)]['output_logs']] == ['running 1\n', 'running 2\n']
+        assert result[str(running)]['last_output_log_id'] == first[str(running)]['last_output_log_id']
+        assert result[str(finished)]['output_logs'] == []
+        assert result[str(finished)]['last_output_log_id'] == cursors[finished]
+
+    async def test_matches_single_endpoint(self, executions):
+        running, _ = executions
+        single = json.loads(client.get(f'/execution/output/{running}').content)
+        batch = fetch({running: None})[1]['executions'][str(running)]
+        assert batch == single
+
+    async def test_unknown_and_limits(self, executions):
+        assert fetch({42: None}) == (200, {'executions': {}})
+        assert fetch({})[1] == {'executions': {}}
+        assert fetch({i: None for i in range(201)})[0] == 422
@@ -0,0 +1,67 @@
+import datetime
+import gzip
+import json
+
+import pytest
+
+from db.dal import DAL
+from db.models import ProcessLog, ConsoleLog, StderrLog
+from tests.testing import *
+from util import OutputLogger
+
+
+logger = OutputLogger()
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def process_log_id(session, add_three_tasks):
+    process_log = ProcessLog(1)
+    session.add(process_log)
+    await session.flush()
+    process_log_id = process_log.process_log_id
+    await session.commit()
+
+    now = datetime.datetime.utcnow()
+    for i in range(2500):
+        logger.log(ConsoleLog(f'line {i}\n', now, process_log_id))
+    logger.log(StderrLog('done\n', now, process_log_id))
+    await logger.flush()
+    return process_log_id
+
+
+def expected_text() -> str:
+    return ''.join(f'line {i}\n' for i in range(2500)) + 'done\n'
+
+
+class TestOutputDownload:
+    async def test_text(self, process_log_id):
+        response = client.get(f'/execution/output/{process_log_id}/download')
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/plain')
+        assert f'output-{process_log_id}.txt' in response.headers['content-disposition']
+        assert response.text == expected_text()
+
+    async def test_ndjson(self, process_log_id):
+        response = client.get(f'/execution/output/{process_log_id}/download', params={'format': 'ndjson'})
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 2501
+        assert lines[0]['message'] == 'line 0\n' and lines[0]['error'] is False
+        assert lines[-1]['message'] == 'done\n' and lines[-1]['error'] is True
+        assert [line['output_log_id'] for line in lines] == sorted(line['output_log_id'] for line in lines)
+        datetime.datetime.fromisoformat(lines[0]['time'])
+
+    async def test_gzip(self, process_log_id):
+        response = client.get(f'/execution/output/{process_log_id}/download', params={'gzip': True},
+                              headers={'Accept-Encoding': 'identity'})
+        assert response.headers['content-type'] == 'application/gzip'
+        assert response.headers['content-disposition'].endswith('.txt.gz"')
+        assert gzip.decompress(response.content).decode() == expected_text()
+
+    async def test_chunks(self, process_log_id):
+        chunks = [len(rows) async for rows in DAL.stream_output_logs(process_log_id, chunk_size=1000)]
+        assert chunks == [1000, 1000, 501]
+
+    async def test_not_found(self, session):
+        assert client.get('/execution/output/42/download').status_code == 404
+        assert client.get('/execution/output/1/download', params={'format': 'csv'}).status_code == 422
@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+
+import pytest
+
+from scheduler.control import ControlServer, ControlClient
+from scheduler.executor import ExecutionManager, TaskExecutor
+from scheduler.task import CronTask
+from util.profiling import SamplingProfiler, get_profiler
+from tests.testing import *
+
+
+pytestmark = pytest.mark.asyncio
+
+headers = {'Authorization': 'Bearer secret'}
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    yield
+    client.post('/debug/tracemalloc/stop', headers=headers)
+
+
+def spin(seconds: float):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+class TestDebugEndpoints:
+    def test_guarded(self, monkeypatch):
+        monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+        assert client.get('/debug/objects', headers=headers).status_code == 404
+
+        monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+        assert client.get('/debug/objects').status_code == 403
+        assert client.get('/debug/objects', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+        assert client.get('/debug/objects', headers=headers).status_code == 200
+
+    def test_tracemalloc(self, admin_token):
+        assert client.get('/debug/tracemalloc/top', headers=headers).status_code == 409
+
+        started = json.loads(client.post('/debug/tracemalloc/start?frames=5', headers=headers).content)
+        assert started['tracing'] and started['frames'] == 5
+        assert client.get('/debug/tracemalloc/diff', headers=headers).status_code == 409
+        assert client.post('/debug/tracemalloc/snapshot', headers=headers).status_code == 200
+
+        leak = [bytearray(1024) for _ in range(1000)]
+        diff = json.loads(client.get('/debug/tracemalloc/diff?limit=5', headers=headers).content)
+        grown = diff['allocations'][0]
+        assert any(__file__ in frame for frame in grown['traceback'])
+        assert grown['size_diff'] >= 1000 * 1024 and grown['count_diff'] >= 1000
+
+        top = json.loads(client.get('/debug/tracemalloc/top?group_by=filename', headers=headers).content)
+        assert top['traced_bytes'] >= 1000 * 1024 and top['allocations']
+        del leak
+
+        stopped = json.loads(client.post('/debug/tracemalloc/stop', headers=headers).content)
+        assert not stopped['tracing']
+
+    def test_objects(self, admin_token):
+        manager = ExecutionManager()
+        task = CronTask('yearly', 'echo yearly', '0 0 1 1 *')
+        task.task_id = 7
+        executors = manager.task_executors
+        manager.task_executors = {7: TaskExecutor(task, manager)}
+        try:
+            objects = json.loads(client.get('/debug/objects', headers=headers).content)
+        finally:
+            manager.task_executors = executors
+
+        assert objects['task_executors'] == 1 and objects['running_executions'] == 0
+        assert objects['instances']['TaskExecutor'] >= 1
+        assert {'ExecutionMonitor', 'ConsoleLog', 'Session'} <= set(objects['instances'])
+        assert objects['output_logs_pending_flush'] >= 0
+
+    def test_cpu_profile(self, admin_token):
+        started = client.post('/debug/cpu_profile/start?seconds=5&interval=0.001', headers=headers)
+        assert started.status_code == 200
+        assert client.post('/debug/cpu_profile/start?seconds=5', headers=headers).status_code == 409
+
+        spin(0.2)
+        profile = json.loads(client.post('/debug/cpu_profile/stop', headers=headers).content)
+        assert not profile['running'] and profile['samples'] > 10
+        assert any(function['function'].startswith('spin ') for function in profile['top_functions'])
+        assert any(';spin (' in stack for stack in profile['collapsed_stacks'])
+
+
+class TestSamplingProfiler:
+    def test_window_ends(self):
+        profiler = SamplingProfiler()
+        profiler.start(0.1, interval=0.01)
+        worker = threading.Thread(target=spin, args=(0.3,))
+        worker.start()
+        worker.join()
+
+        assert not profiler.running
+        assert 0 < profiler.samples <= 11
+        profiler.stop()
+
+    def test_window_bounds(self):
+        with pytest.raises(ValueError):
+            SamplingProfiler().start(SamplingProfiler.max_seconds + 1)
+
+
+class TestProfileOverControlSocket:
+    async def test_objects(self, tmp_path):
+        control_server = ControlServer(ExecutionManager(), str(tmp_path / 'control.sock'))
+        await control_server.start()
+        control_client = ControlClient(control_server.path)
+        try:
+            objects = await control_client.profile('objects', {})
+            assert 'TaskExecutor' in objects['instances']
+            with pytest.raises(ValueError):
+                await control_client.profile('diff', {})
+            with pytest.raises(ValueError):
+                await control_client.profile('__init__', {})
+        finally:
+            await control_client.close()
+            await control_server.close()
+            get_profiler().tracemalloc_stop()
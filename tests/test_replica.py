@@ -0,0 +1,127 @@
+import datetime
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import connection
+from db.connection import Replica, configure_replica
+from db.models import Base, ProcessLog, ConsoleLog, ExecutionState
+from tests.testing import *
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def finished_log(task_id: int, finish_date: datetime.datetime = None) -> ProcessLog:
+    process_log = ProcessLog(task_id)
+    process_log.set_state(ExecutionState.FINISHED)
+    process_log.finish_date = finish_date
+    return process_log
+
+
+@pytest.fixture
+async def replica(tmp_path, session, add_three_tasks):
+    """A second SQLite database standing in for a replica, holding a different copy of the logs."""
+    replica = configure_replica(f"sqlite+aiosqlite:///{tmp_path / 'replica.sqlite'}", max_lag=1)
+    async with replica.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield replica
+
+    configure_replica(None)
+    await replica.engine.dispose()
+
+
+async def add_execution(db_session: AsyncSession, message: str, finish_date: datetime.datetime = None):
+    process_log = finished_log(1, finish_date) if finish_date else ProcessLog(1)
+    db_session.add(process_log)
+    await db_session.flush()
+    db_session.add(ConsoleLog(message, datetime.datetime.utcnow(), process_log.process_log_id))
+    await db_session.commit()
+
+
+class TestReplica:
+    async def test_history_from_replica(self, session, replica):
+        long_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        async with replica.session() as replica_session:
+            for _ in range(2):
+                replica_session.add(finished_log(1, long_ago))
+            await replica_session.commit()
+        session.add(finished_log(1, long_ago))
+        await session.commit()
+
+        process_logs = json.loads(client.get('/process_log').content)['process_logs']
+        assert len(process_logs) == 2
+
+    async def test_running_execution_from_primary(self, session, replica):
+        await add_execution(session, 'primary\n')
+        async with replica.session() as replica_session:
+            await add_execution(replica_session, 'replica\n')
+
+        content = json.loads(client.get('/execution/output/1').content)
+        assert [log['message'] for log in content['output_logs']] == ['primary\n']
+        assert content['status'] == 'awaiting'
+
+    async def test_settled_execution_from_replica(self, session, replica):
+        just_now = datetime.datetime.utcnow()
+        long_ago = just_now - datetime.timedelta(hours=1)
+        await add_execution(session, 'primary\n', long_ago)
+        await add_execution(session, 'primary\n', just_now)
+        async with replica.session() as replica_session:
+            await add_execution(replica_session, 'replica\n', long_ago)
+            await add_execution(replica_session, 'replica\n', just_now)
+
+        assert json.loads(client.get('/execution/output/1').content)['output_logs'][0]['message'] == 'replica\n'
+        assert json.loads(client.get('/execution/output/2').content)['output_logs'][0]['message'] == 'primary\n'
+        assert client.get('/execution/output/1/download').text == 'replica\n'
+
+        batch = json.loads(client.post('/execution/output', json={'executions': {1: None, 2: None}}).content)
+        assert [batch['executions'][key]['output_logs'][0]['message'] for key in ('1', '2')] == ['primary\n'] * 2
+
+    async def test_stale_replica_skipped(self, session, replica, monkeypatch):
+        async def lagging(self):
+            return 10.0
+
+        monkeypatch.setattr(Replica, 'measure_lag', lagging)
+        session.add(finished_log(1))
+        await session.commit()
+
+        assert await replica.lag() == 10.0 and not await replica.usable()
+        assert len(json.loads(client.get('/process_log').content)['process_logs']) == 1
+
+    async def test_unreachable_replica(self, monkeypatch):
+        async def unreachable(self):
+            raise ConnectionError('replica is down')
+
+        monkeypatch.setattr(Replica, 'measure_lag', unreachable)
+        replica = Replica(None)
+        assert await replica.lag() is None and not await replica.usable()
+
+    async def test_lag_checked_periodically(self, monkeypatch):
+        now = [0.0]
+        lags = iter([0.5, 3.0])
+
+        async def measure(self):
+            return next(lags)
+
+        monkeypatch.setattr(Replica, 'measure_lag', measure)
+        replica = Replica(None, max_lag=1, clock=lambda: now[0])
+        assert await replica.usable()
+        now[0] = 0.5
+        assert await replica.lag() == 0.5
+        now[0] = 1.0
+        assert not await replica.usable()
+
+    async def test_from_env(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(connection, 'replica', connection._unset)
+        monkeypatch.delenv('DB_REPLICA_URL', raising=False)
+        assert connection.get_replica() is None
+
+        monkeypatch.setattr(connection, 'replica', connection._unset)
+        monkeypatch.setenv('DB_REPLICA_URL', f"sqlite+aiosqlite:///{tmp_path / 'replica.sqlite'}")
+        monkeypatch.setenv('DB_REPLICA_MAX_LAG', '2.5')
+        replica = connection.get_replica()
+        assert replica.max_lag == 2.5 and connection.get_replica() is replica
+        await replica.engine.dispose()
+        configure_replica(None)
@@ -0,0 +1,94 @@
+import datetime
+import json
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from db.models import ProcessLog, ConsoleLog, StderrLog
+from db.search import PostgresSearchIndex, ensure_search_index
+from tests.testing import *
+from tests.testing import test_engine
+from util import OutputLogger
+
+
+logger = OutputLogger()
+pytestmark = pytest.mark.asyncio
+
+
+class TestOutputSearch:
+    @pytest.fixture
+    async def process_log_ids(self, session, add_three_tasks):
+        logs = [ProcessLog(1), ProcessLog(2)]
+        session.add_all(logs)
+        await session.flush()
+        log_ids = [log.process_log_id for log in logs]
+        await session.commit()
+
+        now = datetime.datetime.utcnow()
+        logger.log(ConsoleLog('starting backup\n', now, log_ids[0]))
+        logger.log(StderrLog('error: disk full\n', now, log_ids[0]))
+        logger.log(ConsoleLog('starting cleanup\n', now, log_ids[1]))
+        logger.log(StderrLog('Error: disk quota exceeded\n', now, log_ids[1]))
+        await logger.flush()
+        return log_ids
+
+    @staticmethod
+    def search(**params):
+        response = client.get('/search/output', params=params)
+        return json.loads(response.content)
+
+    async def test_match(self, process_log_ids):
+        results = self.search(q='disk error')['results']
+        assert [result['output_log']['message'] for result in results] == [
+            'error: disk full\n',
+            'Error: disk quota exceeded\n'
+        ]
+
+    async def test_process_log_context(self, process_log_ids):
+        results = self.search(q='full')['results']
+        assert len(results) == 1
+        assert results[0]['process_log']['task_id'] == 1
+        assert results[0]['process_log']['process_log_id'] == process_log_ids[0]
+
+    async def test_filter_task(self, process_log_ids):
+        results = self.search(q='starting', task_id=2)['results']
+        assert [result['output_log']['message'] for result in results] == ['starting cleanup\n']
+
+    async def test_pagination(self, process_log_ids):
+        first_page = self.search(q='disk', limit=1)
+        second_page = self.search(q='disk', limit=1, last_output_log_id=first_page['last_output_log_id'])
+        third_page = self.search(q='disk', limit=1, last_output_log_id=second_page['last_output_log_id'])
+
+        assert first_page['results'][0]['output_log']['message'] == 'error: disk full\n'
+        assert second_page['results'][0]['output_log']['message'] == 'Error: disk quota exceeded\n'
+        assert third_page['results'] == []
+
+    async def test_incremental(self, process_log_ids):
+        logger.log(ConsoleLog('disk check passed\n', datetime.datetime.utcnow(), process_log_ids[1]))
+        await logger.flush()
+
+        results = self.search(q='disk')['results']
+        assert len(results) == 3
+
+    async def test_empty_query(self, process_log_ids):
+        assert self.search(q='  ')['results'] == []
+
+    async def test_existing_database(self, process_log_ids):
+        async with test_engine.begin() as conn:
+            await conn.execute(text('DROP TABLE output_log_fts'))
+            await ensure_search_index(conn)
+            await ensure_search_index(conn)
+
+        logger.log(ConsoleLog('disk check passed\n', datetime.datetime.utcnow(), process_log_ids[1]))
+        await logger.flush()
+
+        assert len(self.search(q='disk')['results']) == 3
+
+
+class TestPostgresSearchIndex:
+    def test_literal_config(self):
+        clause = PostgresSearchIndex().match('disk error')
+        sql = str(clause.compile(dialect=postgresql.dialect()))
+        assert sql.startswith("to_tsvector('simple'::regconfig, output_log.message) @@ ")
+        assert "plainto_tsquery('simple'::regconfig, " in sql
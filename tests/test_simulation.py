@@ -0,0 +1,90 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from scheduler.output import OutputPolicy
+from scheduler.simulation import ExecutionModel, VirtualClock, VirtualTimeLoop, load_tasks, simulate
+
+
+START = datetime(2030, 1, 7)
+
+
+def interval_tasks(count: int, seconds: int, duration: float, output_rate: float = 0.0, **fields):
+    return load_tasks([
+        dict(title=f'task {i}', trigger_type='interval', trigger_args={'seconds': seconds},
+             duration=duration, output_rate=output_rate, **fields)
+        for i in range(count)
+    ])
+
+
+class TestVirtualTimeLoop:
+    def test_sleep_advances_clock(self):
+        clock = VirtualClock(START)
+        loop = VirtualTimeLoop(clock)
+        started = time.monotonic()
+        try:
+            loop.run_until_complete(asyncio.sleep(24 * 3600))
+        finally:
+            loop.close()
+
+        assert clock.now() >= START + timedelta(days=1)
+        assert time.monotonic() - started < 1
+
+
+class TestExecutionModel:
+    def test_output_policy(self):
+        model = ExecutionModel(duration=100, output_rate=10)
+        assert model.output_lines(OutputPolicy()) == 1000
+        assert model.output_lines(OutputPolicy(max_lines_per_second=2)) == 200
+        assert model.output_lines(OutputPolicy(max_lines=300, tail_lines=50)) == 351
+
+
+class TestSimulate:
+    def test_steady_load(self):
+        report = simulate(interval_tasks(10, 60, duration=30, output_rate=2), days=1, start=START)
+
+        assert report['peak_concurrency'] == 10
+        assert report['launches_per_minute']['peak'] == 10
+        assert report['missed'] == 0
+        assert 14300 <= report['executions'] <= 14410
+        assert report['process_log_rows_per_hour']['peak'] == 600
+        assert report['output_log_rows_per_hour']['peak'] == 36000
+
+    def test_admission_slots(self):
+        report = simulate(interval_tasks(10, 60, duration=30), days=1, start=START, slots=4)
+
+        assert report['peak_concurrency'] == 4
+        assert report['peak_queued'] > 0
+
+    def test_launch_rate(self):
+        tasks = load_tasks([
+            dict(trigger_type='cron', trigger_args='*/10 * * * *', duration=1)
+            for _ in range(20)
+        ])
+        unlimited = simulate(tasks, days=1, start=START)
+        limited = simulate(tasks, days=1, start=START, launch_rate=0.1)
+
+        assert unlimited['launches_per_minute']['peak'] == 20
+        assert limited['launches_per_minute']['peak'] <= 7
+
+    def test_jitter_spreads_launches(self):
+        tasks = load_tasks([
+            dict(title=f'task {i}', trigger_type='cron', trigger_args='0 * * * *', jitter=3600, duration=1)
+            for i in range(60)
+        ])
+        report = simulate(tasks, days=1, start=START)
+
+        assert report['launches_per_minute']['peak'] < 60
+
+    def test_output_policy_caps_rows(self):
+        tasks = interval_tasks(1, 3600, duration=600, output_rate=100,
+                               output_policy={'max_lines': 1000, 'tail_lines': 10})
+        report = simulate(tasks, days=1, start=START)
+
+        assert report['output_log_rows_per_hour']['peak'] == 1011
+
+    def test_report_is_json(self):
+        report = simulate(interval_tasks(1, 60, duration=1), days=0.1, start=START)
+        json.dumps(report, default=str)
+        assert report['start'] == START
@@ -0,0 +1,110 @@
+import datetime
+import json
+import sys
+
+import pytest
+from sqlalchemy import select
+
+from scheduler.executor import ExecutionManager, TaskExecutor
+from scheduler.spec import TaskSpec
+from scheduler.task import CronTask, IntervalTask, DateTask, Task
+from tests.testing import *
+
+
+pytestmark = pytest.mark.asyncio
+
+
+def interval_task(task_id: int = 1, **policy) -> IntervalTask:
+    task = IntervalTask('interval', 'echo interval', minutes=5)
+    task.task_id = task_id
+    task.output_policy = json.dumps(policy) if policy else None
+    return task
+
+
+class TestTaskSpec:
+    def test_snapshot(self):
+        task = interval_task(max_lines=10)
+        spec = TaskSpec.from_task(task)
+
+        assert spec.to_dict().items() >= task.to_dict().items()
+        assert spec.to_dict()['output_policy'] == {'max_lines': 10}
+        assert spec == task and hash(spec) == hash(task) == TaskSpec.fingerprint_of(task)
+        assert spec.period == task.period == datetime.timedelta(minutes=5)
+
+    def test_immutable(self):
+        spec = TaskSpec.from_task(interval_task())
+        with pytest.raises(AttributeError):
+            spec.command = 'rm -rf /'
+        with pytest.raises(AttributeError):
+            spec.extra = 1
+        assert not hasattr(spec, '__dict__')
+
+    def test_fingerprint_tracks_executor_columns(self):
+        task = interval_task()
+        spec = TaskSpec.from_task(task)
+
+        task.title = 'renamed'
+        assert TaskSpec.fingerprint_of(task) == spec.fingerprint
+        task.command = 'echo changed'
+        assert TaskSpec.fingerprint_of(task) != spec.fingerprint
+
+    def test_run_dates(self):
+        start = datetime.datetime(2030, 1, 1, 0, 0)
+        cron = TaskSpec.from_task(CronTask('hourly', 'echo hourly', '0 * * * *'))
+        assert next(cron.run_dates_after(start)) == start + datetime.timedelta(hours=1)
+        assert cron.period == datetime.timedelta(hours=1)
+
+        interval = TaskSpec.from_task(interval_task())
+        run_dates = interval.run_dates_after(start)
+        assert [next(run_dates), next(run_dates)] == [start + datetime.timedelta(minutes=5 * i) for i in (1, 2)]
+
+        date = TaskSpec.from_task(DateTask('once', 'echo once', start))
+        assert list(zip(date.run_date_iter, range(2))) == [(start, 0), (None, 1)]
+        assert date.period is None
+
+    def test_cron_shared(self):
+        first = TaskSpec.from_task(CronTask('a', 'echo a', '*/5 * * * *'))
+        second = TaskSpec.from_task(CronTask('b', 'echo b', '*/5 * * * *'))
+        assert first.trigger._template is second.trigger._template
+
+        start = datetime.datetime(2030, 1, 1, 0, 1)
+        first_dates = first.run_dates_after(start)
+        next(first_dates)
+        assert next(second.run_dates_after(start)) == datetime.datetime(2030, 1, 1, 0, 5)
+
+    def test_invalid_trigger(self):
+        with pytest.raises(ValueError):
+            TaskSpec(1, 'bad', 'echo bad', 'weekly', '{}')
+
+    def test_smaller_than_task(self):
+        task = interval_task()
+        spec = TaskSpec.from_task(task)
+        task_size = sys.getsizeof(task) + sys.getsizeof(task.__dict__) + sys.getsizeof(task._sa_instance_state)
+        assert sys.getsizeof(spec) < task_size
+
+
+class TestExecutorSpecs:
+    async def test_sync_detached(self, session, add_three_tasks):
+        execution_manager = ExecutionManager()
+        try:
+            await execution_manager.sync()
+            executor = execution_manager.task_executors[1]
+            assert isinstance(executor.task, TaskSpec)
+
+            db_task = (await session.scalars(select(Task).filter(Task.task_id == 1))).one()
+            db_task.title = 'renamed'
+            await session.commit()
+            await execution_manager.sync()
+            assert execution_manager.task_executors[1] is executor
+
+            db_task.command = 'echo changed'
+            await session.commit()
+            await execution_manager.sync()
+            assert execution_manager.task_executors[1] is not executor
+            assert execution_manager.task_executors[1].task.command == 'echo changed'
+        finally:
+            execution_manager.task_executors.clear()
+
+    def test_executor_accepts_task(self):
+        executor = TaskExecutor(interval_task())
+        assert isinstance(executor.task, TaskSpec)
@@ -0,0 +1,123 @@
+import datetime
+import os
+
+import pytest
+from sqlalchemy import select
+
+from db.models import ProcessLog, ConsoleLog, StderrLog, OutputLog, ExecutionState
+from tests.testing import *
+from util import OutputLogger
+from util.spool import OutputSpool
+
+
+logger = OutputLogger()
+pytestmark = pytest.mark.asyncio
+
+
+def output_logs(count: int, process_log_id: int = 1):
+    now = datetime.datetime.utcnow()
+    return [ConsoleLog(f'line {i}\n', now, process_log_id) for i in range(count)]
+
+
+class TestOutputSpool:
+    def test_append_and_read(self, tmp_path):
+        spool = OutputSpool(str(tmp_path))
+        missed = ProcessLog(3, start_date=datetime.datetime(2030, 1, 1))
+        missed.set_state(ExecutionState.MISSED)
+        spool.append(output_logs(2) + [StderrLog('oops\n', datetime.datetime(2030, 1, 1), 1), missed])
+
+        segments = spool.seal()
+        assert len(segments) == 1
+        rows = OutputSpool.read(segments[0])
+        assert [row['message'] for row in rows['output_log']] == ['line 0\n', 'line 1\n', 'oops\n']
+        assert rows['output_log'][2] == {'process_log_id': 1, 'message': 'oops\n',
+                                         'time': datetime.datetime(2030, 1, 1), 'is_error': 1}
+        assert rows['process_log'][0]['status'] == 'missed'
+        assert 'process_log_id' not in rows['process_log'][0]
+
+    def test_segments(self, tmp_path):
+        spool = OutputSpool(str(tmp_path), segment_bytes=200)
+        for _ in range(5):
+            spool.append(output_logs(2))
+        spool.append(output_logs(1))
+        segments = spool.seal()
+        assert len(segments) > 1
+        assert sum(len(OutputSpool.read(segment)['output_log']) for segment in segments) == 11
+
+        reopened = OutputSpool(str(tmp_path))
+        reopened.append(output_logs(1))
+        assert reopened.seal()[-1] > segments[-1]
+
+    def test_torn_record(self, tmp_path):
+        spool = OutputSpool(str(tmp_path))
+        spool.append(output_logs(2))
+        segment = spool.seal()[0]
+        with open(segment, 'ab') as f:
+            f.write(b'["output_log", {"mess')
+
+        assert len(OutputSpool.read(segment)['output_log']) == 2
+
+
+class TestOutputLogger:
+    @pytest.fixture
+    async def process_log_id(self, session, add_three_tasks):
+        process_log = ProcessLog(1)
+        session.add(process_log)
+        await session.flush()
+        process_log_id = process_log.process_log_id
+        await session.commit()
+        return process_log_id
+
+    @pytest.fixture
+    def spool(self, tmp_path):
+        spool = OutputSpool(str(tmp_path))
+        logger.configure_spool(spool)
+        yield spool
+        logger.configure_spool(None)
+
+    @staticmethod
+    def break_database(monkeypatch):
+        async def unreachable(*args, **kwargs):
+            raise ConnectionError('database is down')
+
+        monkeypatch.setattr(OutputSpool, 'insert', unreachable)
+        monkeypatch.setattr(OutputLogger, '_write', unreachable)
+
+    async def test_spooled_through_outage(self, session, process_log_id, spool, monkeypatch):
+        with monkeypatch.context() as patch:
+            self.break_database(patch)
+            for log in output_logs(3, process_log_id):
+                logger.log(log)
+            await logger.flush()
+
+            assert len(spool.segments()) == 1
+            assert (await session.scalars(select(OutputLog))).all() == []
+
+        logger.log(output_logs(1, process_log_id)[0])
+        await logger.flush()
+
+        messages = [log.message for log in (await session.scalars(select(OutputLog))).all()]
+        assert messages == ['line 0\n', 'line 1\n', 'line 2\n', 'line 0\n']
+        assert spool.segments() == []
+
+    async def test_failed_write_keeps_records(self, session, process_log_id, monkeypatch):
+        logger.configure_spool(None)
+        with monkeypatch.context() as patch:
+            self.break_database(patch)
+            for log in output_logs(2, process_log_id):
+                logger.log(log)
+            with pytest.raises(ConnectionError):
+                await logger.flush()
+
+        await logger.flush()
+        messages = [log.message for log in (await session.scalars(select(OutputLog))).all()]
+        assert messages == ['line 0\n', 'line 1\n']
+
+    async def test_spool_from_env(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('OUTPUT_SPOOL_DIR', str(tmp_path / 'spool'))
+        monkeypatch.setenv('OUTPUT_SPOOL_SEGMENT_BYTES', '1024')
+        spool = OutputSpool.from_env()
+        assert spool.segment_bytes == 1024 and os.path.isdir(tmp_path / 'spool')
+
+        monkeypatch.delenv('OUTPUT_SPOOL_DIR')
+        assert OutputSpool.from_env() is None
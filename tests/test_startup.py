@@ -0,0 +1,27 @@
+import pytest
+
+from scheduler.factory import create_scheduler
+from util.startup import StartupReport
+from tests.testing import *
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestStartup:
+    async def test_create_scheduler(self, session, add_three_tasks):
+        report = StartupReport()
+        execution_manager = await create_scheduler(report)
+        try:
+            assert all(executor.active for executor in execution_manager.task_executors.values())
+            assert list(report.to_dict()) == ['schema_create', 'sync', 'first_dispatch']
+        finally:
+            execution_manager.stop_all()
+            execution_manager.task_executors.clear()
+
+    def test_ready(self):
+        report = StartupReport()
+        with report.phase('sync'):
+            pass
+        report.mark_ready()
+        assert report.phases['ready'] >= report.phases['sync'] >= 0
@@ -0,0 +1,177 @@
+import asyncio
+import datetime
+import json
+import random
+import time
+
+import pytest
+
+from db.models import ProcessLog, ExecutionState
+from scheduler.accounting import RusageChildWatcher
+from scheduler.executor import ExecutionMonitor
+from scheduler.stats import TaskStatsRecorder
+from scheduler.task import IntervalTask
+from tests.testing import *
+from util.loop import loop_name
+from util.sketch import DurationSketch
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestDurationSketch:
+    def test_empty(self):
+        assert DurationSketch().quantile(0.5) is None
+
+    @pytest.mark.parametrize('q', [0.5, 0.95, 0.99])
+    def test_relative_accuracy(self, q):
+        rng = random.Random(42)
+        values = sorted(rng.lognormvariate(0, 2) for _ in range(10000))
+        sketch = DurationSketch()
+        for value in values:
+            sketch.add(value)
+
+        expected = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - expected) <= expected * sketch.relative_accuracy * 1.01
+
+    def test_roundtrip(self):
+        sketch = DurationSketch()
+        for value in (0, 0.5, 1, 2, 4):
+            sketch.add(value)
+
+        restored = DurationSketch.from_json(sketch.to_json())
+        assert restored.count == 5 and restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+class TestTaskStats:
+    @staticmethod
+    def execution(task_id: int, state: ExecutionState, start: datetime.datetime, seconds: float,
+                  return_code: int = None) -> ProcessLog:
+        log = ProcessLog(task_id, start_date=start)
+        log.set_state(state)
+        log.finish_date = start + datetime.timedelta(seconds=seconds)
+        log.return_code = return_code
+        return log
+
+    @pytest.fixture
+    async def recorded(self, session, add_three_tasks):
+        recorder = TaskStatsRecorder()
+        start = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+
+        for i in range(8):
+            recorder.record(self.execution(3, ExecutionState.FINISHED, start, i + 1))
+        await recorder.flush()
+
+        recorder.record(self.execution(3, ExecutionState.FAILED, start + datetime.timedelta(hours=1), 1, 2))
+        missed = ProcessLog(3, start_date=start)
+        missed.set_state(ExecutionState.MISSED)
+        recorder.record(missed)
+        await recorder.flush()
+
+    async def test_counts(self, recorded):
+        stats = json.loads(client.get('/task/3/stats').content)['stats']
+        assert stats['state_counts'] == {'finished': 8, 'failed': 1, 'missed': 1}
+        assert stats['success_rate'] == 8 / 9
+
+    async def test_timed_out_is_not_success(self, recorded):
+        recorder = TaskStatsRecorder()
+        start = datetime.datetime.utcnow()
+        recorder.record(self.execution(3, ExecutionState.TIMED_OUT, start, 1, -15))
+        await recorder.flush()
+
+        stats = json.loads(client.get('/task/3/stats').content)['stats']
+        assert stats['success_rate'] == 8 / 10
+
+    async def test_last_run(self, recorded):
+        stats = json.loads(client.get('/task/3/stats').content)['stats']
+        assert stats['last_status'] == 'failed' and stats['last_return_code'] == 2
+
+    async def test_durations(self, recorded):
+        duration = json.loads(client.get('/task/3/stats').content)['stats']['duration']
+        assert duration['count'] == 9
+        assert duration['p50'] == pytest.approx(4, rel=0.02)
+
+    async def test_hourly(self, recorded):
+        hourly = json.loads(client.get('/task/3/stats').content)['hourly']
+        assert [bucket['state_counts'] for bucket in hourly] == [
+            {'finished': 8, 'missed': 1},
+            {'failed': 1}
+        ]
+
+    async def test_no_runs(self, session, add_three_tasks):
+        stats = json.loads(client.get('/task/2/stats').content)['stats']
+        assert stats['state_counts'] == {} and stats['duration']['count'] == 0
+
+    async def test_not_found(self, session):
+        assert client.get('/task/4/stats').status_code == 404
+
+    async def test_failed_flush_keeps_records(self, session, add_three_tasks, monkeypatch):
+        recorder = TaskStatsRecorder()
+        recorder.record(self.execution(3, ExecutionState.FINISHED, datetime.datetime.utcnow(), 1))
+
+        async def broken_write(records):
+            raise ConnectionError('database is down')
+
+        monkeypatch.setattr(recorder, '_write', broken_write)
+        with pytest.raises(ConnectionError):
+            await recorder.flush()
+        monkeypatch.undo()
+
+        await recorder.flush()
+        stats = json.loads(client.get('/task/3/stats').content)['stats']
+        assert stats['state_counts'] == {'finished': 1}
+
+    async def test_periodic_flush_survives_errors(self, monkeypatch):
+        recorder = TaskStatsRecorder()
+        calls = []
+
+        async def flaky_flush():
+            calls.append(None)
+            if len(calls) == 1:
+                raise ConnectionError('database is down')
+
+        monkeypatch.setattr(recorder, 'flush', flaky_flush)
+        flush_task = asyncio.ensure_future(recorder._flush_periodically(seconds=0.01))
+        await asyncio.sleep(0.05)
+        flush_task.cancel()
+        assert len(calls) > 1
+
+
+@pytest.mark.skipif(loop_name() != 'asyncio', reason='uvloop reaps children itself, so no resource usage')
+class TestResourceUsage:
+    @pytest.fixture
+    def busy_monitor(self, session) -> ExecutionMonitor:
+        task = IntervalTask('busy', 'python -c "sum(range(3 * 10 ** 6))"', seconds=1)
+        task.task_id = 3
+        return ExecutionMonitor(task, lambda _: None)
+
+    async def test_process_log(self, session, add_three_tasks, busy_monitor):
+        await busy_monitor.start()
+
+        process_log = json.loads(client.get('/process_log').content)['process_logs'][0]
+        assert process_log['cpu_user'] + process_log['cpu_system'] > 0
+        assert process_log['max_rss'] > 0
+
+    async def test_ranking(self, session, add_three_tasks, busy_monitor):
+        await busy_monitor.start()
+        await TaskStatsRecorder().flush()
+
+        stats = json.loads(client.get('/stats/tasks', params={'order_by': 'cpu_time'}).content)['stats']
+        assert [task_stats['task_id'] for task_stats in stats] == [3]
+        assert stats[0]['cpu_time'] > 0 and stats[0]['max_rss'] > 0
+
+
+class TestRusageChildWatcher:
+    def test_pop(self):
+        watcher = RusageChildWatcher()
+        watcher._store(100, 'usage')
+        assert watcher.pop_usage(100) == 'usage'
+        assert watcher.pop_usage(100) is None
+
+    def test_uncollected_usage_expires(self):
+        watcher = RusageChildWatcher()
+        watcher.retention = 0.01
+        watcher._store(100, 'usage')
+        time.sleep(0.02)
+        watcher._store(101, 'usage')
+        assert list(watcher._usage) == [101]
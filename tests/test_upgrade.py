@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import select, text
+
+from db.upgrade import upgrade_schema
+from scheduler.task import Task
+from tests.testing import *
+from tests.testing import test_engine
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestUpgradeSchema:
+    async def test_up_to_date(self, setup_db):
+        async with test_engine.begin() as conn:
+            assert await upgrade_schema(conn) == []
+
+    async def test_add_missing_columns(self, session, add_three_tasks):
+        async with test_engine.begin() as conn:
+            for table, column in (('task', 'jitter'), ('task', 'output_policy'), ('process_log', 'queue_wait')):
+                await conn.execute(text(f'ALTER TABLE {table} DROP COLUMN {column}'))
+
+        async with test_engine.begin() as conn:
+            statements = await upgrade_schema(conn)
+            assert sorted(statements) == [
+                'ALTER TABLE process_log ADD COLUMN queue_wait FLOAT',
+                'ALTER TABLE task ADD COLUMN jitter FLOAT',
+                'ALTER TABLE task ADD COLUMN output_policy TEXT'
+            ]
+            assert await upgrade_schema(conn) == []
+
+        tasks = (await session.scalars(select(Task))).all()
+        assert len(tasks) == 3 and all(task.jitter is None for task in tasks)
+
+    async def test_add_missing_index(self, setup_db):
+        async with test_engine.begin() as conn:
+            await conn.execute(text('DROP INDEX output_log_process_index'))
+
+        async with test_engine.begin() as conn:
+            assert await upgrade_schema(conn) == [
+                'CREATE INDEX output_log_process_index ON output_log (process_log_id, output_log_id)'
+            ]
+            assert await upgrade_schema(conn) == []
@@ -0,0 +1,240 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from db.models import ProcessLog, OutputLog, WorkItem, ExecutionState
+from scheduler.agent import WorkerAgent
+from scheduler.executor import ExecutionManager, ExecutionMonitor
+from scheduler.spec import TaskSpec
+from scheduler.task import CronTask, Task
+from scheduler.work_queue import WorkQueue, RemoteExecution
+from tests.testing import *
+
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+async def tasks(session):
+    for i, priority in enumerate(('low', 'normal', 'critical')):
+        task = CronTask(f'yearly {i}', f'echo run {i}', '0 0 1 1 *')
+        task.priority = priority
+        session.add(task)
+    await session.commit()
+
+    yield [TaskSpec.from_task(task) for task in (await session.scalars(select(Task).order_by(Task.task_id))).all()]
+
+    await session.execute(delete(WorkItem))
+    await session.commit()
+
+
+async def wait_until(condition, timeout=20.0):
+    deadline = asyncio.get_event_loop().time() + timeout
+    while not await condition():
+        assert asyncio.get_event_loop().time() < deadline, 'timed out'
+        await asyncio.sleep(0.05)
+
+
+class TestWorkQueue:
+    async def test_claim_once_by_priority(self, tasks):
+        queue = WorkQueue()
+        for task in tasks:
+            await queue.enqueue(task)
+
+        claimed = [await queue.claim(f'agent {i}') for i in range(4)]
+        assert [task.task_id for _, task in claimed[:3]] == [tasks[2].task_id, tasks[1].task_id, tasks[0].task_id]
+        assert [item.agent_id for item, _ in claimed[:3]] == ['agent 0', 'agent 1', 'agent 2']
+        assert claimed[0][0].attempts == 1
+        assert claimed[3] is None
+
+    async def test_concurrent_claims(self, tasks):
+        queue = WorkQueue()
+        for _ in range(5):
+            await queue.enqueue(tasks[0])
+
+        claimed = await asyncio.gather(*(queue.claim(f'agent {i}') for i in range(8)))
+        work_item_ids = [item.work_item_id for item, _ in filter(None, claimed)]
+        assert len(work_item_ids) == len(set(work_item_ids)) == 5
+
+    async def test_complete_and_collect(self, session, tasks):
+        queue = WorkQueue(poll_interval=0.05)
+        statuses = []
+        execution = RemoteExecution(queue, tasks[0], statuses.append)
+        run = asyncio.ensure_future(execution.start())
+        await wait_until(lambda: queue.claim('agent'))
+
+        process_log = ProcessLog(tasks[0].task_id)
+        process_log.set_state(ExecutionState.FINISHED)
+        process_log.finish_date = datetime.utcnow()
+        session.add(process_log)
+        await session.flush()
+        process_log_id = process_log.process_log_id
+        await session.commit()
+        work_item_id = (await session.scalars(select(WorkItem.work_item_id))).one()
+        assert await queue.complete('other agent', work_item_id, process_log_id) is False
+        assert await queue.complete('agent', work_item_id, process_log_id) is True
+
+        assert await asyncio.wait_for(run, 5) == 0
+        assert execution.state is ExecutionState.FINISHED
+        assert execution.process_log_id == process_log_id
+        assert statuses == ['awaiting', 'finished']
+
+        async def collected():
+            return (await session.scalars(select(WorkItem))).all() == []
+
+        await wait_until(collected)
+        queue.stop()
+
+    async def test_requeue_stale(self, session, tasks):
+        queue = WorkQueue(heartbeat_timeout=10)
+        await queue.enqueue(tasks[0])
+        item, _ = await queue.claim('dead agent')
+        process_log = ProcessLog(tasks[0].task_id)
+        process_log.set_state(ExecutionState.STARTED)
+        session.add(process_log)
+        await session.flush()
+        process_log_id = process_log.process_log_id
+        await session.commit()
+        await queue.heartbeat('dead agent', [item.work_item_id], {item.work_item_id: process_log_id})
+        assert await queue.requeue_stale() == 0
+
+        await session.execute(
+            update(WorkItem).
+            values(heartbeat_at=datetime.utcnow() - timedelta(seconds=60))
+        )
+        await session.commit()
+        assert await queue.requeue_stale() == 1
+
+        session.expire_all()
+        assert (await session.get(ProcessLog, process_log_id)).status == 'failed'
+        requeued, _ = await queue.claim('live agent')
+        assert requeued.work_item_id == item.work_item_id and requeued.attempts == 2
+        assert requeued.process_log_id is None
+
+    async def test_give_up_after_max_attempts(self, session, tasks):
+        queue = WorkQueue(heartbeat_timeout=10)
+        await queue.enqueue(tasks[0])
+        for attempt in range(WorkQueue.max_attempts):
+            assert await queue.claim(f'agent {attempt}')
+            await session.execute(
+                update(WorkItem).
+                values(heartbeat_at=datetime.utcnow() - timedelta(seconds=60))
+            )
+            await session.commit()
+            await queue.requeue_stale()
+
+        assert await queue.claim('agent') is None
+        assert await queue.collect() == 1
+
+
+class TestWorkerAgent:
+    async def test_runs_through_agent(self, session, tasks, monkeypatch):
+        monkeypatch.setenv('WORK_QUEUE', '1')
+        monkeypatch.setenv('WORK_QUEUE_POLL_INTERVAL', '0.05')
+        manager = ExecutionManager()
+        monkeypatch.setattr(manager, 'work_queue', WorkQueue.from_env())
+
+        monitor = manager.create_monitor(tasks[1], lambda _: None)
+        assert isinstance(monitor, RemoteExecution)
+        agent = WorkerAgent(WorkQueue(poll_interval=0.05), 'agent', slots=2, heartbeat_interval=0.05)
+        agent_task = asyncio.ensure_future(agent.run())
+        try:
+            assert await asyncio.wait_for(monitor.start(), 10) == 0
+        finally:
+            agent_task.cancel()
+            await asyncio.gather(agent_task, return_exceptions=True)
+            manager.work_queue.stop()
+
+        assert monitor.state is ExecutionState.FINISHED
+        output = (await session.scalars(select(OutputLog))).all()
+        assert [log.message for log in output] == ['run 1\n']
+        assert output[0].process_log_id == monitor.process_log_id
+
+    async def test_in_process_without_queue(self, tasks, monkeypatch):
+        monkeypatch.delenv('WORK_QUEUE', raising=False)
+        assert WorkQueue.from_env() is None
+        monkeypatch.setattr(ExecutionManager(), 'work_queue', None)
+        assert isinstance(ExecutionManager().create_monitor(tasks[0], lambda _: None), ExecutionMonitor)
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGKILL'), reason='needs SIGKILL')
+class TestAgentProcesses:
+    @staticmethod
+    def start_agent(agent_id: str) -> subprocess.Popen:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ,
+                   PYTHONPATH=os.path.join(root, 'pscheduler'),
+                   DB_URL=f"sqlite+aiosqlite:///{os.path.abspath('test_db.sqlite')}",
+                   AGENT_ID=agent_id,
+                   WORK_QUEUE_POLL_INTERVAL='0.1',
+                   AGENT_HEARTBEAT_INTERVAL='0.2')
+        return subprocess.Popen([sys.executable, os.path.join(root, 'pscheduler', 'main.py'), '--mode', 'agent'],
+                                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    @staticmethod
+    async def items(session):
+        session.expire_all()
+        return (await session.scalars(select(WorkItem))).all()
+
+    async def test_agents_share_queue(self, session, tasks):
+        queue = WorkQueue(heartbeat_timeout=2)
+        for _ in range(3):
+            for task in tasks:
+                await queue.enqueue(task)
+
+        agents = [self.start_agent(f'agent {i}') for i in range(2)]
+        try:
+            async def all_done():
+                items = await self.items(session)
+                return all(item.status == 'done' for item in items)
+
+            await wait_until(all_done, timeout=30)
+        finally:
+            for agent in agents:
+                agent.kill()
+                agent.wait()
+
+        items = await self.items(session)
+        assert len(items) == 9 and all(item.process_log_id for item in items)
+        assert await queue.collect() == 9
+        logs = (await session.scalars(select(ProcessLog))).all()
+        assert [log.status for log in logs] == ['finished'] * 9
+        assert len((await session.scalars(select(OutputLog))).all()) == 9
+
+    async def test_dead_agent_requeued(self, session, tasks):
+        await session.execute(update(Task).values(command='sleep 1; echo done'))
+        await session.commit()
+        queue = WorkQueue(heartbeat_timeout=1)
+        await queue.enqueue(tasks[0])
+
+        doomed = self.start_agent('doomed')
+        try:
+            async def claimed():
+                return (await self.items(session))[0].process_log_id is not None
+
+            await wait_until(claimed)
+        finally:
+            doomed.send_signal(signal.SIGKILL)
+            doomed.wait()
+
+        survivor = self.start_agent('survivor')
+        try:
+            async def done():
+                await queue.requeue_stale()
+                return (await self.items(session))[0].status == 'done'
+
+            await wait_until(done, timeout=30)
+        finally:
+            survivor.kill()
+            survivor.wait()
+
+        item = (await self.items(session))[0]
+        assert item.agent_id == 'survivor' and item.attempts == 2
+        logs = (await session.scalars(select(ProcessLog).order_by(ProcessLog.process_log_id))).all()
+        assert [log.status for log in logs] == ['failed', 'finished']
@@ -1,24 +1,24 @@
-import asyncio
 import datetime
 import json
 
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import delete
-from sqlalchemy.ext.asyncio import create_async_engine
 
-from api.app import app
+from api.app import create_app
 
 from db import connection
 from db.connection import Session
 from db.models import Base, ProcessLog, ConsoleLog, TaskModel
+from scheduler.stats import TaskStatsRecorder
 from scheduler.task import IntervalTask, CronTask, DateTask
+from util.loop import new_event_loop
 
-test_conn_str = connection.conn_str = 'sqlite+aiosqlite:///test_db.sqlite'
-test_engine = connection.engine = create_async_engine(test_conn_str)
+test_conn_str = 'sqlite+aiosqlite:///test_db.sqlite'
+test_engine = connection.configure(test_conn_str)
 
 
-client = TestClient(app)
+client = TestClient(create_app())
 
 
 @pytest.fixture
@@ -37,6 +37,7 @@ async def session(setup_db):
     db_session = Session()
     yield db_session
     await db_session.rollback()
+    await TaskStatsRecorder().flush()
 
     await db_session.execute(delete(TaskModel))
     await db_session.execute(delete(ProcessLog))
@@ -67,7 +68,7 @@ async def add_three_tasks(session):
 
 @pytest.fixture(scope='session')
 def event_loop():
-    loop = asyncio.get_event_loop()
+    loop = new_event_loop()
     yield loop
     loop.close()
 